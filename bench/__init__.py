@@ -0,0 +1 @@
+# Benchmarks for the control pipeline (run with: python -m bench)
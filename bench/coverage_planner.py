@@ -0,0 +1,218 @@
+import argparse  # Import argparse library for command line options
+import json  # Import json library for machine-readable results
+import math
+import random
+import sys
+import time
+
+from bench.pipeline import summarize
+from config import load_profile
+from coverage_planner import SWEEP, CoveragePlanner, OccupancyGrid, route_moves
+
+# Roof coverage planner, no hardware needed
+#     python -m bench.coverage_planner --blocks 200
+# - plan: rasterize and plan a large roof (120 x 80 m, three obstacles, 0.25 m cells)
+# - replan: block random free cells one at a time (block()), against planning the result from scratch
+# - checks: every route segment stays on free cells, legs join up, and how much of the free roof
+#   the sweeps cover
+# - fuzz: random small roofs with random blocks; the repaired route has to sweep exactly as many
+#   cells as a full plan() from the same start (exit status 1 if any roof differs)
+# - drive: a small roof's route as MotionQueue moves, mixed and run on the fleet simulator's motor
+#   model; how far the true path strays from the planned one
+
+LARGE_ROOF = [(0, 0), (120, 0), (120, 50), (80, 80), (0, 80)]
+LARGE_OBSTACLES = [
+    [(10, 10), (20, 10), (20, 20), (10, 20)],   # Skylight
+    [(50, 30), (60, 35), (55, 50), (45, 45)],   # Plant room
+    [(90, 10), (100, 10), (100, 12), (90, 12)],  # Duct
+]
+SMALL_ROOF = [(0, 0), (8, 0), (8, 5), (0, 5)]
+SMALL_OBSTACLES = [[(3, 2), (4.5, 2), (4.5, 3), (3, 3)]]
+
+
+# Function to check a route: returns (cells off the free space, gaps between legs, swept fraction)
+def check_route(planner):
+    grid = planner.grid
+    off = gaps = 0
+    swept = set()
+    previous = None
+    for leg in planner.legs:
+        if previous is not None and leg.points[0] != previous:
+            gaps += 1
+        if leg.kind == SWEEP:
+            swept.update(leg.points)  # A one-cell sweep has no segments
+        if len(leg.points) == 1 and grid.is_blocked(*leg.points[0]):
+            off += 1
+        for (x0, y0), (x1, y1) in zip(leg.points, leg.points[1:]):
+            steps = max(abs(x1 - x0), abs(y1 - y0))
+            for k in range(steps + 1):
+                cell = (x0 + (x1 - x0) * k // steps, y0 + (y1 - y0) * k // steps)
+                if grid.is_blocked(*cell):
+                    off += 1
+                if leg.kind == SWEEP:
+                    swept.add(cell)
+        previous = leg.points[-1]
+    free = grid.free_count()
+    return {'blocked_cells_on_route': off, 'gaps': gaps, 'swept_fraction': len(swept) / free if free else 1.0}
+
+
+# Function to time planning the large roof
+def bench_plan(cell_m, margin_m):
+    start = time.perf_counter()
+    grid = OccupancyGrid.from_polygon(LARGE_ROOF, LARGE_OBSTACLES, cell_m, margin_m)
+    rasterized = time.perf_counter()
+    planner = CoveragePlanner(grid)
+    planner.plan()
+    done = time.perf_counter()
+    result = {
+        'grid': [grid.cols, grid.rows],
+        'grid_bytes': len(grid.bits),
+        'rasterize_ms': (rasterized - start) * 1000,
+        'plan_ms': (done - rasterized) * 1000,
+    }
+    result.update(planner.stats())
+    result.update(check_route(planner))
+    return planner, result
+
+
+# Function to block random free cells one by one and time the local repairs
+def bench_replan(planner, blocks, seed=0):
+    grid = planner.grid
+    rng = random.Random(seed)
+    times = []
+    changed = []
+    while len(times) < blocks:
+        row = rng.randrange(grid.rows)
+        runs = grid.free_runs(row)
+        if not runs:
+            continue
+        first, last = rng.choice(runs)
+        start = time.perf_counter_ns()
+        changed.append(planner.block(rng.randint(first, last), row))
+        times.append(time.perf_counter_ns() - start)
+    result = {'blocks': blocks, 'block_us': summarize(times), 'legs_changed_max': max(changed)}
+    result.update(planner.stats())
+    result.update(check_route(planner))
+    full = CoveragePlanner(grid, planner.position)
+    start = time.perf_counter()
+    full.plan()
+    result['full_plan_ms'] = (time.perf_counter() - start) * 1000
+    result['full_plan_unreachable_cells'] = full.stats()['unreachable_cells']
+    return result
+
+
+# Function to build a random small roof: a house-shaped outline with a few box obstacles
+def random_roof(rng):
+    width, depth = rng.uniform(3, 8), rng.uniform(3, 6)
+    obstacles = []
+    for _ in range(rng.randint(0, 3)):
+        x, y = rng.uniform(0, width - 1), rng.uniform(0, depth - 1)
+        w, d = rng.uniform(0.3, 1.5), rng.uniform(0.3, 1.5)
+        obstacles.append([(x, y), (x + w, y), (x + w, y + d), (x, y + d)])
+    return [(0, 0), (width, 0), (width, depth * 0.8), (width * 0.7, depth), (0, depth)], obstacles
+
+
+# Function to repair routes on random roofs and compare each with a full replan from the same start
+# A mismatch is a roof where the repaired route sweeps fewer (or more) cells than plan(), runs over a
+# blocked cell, or has legs that don't join up
+def bench_fuzz(roofs, blocks, cell_m, seed=0):
+    rng = random.Random(seed)
+    mismatches = []
+    worst = 0
+    for roof_index in range(roofs):
+        roof, obstacles = random_roof(rng)
+        grid = OccupancyGrid.from_polygon(roof, obstacles, cell_m)
+        planner = CoveragePlanner(grid)
+        if not planner.plan():
+            continue
+        for _ in range(blocks):
+            row = rng.randrange(grid.rows)
+            runs = grid.free_runs(row)
+            if runs:
+                first, last = rng.choice(runs)
+                planner.block(rng.randint(first, last), row)
+        full = CoveragePlanner(grid, planner.position)
+        full.plan()
+        extra = planner.stats()['unreachable_cells'] - full.stats()['unreachable_cells']
+        check = check_route(planner)
+        worst = max(worst, extra)
+        if extra or check['blocked_cells_on_route'] or check['gaps']:
+            mismatches.append(roof_index)
+    return {'roofs': roofs, 'blocks': blocks, 'mismatches': len(mismatches), 'mismatched_roofs': mismatches[:20],
+            'worst_extra_unreachable_cells': worst}
+
+
+# Function to drive a small roof's route open loop through MotionQueue -> mixer -> motor model
+def bench_drive(speed_mps, cell_m):
+    from fleet_sim import FleetSim
+    from motion import MotionQueue
+    config = load_profile('sim')
+    grid = OccupancyGrid.from_polygon(SMALL_ROOF, SMALL_OBSTACLES, cell_m, cell_m / 2)
+    planner = CoveragePlanner(grid)
+    planner.plan()
+    points = planner.waypoints()
+    moves = route_moves(points, config, speed_mps)
+    period_ms = 1000 / config['loop']['rate_hz']
+    motion = MotionQueue(3, period_ms, ramp_s=config['motion']['ramp_s'], profile=config['motion']['profile'])
+    for command, duration in moves:
+        motion.push(command, duration)
+    sim = FleetSim(config, 1, poses=[(points[0][0], points[0][1], 0.0)])
+    mixer = sim.mixer
+    deviation = 0.0
+    while motion.active():
+        sim.advance(mixer.mix_batch([motion.update()]), period_ms / 1000)
+        x, y = sim.pose[0, 0], sim.pose[0, 1]
+        deviation = max(deviation, _distance_to_path(x, y, points))
+    end = points[-1]
+    return {
+        'waypoints': len(points),
+        'moves': len(moves),
+        'route_s': sum(duration for _, duration in moves),
+        'max_deviation_m': deviation,
+        'end_error_m': math.hypot(sim.pose[0, 0] - end[0], sim.pose[0, 1] - end[1]),
+    }
+
+
+def _distance_to_path(x, y, points):
+    best = math.inf
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        dx, dy = x1 - x0, y1 - y0
+        length2 = dx * dx + dy * dy
+        u = 0.0 if length2 == 0 else max(0.0, min(1.0, ((x - x0) * dx + (y - y0) * dy) / length2))
+        best = min(best, math.hypot(x - x0 - u * dx, y - y0 - u * dy))
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the roof coverage planner")
+    parser.add_argument('--cell-m', type=float, default=0.25, help="grid cell size = sweep width")
+    parser.add_argument('--margin-m', type=float, default=0.15, help="clearance kept from edges and obstacles")
+    parser.add_argument('--blocks', type=int, default=200, help="cells blocked one by one after planning")
+    parser.add_argument('--speed', type=float, default=0.3, help="driving speed in m/s")
+    parser.add_argument('--fuzz-roofs', type=int, default=150, help="random roofs to repair and compare")
+    parser.add_argument('--fuzz-blocks', type=int, default=30, help="cells blocked on each random roof")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    planner, plan = bench_plan(args.cell_m, args.margin_m)
+    results = {
+        'plan': plan,
+        'replan': bench_replan(planner, args.blocks, args.seed),
+        'fuzz': bench_fuzz(args.fuzz_roofs, args.fuzz_blocks, args.cell_m, args.seed),
+        'drive': bench_drive(args.speed, args.cell_m),
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    print(text)
+    replan = results['replan']
+    if results['fuzz']['mismatches'] or replan['unreachable_cells'] != replan['full_plan_unreachable_cells']:
+        print("repaired routes don't cover what a full replan covers", file=sys.stderr)
+        sys.exit(1)
+    return results
+
+
+if __name__ == "__main__":
+    main()
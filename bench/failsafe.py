@@ -0,0 +1,205 @@
+import argparse  # Import argparse library for command line options
+import json  # Import json library for machine-readable results
+import sys
+import threading  # Import threading library to run the control loop next to the watchdog
+import time
+
+from bench.pipeline import summarize
+from config import load_profile
+from control import ControlLoop
+from ibus import new_channels
+from motor_driver import SimDriver
+from receiver import NEUTRAL_SAMPLE, Sample
+from watchdog import CUT, RAMP, FailsafeWatchdog
+
+# Failsafe watchdog reaction time, no hardware needed
+#     python -m bench.failsafe --trials 20
+# The real ControlLoop drives forward with a sim driver while a FailsafeWatchdog guards it, then
+# - link: frames stop arriving (the loop keeps ticking)
+# - loop: the loop hangs inside its receiver read (frames keep arriving)
+# - disarm / disarm_hung: the loop is disarmed while moving (and hangs at the same moment);
+#   stopped_us is the time from disarming until every motor is at 0
+# reaction: time from the deadline running out to the watchdog's first safe write
+# (for 'cut' all motors stopped, for 'ramp' the first reduced speeds); stopped_after_frame /
+# stopped_after_tick: from the last frame / last tick to that write.
+# The exit status is 1 when the worst reaction is over --max-reaction-ms (MAX_REACTION_MS unless
+# given); tests/test_failsafe.py checks the same bound.
+
+# Worst reaction allowed past the deadline with the default 5 ms check period: one check period,
+# plus room for the scheduler on a busy machine
+MAX_REACTION_MS = 20
+
+
+# Channel source the bench controls: fresh frames while `sending`, read() blocks while `hang` is set
+class ScriptedSource:
+    def __init__(self, channel):
+        self.channels = new_channels()
+        self.channels[channel] = 1800  # Forward
+        self.neutral = new_channels()
+        self.timestamp = None
+        self.sending = True
+        self.hang = threading.Event()
+        self.release = threading.Event()
+
+    # Function to stamp a new frame (called from the feeder thread)
+    def feed(self):
+        if self.sending:
+            self.timestamp = time.monotonic()
+
+    def read(self, max_age, now=None):
+        if self.hang.is_set():
+            self.release.wait()
+        if self.timestamp is None or (time.monotonic() if now is None else now) - self.timestamp > max_age:
+            return self.neutral
+        return self.channels
+
+    def latest(self):
+        if self.timestamp is None:
+            return NEUTRAL_SAMPLE
+        return Sample(0, self.timestamp, tuple(self.channels))
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+# Function to start the real ControlLoop driving forward under a watchdog, each on its own thread
+# Returns (driver, source, loop, watchdog, stop); stop() ends the threads again
+def start_driving(action, deadline_ms, check_ms, frame_ms, settle_s):
+    config = load_profile('sim')
+    config['filter']['time_constant_ms'] = 0
+    driver = SimDriver(config['motors']['pins'], config['motors']['mode'], record=False)
+    source = ScriptedSource(config['channels']['drive2'])
+    loop = ControlLoop(config, source, driver)
+    watchdog = FailsafeWatchdog(loop, deadline_ms, action, ramp_ms=100, check_ms=check_ms)
+    running = threading.Event()
+    running.set()
+
+    def feeder():
+        while running.is_set():
+            source.feed()
+            time.sleep(frame_ms / 1000)
+
+    feed_thread = threading.Thread(target=feeder, name='frames', daemon=True)
+    feed_thread.start()
+    while source.timestamp is None:
+        time.sleep(0.001)
+    loop.armed = True
+    watchdog.start()
+    loop_thread = threading.Thread(target=loop.run, args=(running.is_set,), name='control', daemon=True)
+    loop_thread.start()
+    time.sleep(settle_s)
+    if watchdog.trips:
+        raise RuntimeError("watchdog tripped before the failure was injected")
+
+    def stop():
+        running.clear()
+        source.release.set()
+        loop_thread.join()
+        watchdog.stop()
+        feed_thread.join()
+
+    return driver, source, loop, watchdog, stop
+
+
+# Function to run one failure and return (reaction, after frame, after tick) in ns
+def run_trial(scenario, action, deadline_ms, check_ms, frame_ms, settle_s):
+    driver, source, loop, watchdog, stop = start_driving(action, deadline_ms, check_ms, frame_ms, settle_s)
+    if scenario == 'link':
+        source.sending = False
+    else:
+        source.hang.set()
+    last_frame = int(source.timestamp * 1e9)
+    last_tick = watchdog.heartbeat
+    timeout = time.monotonic() + 1.0
+    while watchdog.action_time is None and time.monotonic() < timeout:
+        time.sleep(0.001)
+    action_time = watchdog.action_time
+    if action == CUT and any(driver.speed(i) != 0 for i in range(len(driver.motors))):
+        raise RuntimeError("motors still running after the watchdog cut them")
+
+    stop()
+    if action_time is None:
+        raise RuntimeError("watchdog did not react to a %s failure" % scenario)
+    return (action_time - watchdog.deadline_time, action_time - last_frame,
+            action_time - (last_tick if last_tick is not None else last_frame))
+
+
+# Function to disarm the moving loop and return (ns until every motor was at 0, watchdog trips)
+# With hang=True the loop hangs in its receiver read at the same moment, so it never gets to
+# stop the motors itself and the watchdog has to, disarmed or not
+def run_disarm_trial(hang, action, deadline_ms, check_ms, frame_ms, settle_s):
+    driver, source, loop, watchdog, stop = start_driving(action, deadline_ms, check_ms, frame_ms, settle_s)
+    if hang:
+        source.hang.set()
+    disarmed = time.monotonic_ns()
+    loop.armed = False
+    timeout = time.monotonic() + 1.0
+    while any(driver.speed(i) != 0 for i in range(len(driver.motors))) and time.monotonic() < timeout:
+        time.sleep(0.0005)
+    stopped = time.monotonic_ns()
+    moving = any(driver.speed(i) != 0 for i in range(len(driver.motors)))
+    stop()
+    if moving:
+        raise RuntimeError("motors still running 1 s after disarming%s" % (" a hung loop" if hang else ""))
+    return stopped - disarmed, watchdog.trips
+
+
+# Function to collect the reaction times over several trials
+def bench_reaction(scenario, action, trials, deadline_ms, check_ms, frame_ms, settle_s):
+    reaction, after_frame, after_tick = [], [], []
+    for _ in range(trials):
+        r, f, t = run_trial(scenario, action, deadline_ms, check_ms, frame_ms, settle_s)
+        reaction.append(r)
+        after_frame.append(f)
+        after_tick.append(t)
+    return {
+        'trials': trials,
+        'reaction_us': summarize(reaction),
+        'stopped_after_frame_us': summarize(after_frame),
+        'stopped_after_tick_us': summarize(after_tick),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the failsafe watchdog's reaction time")
+    parser.add_argument('--trials', type=int, default=20, help="failures per scenario")
+    parser.add_argument('--action', choices=(CUT, RAMP), default=CUT)
+    parser.add_argument('--deadline-ms', type=float, default=50)
+    parser.add_argument('--check-ms', type=float, default=5)
+    parser.add_argument('--frame-ms', type=float, default=7, help="time between frames (iBus: 7 ms)")
+    parser.add_argument('--settle-s', type=float, default=0.1, help="normal driving before each failure")
+    parser.add_argument('--max-reaction-ms', type=float, default=MAX_REACTION_MS,
+                        help="fail if the worst reaction is slower")
+    parser.add_argument('--output', help="write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    results = {
+        'deadline_ms': args.deadline_ms,
+        'check_ms': args.check_ms,
+        'action': args.action,
+    }
+    for scenario in ('link', 'loop'):
+        results[scenario] = bench_reaction(scenario, args.action, args.trials, args.deadline_ms, args.check_ms,
+                                           args.frame_ms, args.settle_s)
+    for name, hang in (('disarm', False), ('disarm_hung', True)):
+        stopped = [run_disarm_trial(hang, args.action, args.deadline_ms, args.check_ms, args.frame_ms,
+                                    args.settle_s)[0] for _ in range(args.trials)]
+        results[name] = {'trials': args.trials, 'stopped_us': summarize(stopped)}
+    worst = max(results[scenario]['reaction_us']['max'] for scenario in ('link', 'loop')) / 1000
+    results['worst_reaction_ms'] = worst
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    print(text)
+    if worst > args.max_reaction_ms:
+        print("worst reaction %.2f ms is over the %.2f ms limit" % (worst, args.max_reaction_ms), file=sys.stderr)
+        sys.exit(1)
+    return results
+
+
+if __name__ == "__main__":
+    main()
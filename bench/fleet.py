@@ -0,0 +1,126 @@
+import argparse  # Import argparse library for command line options
+import json  # Import json library for machine-readable results
+import time
+
+import numpy as np
+
+from config import load_profile
+from fleet_sim import FleetSim
+
+# Vectorized fleet simulator, no hardware needed
+#     python -m bench.fleet --robots 100 1000 5000 --seconds 10
+# - throughput: simulated seconds per wall second (real-time factor) and robot steps per second
+# - match: the batch stick curve / filter / mixer / wheel speed controller against the scalar ones
+#   ControlLoop uses, on random sticks (largest difference in wheel commands)
+# - headless: one robot driven by the real ControlLoop (sim serial + sim driver + fleet encoders)
+#   next to a vectorized twin with the same sticks; compares their true poses and the loop's
+#   own odometry estimate
+
+
+# Function to time the fleet for a number of simulated seconds
+def bench_throughput(config, robots, seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    sim = FleetSim(config, robots, loads=rng.uniform(0.0, 0.25, (robots, 3)))
+    sim.channels[:, sim.drive_channels] = rng.integers(1000, 2001, (robots, 3))
+    start = time.perf_counter()
+    ticks = sim.run(seconds)
+    elapsed = time.perf_counter() - start
+    return {
+        'robots': robots,
+        'steps': ticks,
+        'wall_s': round(elapsed, 4),
+        'realtime_factor': round(seconds / elapsed, 1),
+        'robot_steps_per_s': round(robots * ticks / elapsed),
+        'us_per_step': round(elapsed / ticks * 1e6, 1),
+    }
+
+
+# Function to compare the batch pipeline with the scalar one on random sticks
+def check_match(config, robots, ticks, seed=0):
+    from control import make_mixer
+    from conditioning import StickCurve
+    from filters import FilterBank
+    from wheel_speed import WheelSpeedController
+    rng = np.random.default_rng(seed)
+    sim = FleetSim(config, robots)
+    stick, filt = config['stick'], config['filter']
+    curve = StickCurve(deadband=stick['deadband'], expo=stick['expo'], scale=stick['scale'])
+    filters = [FilterBank(3, 1000 * sim.period_s, filt['mode'], time_constant_ms=filt['time_constant_ms'],
+                          rate=filt['rate'], decel_rate=filt['decel_rate']) for _ in range(robots)]
+    mixer = make_mixer(config['mixer'])
+    speeds = None
+    if sim.speed is not None:
+        enc = config['encoders']
+        speeds = [WheelSpeedController(sim.wheels, 1000 * sim.period_s, enc['max_counts_per_s'], kp=enc['kp'],
+                                       ki=enc['ki'], limit=config['mixer']['limit']) for _ in range(robots)]
+    period_ns = int(sim.period_s * 1e9)
+    worst = 0.0
+    for tick in range(ticks):
+        sim.channels[:, sim.drive_channels] = rng.integers(900, 2101, (robots, 3))
+        counts = sim.counts.copy()  # What the controllers sample this step
+        sim.step()
+        for k in range(robots):
+            raw = [int(sim.channels[k, c]) for c in sim.drive_channels]
+            out = mixer.mix_into(filters[k].update(*(curve.lookup(v) for v in raw)))
+            if speeds is not None:
+                out = speeds[k].update(out, counts[k].tolist(), tick * period_ns)
+            worst = max(worst, float(np.abs(sim.commands[k] - np.asarray(out)).max()))
+    return {'robots': robots, 'ticks': ticks, 'closed_loop': speeds is not None, 'max_command_difference': worst}
+
+
+# Function to run one real control loop inside a fleet next to a vectorized twin
+def bench_headless(config, robots, seconds):
+    sim = FleetSim(config, robots, loads=(0.0, 0.1, 0.25))
+    channels = config['channels']
+    sim.channels[:, channels['drive2']] = 1800  # Forward
+    sim.channels[:, channels['drive3']] = 1560  # Turning slowly
+    robot = sim.attach(0)
+    start = time.perf_counter()
+    try:
+        sim.run(seconds)
+    finally:
+        sim.close()
+    elapsed = time.perf_counter() - start
+    loop = robot.loop
+    odometry = loop.odometry
+    pose = [round(float(v), 4) for v in sim.pose[0]]
+    twin = [round(float(v), 4) for v in sim.pose[1]]
+    return {
+        'robots': robots,
+        'closed_loop': robot.encoders is not None,
+        'wall_s': round(elapsed, 3),
+        'ticks': sim.ticks,
+        'overruns': sim.scheduler.overruns,
+        'true_pose': pose,
+        'twin_pose': twin,
+        'estimated_pose': [round(odometry.x, 4), round(odometry.y, 4), round(odometry.heading, 4)],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized fleet simulator")
+    parser.add_argument('--profile', default='sim')
+    parser.add_argument('--robots', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--seconds', type=float, default=10.0, help="simulated time per throughput run")
+    parser.add_argument('--headless-seconds', type=float, default=2.0, help="real time with the real loop")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    config = load_profile(args.profile)
+    results = {
+        'rate_hz': config['loop']['rate_hz'],
+        'throughput': [bench_throughput(config, robots, args.seconds, args.seed) for robots in args.robots],
+        'match': check_match(config, 20, 200, args.seed),
+        'headless': bench_headless(config, 1000, args.headless_seconds),
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    print(text)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+import argparse  # Import argparse library for command line options
+import gc
+import json  # Import json library for machine-readable results
+import math  # Import math library for synthetic stick motion
+import platform
+import random
+import sys
+import time  # Import time library for the high resolution timer
+import tracemalloc  # Import tracemalloc library to count memory allocated per tick
+from array import array
+
+from conditioning import StickCurve
+from filters import EMA, FilterBank
+from ibus import IBUS_FRAME_LEN, IBusParser, encode_frame
+from mixer import THREE_WHEEL, Mixer
+from motor_driver import DUAL_PWM, SimDriver
+
+# Motor pins as wired in wheel_control_english.py (forward, reverse) per motor
+MOTORS = [(17, 18), (27, 22), (23, 24)]
+
+# Pipeline stages in the order they run
+STAGES = ('decode', 'condition', 'filter', 'mix', 'output')
+
+
+# Function to build a synthetic iBus byte stream: one chunk of bytes per frame
+# The sticks sweep smoothly through their whole range; with noise > 0, random garbage bytes
+# are slipped in between frames so the parser has to resynchronize
+def synthetic_stream(frames, noise=0.0, seed=0):
+    rng = random.Random(seed)
+    chunks = []
+    for n in range(frames):
+        t = n / 100
+        values = [1500] * 14
+        values[1] = int(1500 + 500 * math.sin(t * 1.3))   # Forward/backward
+        values[3] = int(1500 + 500 * math.sin(t * 0.7))   # Left/right
+        values[4] = int(1500 + 300 * math.sin(t * 2.1))   # Rotation
+        chunk = bytes(encode_frame(values))
+        if noise and rng.random() < noise:
+            chunk = bytes(rng.randrange(256) for _ in range(rng.randrange(1, 8))) + chunk
+        chunks.append(chunk)
+    return chunks
+
+
+# Function to load a recorded raw iBus byte stream (e.g. captured with `cat /dev/ttyS0 > file`)
+def load_stream(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    return [data[i:i + IBUS_FRAME_LEN] for i in range(0, len(data), IBUS_FRAME_LEN)]
+
+
+# The control pipeline from wheel_control_english.py, on the simulated backends:
+# iBus bytes -> decode -> stick conditioning -> filter -> mix -> motor output
+class Pipeline:
+    def __init__(self, period_ms=10, time_constant_ms=8):
+        self.parser = IBusParser()
+        self.curve = StickCurve(scale=255)
+        self.filter = FilterBank(3, period_ms, EMA, time_constant_ms=time_constant_ms)
+        self.mixer = Mixer(THREE_WHEEL, limit=255)
+        self.driver = SimDriver(MOTORS, DUAL_PWM, record=False, deadband=1)
+
+    # Function to run one tick on a chunk of received bytes
+    def tick(self, chunk):
+        self.parser.feed(chunk)
+        ch = self.parser.channels
+        lookup = self.curve.lookup
+        drive = self.filter.update(lookup(ch[3]), lookup(ch[1]), lookup(ch[4]))
+        out = self.mixer.mix_into(drive)
+        self.driver.write_outputs(out)
+
+    # Function to run one tick and store each stage's time (ns) at position i of `timings`
+    def timed_tick(self, chunk, timings, i):
+        clock = time.perf_counter_ns
+        t0 = clock()
+        self.parser.feed(chunk)
+        t1 = clock()
+        ch = self.parser.channels
+        lookup = self.curve.lookup
+        d1, d2, d3 = lookup(ch[3]), lookup(ch[1]), lookup(ch[4])
+        t2 = clock()
+        drive = self.filter.update(d1, d2, d3)
+        t3 = clock()
+        out = self.mixer.mix_into(drive)
+        t4 = clock()
+        self.driver.write_outputs(out)
+        t5 = clock()
+        timings['decode'][i] = t1 - t0
+        timings['condition'][i] = t2 - t1
+        timings['filter'][i] = t3 - t2
+        timings['mix'][i] = t4 - t3
+        timings['output'][i] = t5 - t4
+        timings['end_to_end'][i] = t5 - t0
+
+
+# Function to summarize a list of ns samples as min/mean/p50/p99/max in microseconds
+def summarize(samples):
+    values = sorted(samples)
+    count = len(values)
+    if count == 0:
+        return {}
+    return {
+        'min': values[0] / 1000,
+        'mean': sum(values) / count / 1000,
+        'p50': values[count // 2] / 1000,
+        'p99': values[min(count - 1, int(count * 0.99))] / 1000,
+        'max': values[-1] / 1000,
+    }
+
+
+# Function to time every stage over the whole stream
+def bench_latency(chunks, period_ms=10):
+    pipeline = Pipeline(period_ms)
+    for chunk in chunks[:100]:
+        pipeline.tick(chunk)  # Warm up
+    pipeline.parser.frames = pipeline.parser.dropped_bytes = 0
+    pipeline.driver.writes_issued = pipeline.driver.writes_skipped = 0
+    timings = {name: array('q', [0] * len(chunks)) for name in STAGES + ('end_to_end',)}
+    start = time.perf_counter_ns()
+    for i, chunk in enumerate(chunks):
+        pipeline.timed_tick(chunk, timings, i)
+    elapsed = time.perf_counter_ns() - start
+    return pipeline, timings, elapsed
+
+
+# Function to measure throughput without the per-stage timers
+def bench_throughput(chunks, period_ms=10):
+    pipeline = Pipeline(period_ms)
+    start = time.perf_counter_ns()
+    for chunk in chunks:
+        pipeline.tick(chunk)
+    elapsed = time.perf_counter_ns() - start
+    return len(chunks) / (elapsed / 1e9)
+
+
+# Function to measure how long (in simulated control time) a full stick step takes to reach
+# 90% of its final PWM output, one frame per tick
+def bench_step_response(period_ms=10, threshold=0.9):
+    pipeline = Pipeline(period_ms)
+    neutral = bytes(encode_frame([1500] * 14))
+    full = [1500] * 14
+    full[1] = 2000  # Full forward
+    full = bytes(encode_frame(full))
+    for _ in range(10):
+        pipeline.tick(neutral)
+    final = Pipeline(period_ms)
+    for _ in range(200):
+        final.tick(full)
+    target = final.driver.speed(2) * threshold
+    for ticks in range(1, 200):
+        pipeline.tick(full)
+        if pipeline.driver.speed(2) >= target:
+            return ticks * period_ms
+    return None
+
+
+# Function to count memory allocated per steady-state tick with tracemalloc
+# - peak_bytes_per_tick: bytes allocated (and usually freed again) inside one tick
+# - retained_blocks_per_tick: memory blocks still alive after the run, per tick
+# - gc_objects_per_tick: GC-tracked objects (lists, tuples, dicts...) left alive per tick; this is
+#   the count that triggers garbage collections, the boxed ints and floats behind
+#   peak_bytes_per_tick never do
+def bench_allocations(chunks, period_ms=10):
+    pipeline = Pipeline(period_ms)
+    for chunk in chunks[:100]:
+        pipeline.tick(chunk)  # Warm up caches and lazily created objects
+    chunks = chunks[100:] or chunks
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    gc_before = gc.get_count()[0]
+    for chunk in chunks:
+        pipeline.tick(chunk)
+    gc_objects = gc.get_count()[0] - gc_before
+    if gc_was_enabled:
+        gc.enable()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    peak_total = 0
+    for chunk in chunks:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        pipeline.tick(chunk)
+        peak_total += tracemalloc.get_traced_memory()[1] - base
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = sum(stat.count_diff for stat in after.compare_to(before, 'filename')
+                   if not stat.traceback[0].filename.endswith('tracemalloc.py'))
+    return {
+        'peak_bytes_per_tick': peak_total / len(chunks),
+        'retained_blocks_per_tick': max(0, retained) / len(chunks),
+        'gc_objects_per_tick': max(0, gc_objects) / len(chunks),
+    }
+
+
+# Function to count allocations per steady-state tick of the shipped ControlLoop.tick, armed, on a
+# profile's simulated backends (the sim profile runs closed loop on SimWheels)
+# Frames go through a SimSerial into a ReceiverThread pumped between ticks, so only the tick itself
+# is measured. gc_objects_per_tick has to stay at 0 (see tests/test_allocations.py);
+# peak_bytes_per_tick never does, the floats behind the drive and wheel values are boxed.
+# retained_blocks / retained_bytes: what is still allocated after all the traced ticks. A few dozen
+# blocks stay whatever the tick count (the ints and floats the last tick left in attributes);
+# anything that grows with the tick count is a leak
+def bench_loop_allocations(chunks, profile='sim', ticks=1000):
+    from config import load_profile
+    from control import ControlLoop, open_driver
+    from encoders import open_encoders
+    from receiver import ReceiverThread
+    from sim_serial import SimSerial
+    config = load_profile(profile)
+    ser = SimSerial()
+    receiver = ReceiverThread(ser)
+    driver = open_driver(config['motors'])
+    encoders = open_encoders(config['encoders'], driver)
+    loop = ControlLoop(config, receiver, driver, encoders=encoders)
+    loop.armed = True
+
+    def feed(i):
+        ser.feed(chunks[i % len(chunks)])
+        receiver.pump(wait=False)
+
+    try:
+        for i in range(100):
+            feed(i)
+            loop.tick()  # Warm up caches and lazily created objects
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        gc_objects = 0
+        for i in range(ticks):
+            feed(i)
+            before = gc.get_count()[0]
+            loop.tick()
+            gc_objects += gc.get_count()[0] - before
+        if gc_was_enabled:
+            gc.enable()
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        peak_total = 0
+        for i in range(ticks):
+            feed(i)
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            loop.tick()
+            peak_total += tracemalloc.get_traced_memory()[1] - base
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+    finally:
+        if encoders is not None:
+            encoders.close()
+        driver.close()
+    retained = [stat for stat in after.compare_to(before, 'filename')
+                if not stat.traceback[0].filename.endswith('tracemalloc.py')]
+    return {
+        'profile': profile,
+        'closed_loop': encoders is not None,
+        'peak_bytes_per_tick': peak_total / ticks,
+        'retained_blocks': sum(stat.count_diff for stat in retained),
+        'retained_bytes': sum(stat.size_diff for stat in retained),
+        'gc_objects_per_tick': max(0, gc_objects) / ticks,
+    }
+
+
+# Function to run every benchmark and return the results as a dict
+def run(chunks, period_ms=10):
+    pipeline, timings, elapsed = bench_latency(chunks, period_ms)
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'frames': len(chunks),
+        'valid_frames': pipeline.parser.frames,
+        'dropped_bytes': pipeline.parser.dropped_bytes,
+        'pin_writes': pipeline.driver.writes_issued,
+        'pin_writes_skipped': pipeline.driver.writes_skipped,
+        'stages_us': {name: summarize(timings[name]) for name in STAGES},
+        'end_to_end_us': summarize(timings['end_to_end']),
+        'timed_run_s': elapsed / 1e9,
+        'throughput_fps': bench_throughput(chunks, period_ms),
+        'stick_to_pwm_ms': bench_step_response(period_ms),
+        'allocations': bench_allocations(chunks, period_ms),
+        'loop_allocations': bench_loop_allocations(chunks),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the decode -> filter -> mix -> output pipeline")
+    parser.add_argument('--frames', type=int, default=10000, help="synthetic frames to generate")
+    parser.add_argument('--input', help="recorded raw iBus byte stream to replay instead")
+    parser.add_argument('--noise', type=float, default=0.0, help="chance of garbage bytes before a frame")
+    parser.add_argument('--period-ms', type=float, default=10, help="control loop period")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the JSON results to this file")
+    parser.add_argument('--max-gc-objects', type=float, default=0,
+                        help="exit with an error if a ControlLoop tick leaves more GC-tracked objects than this")
+    parser.add_argument('--max-alloc-bytes', type=float,
+                        help="exit with an error if a ControlLoop tick allocates more bytes than this at its peak "
+                             "(boxed floats make this a few hundred bytes, it is never 0)")
+    parser.add_argument('--max-retained-blocks', type=int,
+                        help="exit with an error if more memory blocks than this are still allocated after the "
+                             "traced ControlLoop ticks (a few dozen always are, a leak grows with the tick count)")
+    args = parser.parse_args(argv)
+
+    chunks = load_stream(args.input) if args.input else synthetic_stream(args.frames, args.noise, args.seed)
+    results = run(chunks, args.period_ms)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    print(text)
+    loop_allocations = results['loop_allocations']
+    if loop_allocations['gc_objects_per_tick'] > args.max_gc_objects:
+        sys.exit("control loop leaves %.2f GC-tracked objects per tick (limit %g)"
+                 % (loop_allocations['gc_objects_per_tick'], args.max_gc_objects))
+    if args.max_alloc_bytes is not None and loop_allocations['peak_bytes_per_tick'] > args.max_alloc_bytes:
+        sys.exit("control loop allocates %.1f bytes per tick (limit %g)"
+                 % (loop_allocations['peak_bytes_per_tick'], args.max_alloc_bytes))
+    if args.max_retained_blocks is not None and loop_allocations['retained_blocks'] > args.max_retained_blocks:
+        sys.exit("control loop retains %d memory blocks (limit %d)"
+                 % (loop_allocations['retained_blocks'], args.max_retained_blocks))
+    return results
+
+
+if __name__ == "__main__":
+    main()
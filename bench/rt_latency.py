@@ -0,0 +1,102 @@
+import argparse  # Import argparse library for command line options
+import json  # Import json library for machine-readable results
+import threading  # Import threading library for the background load
+import time
+
+from config import load_profile
+from control import ControlLoop, open_driver, open_serial
+from receiver import ReceiverThread
+from rt_process import STATS_FIELDS, RealtimeController, loop_stats
+
+# Control loop tail latency, before and after moving it into its own process
+#     python -m bench.rt_latency --seconds 10 --cpu 3 --fifo 50
+# Both runs use the same profile (default: sim, no hardware needed). While the loop runs, this
+# process keeps a background thread busy allocating short-lived objects, which stands in for the
+# logging / camera / comms work and triggers the GC pauses seen on the robot.
+
+
+# Function to start the background load; returns an Event that stops it
+def start_load():
+    stop = threading.Event()
+
+    def churn():
+        while not stop.is_set():
+            junk = [{'n': i, 'items': [i] * 8} for i in range(2000)]  # GC-tracked garbage
+            sum(len(item['items']) for item in junk)
+
+    threading.Thread(target=churn, name='load', daemon=True).start()
+    return stop
+
+
+# Function to run the loop in this process, next to the load
+def run_inprocess(config, seconds, load):
+    ser = open_serial(config['serial'])
+    driver = open_driver(config['motors'])
+    receiver = ReceiverThread(ser)
+    loop = ControlLoop(config, receiver, driver)
+    receiver.start()
+    loop.warm_up(config['startup']['warmup_ticks'])
+    loop.armed = True
+    stop_load = start_load() if load else None
+    stop_at = time.monotonic() + seconds
+    try:
+        loop.run(lambda: time.monotonic() < stop_at)
+    finally:
+        if stop_load is not None:
+            stop_load.set()
+        receiver.stop()
+        driver.close()
+        ser.close()
+    result = dict(zip(STATS_FIELDS, loop_stats(loop.scheduler)))
+    result.update(ticks=loop.scheduler.ticks, overruns=loop.scheduler.overruns)
+    return result
+
+
+# Function to run the loop in the real-time control process while this process carries the load
+def run_realtime(config, seconds, load):
+    rt = RealtimeController(config)
+    rt.start()
+    rt.arm()
+    stop_load = start_load() if load else None
+    try:
+        time.sleep(seconds)
+    finally:
+        if stop_load is not None:
+            stop_load.set()
+        telemetry = rt.stop()
+    result = {name: telemetry[name] for name in STATS_FIELDS}
+    result.update(ticks=telemetry['ticks'], overruns=telemetry['overruns'])
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare control loop tail latency in-process vs. real-time process")
+    parser.add_argument('--profile', default='sim')
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--cpu', type=int, help="CPU core for the control process")
+    parser.add_argument('--fifo', type=int, default=0, help="SCHED_FIFO priority (needs root)")
+    parser.add_argument('--no-load', action='store_true', help="run without the background load")
+    parser.add_argument('--output', help="write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    config = load_profile(args.profile)
+    config['recorder']['path'] = None
+    config['realtime'].update(cpu=args.cpu, fifo_priority=args.fifo)
+    load = not args.no_load
+    results = {
+        'seconds': args.seconds,
+        'load': load,
+        'realtime_settings': config['realtime'],
+        'inprocess': run_inprocess(config, args.seconds, load),
+        'realtime': run_realtime(config, args.seconds, load),
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    print(text)
+    return results
+
+
+if __name__ == "__main__":
+    main()
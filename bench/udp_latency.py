@@ -0,0 +1,110 @@
+import argparse  # Import argparse library for command line options
+import json  # Import json library for machine-readable results
+import random
+import threading  # Import threading library to run the control loop next to the sender
+import time
+
+from bench.pipeline import summarize
+from config import load_profile
+from control import ControlLoop
+from ibus import IBUS_NEUTRAL, IBUS_NUM_CHANNELS
+from motor_driver import SimDriver
+from udp_input import UDPInput, UDPSender, encode_packet
+
+# UDP command input over loopback, no hardware needed
+#     python -m bench.udp_latency --packets 200 --rate-hz 100
+# - latency: time from sending a datagram to the first motor pin write it causes, with the real
+#   ControlLoop (sim driver, no filter smoothing) ticking at the profile's rate. Includes up to one
+#   loop period of waiting for the next tick.
+# - checks: out-of-order, late and malformed packets are dropped
+
+
+# Function to measure packet -> PWM latency
+def bench_latency(packets, rate_hz, gap_s, seed=0):
+    config = load_profile('sim')
+    config['loop']['rate_hz'] = rate_hz
+    config['filter']['time_constant_ms'] = 0  # Step straight to the new command
+    driver = SimDriver(config['motors']['pins'], config['motors']['mode'], record=True)
+    udp = UDPInput(0, '127.0.0.1')
+    loop = ControlLoop(config, udp, driver)
+    loop.armed = True
+    running = threading.Event()
+    running.set()
+    thread = threading.Thread(target=loop.run, args=(running.is_set,), name='control', daemon=True)
+    thread.start()
+
+    sender = UDPSender('127.0.0.1', udp.address[1])
+    rng = random.Random(seed)
+    channels = [IBUS_NEUTRAL] * IBUS_NUM_CHANNELS
+    channel = config['channels']['drive2']
+    sends = []
+    for i in range(packets):
+        channels[channel] = 1800 if i % 2 == 0 else 1200  # Forward / backward, every packet changes the output
+        sends.append(sender.send(channels))
+        time.sleep(gap_s * (0.5 + rng.random()))  # Random phase against the loop's ticks
+    running.clear()
+    thread.join()
+    sender.close()
+    udp.stop()
+
+    write_times = [t for t, _, _ in driver.writes]
+    latencies = []
+    w = 0
+    for sent in sends:
+        while w < len(write_times) and write_times[w] < sent:
+            w += 1
+        if w < len(write_times):
+            latencies.append(write_times[w] - sent)
+    return {
+        'packets': packets,
+        'accepted': udp.packets,
+        'rate_hz': rate_hz,
+        'packet_to_pwm_us': summarize(latencies),
+    }
+
+
+# Function to check that bad packets are dropped, over loopback
+def check_drops():
+    udp = UDPInput(0, '127.0.0.1', max_latency=0.02)
+    sock = UDPSender('127.0.0.1', udp.address[1]).sock
+    address = udp.address
+    neutral = [IBUS_NEUTRAL] * IBUS_NUM_CHANNELS
+    now = time.monotonic_ns()
+    sock.sendto(encode_packet(10, now, neutral), address)
+    sock.sendto(encode_packet(9, now, neutral), address)               # Older sequence number
+    sock.sendto(encode_packet(10, now, neutral), address)              # Repeat
+    sock.sendto(encode_packet(11, now - 100000000, neutral), address)  # Sent 100 ms "ago"
+    sock.sendto(b'garbage', address)
+    sock.sendto(encode_packet(12, time.monotonic_ns(), neutral), address)
+    time.sleep(0.01)
+    udp.poll()
+    result = {'accepted': udp.packets, 'dropped_old': udp.dropped_old, 'dropped_late': udp.dropped_late,
+              'bad_packets': udp.bad_packets, 'seq': udp.seq}
+    sock.close()
+    udp.stop()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark UDP command input latency over loopback")
+    parser.add_argument('--packets', type=int, default=200)
+    parser.add_argument('--rate-hz', type=float, default=100, help="control loop rate")
+    parser.add_argument('--gap-ms', type=float, default=20, help="mean time between packets")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    results = {
+        'latency': bench_latency(args.packets, args.rate_hz, args.gap_ms / 1000, args.seed),
+        'checks': check_drops(),
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    print(text)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import argparse  # Import argparse library for command line options
+import json  # Import json library for machine-readable results
+import time
+
+from encoders import PigpioEncoders
+from motor_driver import DUAL_PWM, SimDriver
+from sim_pigpio import SimPi
+from sim_wheels import SimWheels
+from wheel_speed import WheelSpeedController
+
+# Closed-loop wheel speed benchmark, no hardware needed
+#     python -m bench.wheel_speed --target 150 --seconds 3
+# - edges: how many encoder edges per second the quadrature callback can count, and whether the
+#   count comes out exact. The callback is called directly on this machine, without pigpiod's
+#   callback thread and queue, so it is an upper bound and says nothing about lost edges on a Pi
+# - loopback (on a Pi, with --loopback OUT_A OUT_B): pigpio waves generate a quadrature signal on
+#   two spare output pins, jumpered to the first encoder's A and B pins, at each --rates edge rate;
+#   the edges go through pigpiod and its callback thread like a real encoder's. lost = edges sent
+#   but not counted once the callback queue has drained
+#     sudo pigpiod && python -m bench.wheel_speed --loopback 5 6 --rates 1000 10000 50000
+# - drift: the three wheels of the sim model with different loads (slope / drag), driven open loop
+#   and with the PI controller; the spread between wheel speeds is what makes the robot drift
+
+MOTORS = [(17, 18), (27, 22), (23, 24)]
+ENCODERS = [(16, 20), (12, 13), (19, 26)]
+
+
+# Function to time the edge callback on a long quadrature sequence (called directly, see above)
+def bench_edges(edges, wheel=0):
+    pi = SimPi(record=False)
+    encoders = PigpioEncoders(ENCODERS, pi)
+    pin_a, pin_b = ENCODERS[wheel]
+    sequence = [(pin_a, 1), (pin_b, 1), (pin_a, 0), (pin_b, 0)]  # One full cycle forward = 4 counts
+    events = [sequence[i % 4] for i in range(edges)]
+    handler = encoders._edge
+    start = time.perf_counter_ns()
+    for pin, level in events:
+        handler(pin, level, 0)
+    elapsed = time.perf_counter_ns() - start
+    encoders.close()
+    return {
+        'edges': edges,
+        'edges_per_s': edges / (elapsed / 1e9),
+        'ns_per_edge': elapsed / edges,
+        'counted': encoders.counts[wheel],
+        'missed': encoders.missed,
+    }
+
+
+# Function to count a looped-back pigpio wave of quadrature edges at `rate` edges per second
+# - pi: a connected pigpio.pi(); out_pins: the (A, B) outputs wired to encoder_pins
+def bench_loopback(pi, out_pins, encoder_pins, rate, seconds, cycles_per_wave=250):
+    import pigpio
+    out_a, out_b = out_pins
+    for pin in out_pins:
+        pi.set_mode(pin, pigpio.OUTPUT)
+        pi.write(pin, 0)
+    encoders = PigpioEncoders([encoder_pins], pi)
+    step_us = max(1, round(1e6 / rate))
+    cycle = [pigpio.pulse(1 << out_a, 0, step_us), pigpio.pulse(1 << out_b, 0, step_us),
+             pigpio.pulse(0, 1 << out_a, step_us), pigpio.pulse(0, 1 << out_b, step_us)]
+    pi.wave_clear()
+    pi.wave_add_generic(cycle * cycles_per_wave)
+    wave = pi.wave_create()
+    loops = max(1, min(65535, round(seconds * 1e6 / (step_us * 4 * cycles_per_wave))))
+    sent = loops * cycles_per_wave * 4  # Every cycle ends low/low, so the exact count is known
+    start = time.monotonic()
+    pi.wave_chain([255, 0, wave, 255, 1, loops & 255, loops >> 8])
+    while pi.wave_tx_busy():
+        time.sleep(0.01)
+    elapsed = time.monotonic() - start
+    counted = None
+    while counted != encoders.counts[0]:  # Let pigpio's callback thread catch up
+        counted = encoders.counts[0]
+        time.sleep(0.2)
+    pi.wave_delete(wave)
+    encoders.close()
+    return {
+        'rate': 1e6 / step_us,
+        'seconds': round(elapsed, 2),
+        'sent': sent,
+        'counted': counted,
+        'lost': sent - counted,
+        'missed': encoders.missed,
+    }
+
+
+# Function to run the sim wheels for a while at one target speed, open or closed loop
+def run_wheels(target, seconds, loads, period_ms, closed_loop, max_counts_per_s=3000):
+    driver = SimDriver(MOTORS, DUAL_PWM, record=False)
+    wheels = SimWheels(driver, max_counts_per_s, loads=loads)
+    speed = WheelSpeedController(len(MOTORS), period_ms, max_counts_per_s)
+    targets = [target] * len(MOTORS)
+    period_ns = int(period_ms * 1e6)
+    now = 0
+    ticks = int(seconds * 1000 / period_ms)
+    start_counts = None
+    for tick in range(ticks):
+        out = speed.update(targets, wheels.counts, now) if closed_loop else targets
+        driver.write_outputs(out)
+        wheels.advance(period_ms / 1000)
+        now += period_ns
+        if tick == ticks // 2:
+            start_counts = list(wheels.counts)  # Measure over the second half (settled)
+    half = seconds - (ticks // 2 + 1) * period_ms / 1000
+    rates = [(wheels.counts[i] - start_counts[i]) / half * 255 / max_counts_per_s for i in range(len(MOTORS))]
+    return {'wheel_speeds': [round(r, 1) for r in rates], 'spread': round(max(rates) - min(rates), 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark encoder counting and closed-loop wheel speed control")
+    parser.add_argument('--target', type=float, default=150, help="wheel speed target (0-255)")
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--loads', type=float, nargs=3, default=[0.0, 0.1, 0.25], help="speed lost per wheel")
+    parser.add_argument('--period-ms', type=float, default=10)
+    parser.add_argument('--edges', type=int, default=200000)
+    parser.add_argument('--loopback', type=int, nargs=2, metavar=('OUT_A', 'OUT_B'),
+                        help="on a Pi: output pins jumpered to the first encoder's pins, to count a pigpio "
+                             "wave through pigpiod (see above)")
+    parser.add_argument('--rates', type=float, nargs='+', default=[1000, 5000, 20000, 50000],
+                        help="edge rates (per second) for --loopback")
+    parser.add_argument('--output', help="write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    results = {
+        'edges': bench_edges(args.edges),
+        'target': args.target,
+        'loads': args.loads,
+        'open_loop': run_wheels(args.target, args.seconds, args.loads, args.period_ms, False),
+        'closed_loop': run_wheels(args.target, args.seconds, args.loads, args.period_ms, True),
+    }
+    if args.loopback:
+        import pigpio
+        pi = pigpio.pi()
+        if not pi.connected:
+            raise RuntimeError("cannot connect to pigpiod (is the daemon running?)")
+        try:
+            results['loopback'] = [bench_loopback(pi, args.loopback, ENCODERS[0], rate, args.seconds)
+                                   for rate in args.rates]
+        finally:
+            pi.stop()
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    print(text)
+    return results
+
+
+if __name__ == "__main__":
+    main()
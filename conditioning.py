@@ -0,0 +1,62 @@
+from array import array  # Import array library for compact lookup tables
+
+# iBus stick range (microseconds): 1000 = full one way, 1500 = centered, 2000 = full the other way
+STICK_MIN = 1000
+STICK_CENTER = 1500
+STICK_MAX = 2000
+
+
+# Function to condition one normalized stick position (-1 to 1) with deadband and expo
+# - deadband: fraction of the half-range around center that reads as 0 (the rest is rescaled)
+# - expo: 0 = linear, 1 = fully cubic (softer around center, same full throw)
+def shape(x, deadband=0.0, expo=0.0):
+    magnitude = abs(x)
+    if magnitude <= deadband:
+        return 0.0
+    magnitude = (magnitude - deadband) / (1.0 - deadband)
+    magnitude = (1.0 - expo) * magnitude + expo * magnitude ** 3
+    return magnitude if x > 0 else -magnitude
+
+
+# Precomputed stick conditioning table: raw iBus value -> motor speed
+# Clamping, deadband, expo and scaling are all worked out once at startup, so conditioning a
+# channel in the control loop is a single array lookup.
+# - deadband: in iBus units around center (e.g. 10 means 1490-1510 reads as 0)
+# - expo: 0 = linear, 1 = fully cubic
+# - scale: output at full stick (255 = full motor speed)
+# - typecode: 'f' keeps fractions (default), 'h' stores whole numbers in half the memory
+class StickCurve:
+    def __init__(self, deadband=0, expo=0.0, scale=255, center=STICK_CENTER,
+                 low=STICK_MIN, high=STICK_MAX, typecode='f'):
+        if not 0.0 <= expo <= 1.0:
+            raise ValueError("expo must be between 0 and 1")
+        self.low = low
+        self.high = high
+        half_range = (high - low) / 2
+        dead = deadband / half_range
+        values = (scale * shape((raw - center) / half_range, dead, expo) for raw in range(low, high + 1))
+        if typecode == 'h':
+            values = (int(round(v)) for v in values)
+        self.table = array(typecode, values)
+
+    # Function to condition one raw channel value (values outside the range are clamped)
+    def lookup(self, raw):
+        if raw <= self.low:
+            return self.table[0]
+        if raw >= self.high:
+            return self.table[-1]
+        return self.table[raw - self.low]
+
+    # Function to condition a whole array of raw values at once with NumPy (same table as lookup())
+    def lookup_batch(self, raw):
+        import numpy as np
+        table = np.asarray(self.table)
+        return table[np.clip(raw, self.low, self.high) - self.low]
+
+
+# Function to build a duty-cycle table: motor speed -> PWM duty cycle
+# The table has one entry per integer speed from -max_speed to max_speed (511 entries for 255),
+# look it up with table[speed + max_speed]. The entry is the duty for the active side of the
+# H-bridge, so both directions give a positive duty.
+def duty_table(max_speed=255, max_duty=100.0, typecode='f'):
+    return array(typecode, (abs(speed) / max_speed * max_duty for speed in range(-max_speed, max_speed + 1)))
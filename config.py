@@ -0,0 +1,146 @@
+import copy
+import json  # Import json library to read profile files
+import os
+
+# Folder holding the robot profiles (one JSON file per robot / wiring)
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles')
+
+# Default settings; a profile only needs to list what it changes
+DEFAULTS = {
+    'serial': {
+        'port': '/dev/ttyS0',   # 'sim' = in-memory receiver sending neutral frames
+        'baud': 115200,
+        'timeout': 0.01,
+    },
+    'motors': {
+        'backend': 'rpi_gpio',  # 'pigpio', 'pigpio_sim', 'rpi_gpio' or 'sim'
+        'mode': 'dual_pwm',     # 'dir_pwm' (PWM + direction pin) or 'dual_pwm' (H-bridge)
+        'pins': [[17, 18], [27, 22], [23, 24]],
+        'options': {'deadband': 1},  # Extra backend options, e.g. 'frequency' (rpi_gpio, pigpio), 'pwm_range' (pigpio)
+    },
+    'udp': {                    # Ground station command input next to the RC receiver (see udp_input.py)
+        'port': None,           # UDP port to listen on, None = off (e.g. 5760)
+        'host': '0.0.0.0',
+        'priority': 'rc',       # 'rc' = the transmitter overrides the ground station, 'udp' = the reverse
+        'max_latency_ms': 50,   # Drop packets delayed this much more than the quickest recent one
+    },
+    'channels': {               # Which iBus channel feeds which drive axis
+        'drive1': 3,            # Left/right
+        'drive2': 1,            # Forward/backward
+        'drive3': 4,            # Rotation
+    },
+    'stick': {
+        'scale': 255,           # Output at full stick
+        'deadband': 0,          # iBus units around 1500 that read as 0
+        'expo': 0.0,            # 0 = linear, 1 = fully cubic
+    },
+    'filter': {
+        'mode': 'ema',          # 'ema', 'rate' or 'slew'
+        'time_constant_ms': 8,
+        'rate': None,           # Units per second for 'rate' / 'slew'
+        'decel_rate': None,
+    },
+    'mixer': {
+        'matrix': 'three_wheel',  # 'three_wheel', 'mecanum_4', 'x_drive_4' or a list of rows
+        'limit': 255,
+        'desaturate': True,
+    },
+    'motion': {                 # Scripted moves queued on ControlLoop.motion (see motion.py)
+        'ramp_s': 0.3,          # Default time to ramp between moves
+        'profile': 's_curve',   # 's_curve' or 'trapezoid'
+        'cancel_channel': None,  # iBus switch channel that cancels the script (e.g. 5)
+    },
+    'encoders': {               # Optional wheel encoders for closed-loop speed control (see wheel_speed.py)
+        'backend': None,        # None = open loop, 'pigpio' or 'sim' (simulated motors + encoders)
+        'pins': [[16, 20], [12, 13], [19, 26]],  # (A, B) per wheel, same order as the motors; clear of every profile's motor pins
+        'options': {},          # e.g. 'glitch_us' (pigpio), 'loads' / 'time_constant_s' (sim)
+        'max_counts_per_s': 3000,  # Count rate at full speed
+        'kp': 0.4,
+        'ki': 4.0,
+    },
+    'odometry': {               # Pose tracking from wheel speeds (see odometry.py)
+        'max_wheel_speed_mps': 0.5,  # Wheel rim speed at full output
+        'radius_m': 0.15,       # Robot center to wheel
+    },
+    'loop': {
+        'rate_hz': 100,
+        'spin_us': 200,
+        'frame_max_age_ms': 15,  # Older frames are treated as neutral
+    },
+    'metrics': {                # Live timing histograms and counters, Prometheus text format (see metrics.py)
+        'unix_socket': None,    # e.g. '/tmp/skysweeper.sock'
+        'http_port': None,      # e.g. 9105 (serves /metrics)
+        'http_host': '127.0.0.1',
+    },
+    'failsafe': {               # Independent watchdog on frame age and loop progress (see watchdog.py)
+        'deadline_ms': 50,      # None = no watchdog (e.g. scripted driving without a transmitter)
+        'action': 'cut',        # 'cut' = stop at once, 'ramp' = ramp the last speeds down
+        'ramp_ms': 200,
+        'check_ms': 5,
+    },
+    'recorder': {
+        'path': 'flight.rec',   # None to turn the flight recorder off
+        'capacity': 60000,
+        'flush_every': 0,       # Also flush from the control loop every N records (0 = only the thread below)
+        'flush_interval_s': 0.5,  # Background msync period, bounds what a power cut loses (0 = off)
+    },
+    'realtime': {               # Used with `skysweeper.py --realtime` (see rt_process.py)
+        'cpu': None,            # CPU core to pin the control process to (e.g. 3)
+        'fifo_priority': 0,     # SCHED_FIFO priority 1-99 (needs root), 0 = normal scheduling
+        'freeze_gc': True,      # Freeze and disable the garbage collector in the control process
+        'input': 'ibus',        # 'ibus' = control process reads the receiver, 'shared' = parent sends channels
+        'stats_every': 0,       # Publish tail latency every N ticks (0 = only when stopping)
+    },
+    'startup': {
+        'init_timeout_s': 3.0,  # Give up if the serial port or motor backend takes longer to open
+        'warmup_ticks': 50,     # Dry ticks (no motor output) run before arming
+        'budget_s': 2.0,        # Warn if start -> first valid motor command takes longer
+    },
+}
+
+
+# Function to merge a profile over the defaults (nested dicts are merged, everything else replaced)
+def merge(base, override):
+    result = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = merge(result[key], value)
+        else:
+            result[key] = value
+    return result
+
+
+# Function to list the profiles in PROFILE_DIR
+def list_profiles():
+    return sorted(name[:-5] for name in os.listdir(PROFILE_DIR) if name.endswith('.json'))
+
+
+# Function to load a profile by name (profiles/<name>.json) or by file path
+def load_profile(name_or_path):
+    path = name_or_path
+    if not os.path.exists(path):
+        path = os.path.join(PROFILE_DIR, name_or_path + '.json')
+    if not os.path.exists(path):
+        raise ValueError("unknown profile %r (available: %s)" % (name_or_path, ", ".join(list_profiles())))
+    with open(path) as f:
+        profile = json.load(f)
+    unknown = set(profile) - set(DEFAULTS) - {'description'}
+    if unknown:
+        raise ValueError("%s: unknown settings %s" % (path, ", ".join(sorted(unknown))))
+    config = merge(DEFAULTS, profile)
+    check_pins(config, path)
+    return config
+
+
+# Function to make sure no GPIO pin is used twice by the motors and (when enabled) the encoders
+def check_pins(config, path):
+    sections = ['motors']
+    if config['encoders']['backend'] is not None:
+        sections.append('encoders')
+    used = {}
+    for section in sections:
+        for pins in config[section]['pins']:
+            for pin in pins:
+                if pin in used:
+                    raise ValueError("%s: GPIO %d is used by both the %s and the %s pins" % (path, pin, used[pin], section))
+                used[pin] = section
@@ -0,0 +1,231 @@
+import time  # Import time library for timestamps
+from array import array
+from time import monotonic_ns
+
+from conditioning import StickCurve
+from filters import FilterBank
+from metrics import Histogram
+from mixer import MECANUM_4, THREE_WHEEL, X_DRIVE_4, Mixer
+from motion import MotionQueue
+from motor_driver import MAX_SPEED, create_driver
+from odometry import Odometry
+from scheduler import LoopScheduler
+from wheel_speed import WheelSpeedController
+
+# Mixing matrices that profiles can refer to by name
+MATRICES = {
+    'three_wheel': THREE_WHEEL,
+    'mecanum_4': MECANUM_4,
+    'x_drive_4': X_DRIVE_4,
+}
+
+# iBus value above which a switch channel counts as on
+SWITCH_ON = 1700
+
+
+# Function to build the mixer described by a profile
+def make_mixer(settings):
+    matrix = settings['matrix']
+    if isinstance(matrix, str):
+        matrix = MATRICES[matrix]
+    return Mixer(matrix, limit=settings['limit'], desaturate=settings['desaturate'])
+
+
+# Function to open the iBus serial port ('sim' gives an in-memory receiver with centered sticks)
+def open_serial(settings):
+    if settings['port'] == 'sim':
+        from sim_serial import SimSerial, start_frame_stream
+        ser = SimSerial(timeout=settings['timeout'])
+        start_frame_stream(ser, [1500] * 14)
+        return ser
+    import serial  # Only needed with a real receiver
+    return serial.Serial(settings['port'], settings['baud'], timeout=settings['timeout'])
+
+
+# Function to open the motor driver backend named in the profile
+def open_driver(settings):
+    return create_driver(settings['backend'], settings['pins'], settings['mode'], **settings['options'])
+
+
+# One control loop: receiver channels -> stick curve -> filter -> mixer -> motor driver
+# This is the same tick the scripts run, built from a config profile (see config.py)
+# Scripted moves queued on self.motion (see motion.py) are added on top of the filtered sticks, so
+# scripts and RC share the mixer and driver. Flipping the profile's motion cancel_channel switch
+# drops the script and stops its part of the command at once.
+# - receiver: anything with read(max_age) returning the 14 channels (e.g. ReceiverThread)
+# - driver: a MotorDriver
+# - recorder: optional flight Recorder
+# - encoders: optional wheel encoders (see encoders.py); with them the mixer's outputs become wheel
+#   speed targets for a WheelSpeedController instead of going straight to the motors
+# While armed, self.odometry tracks the pose from the measured wheel speeds (with encoders) or the
+# commanded ones (without). The recorder logs the mixer outputs, and with encoders also the
+# measured speeds
+class ControlLoop:
+    __slots__ = ('config', 'receiver', 'driver', 'recorder', 'ch1', 'ch2', 'ch3', 'curve', 'filter',
+                 'mixer', 'scheduler', 'frame_max_age', 'armed', 'motion', 'cancel_channel', 'drive',
+                 'encoders', 'speed', 'odometry', 'duties',
+                 'stage_times', 'link_ok', 'failsafe_trips', 'watchdog', 'output', 'driving', 'was_armed')
+
+    def __init__(self, config, receiver, driver, recorder=None, encoders=None):
+        self.config = config
+        self.receiver = receiver
+        self.driver = driver
+        self.recorder = recorder
+        self.encoders = encoders
+        channels = config['channels']
+        self.ch1, self.ch2, self.ch3 = channels['drive1'], channels['drive2'], channels['drive3']
+        stick = config['stick']
+        self.curve = StickCurve(deadband=stick['deadband'], expo=stick['expo'], scale=stick['scale'])
+        loop = config['loop']
+        period_ms = 1000 / loop['rate_hz']
+        filt = config['filter']
+        self.filter = FilterBank(3, period_ms, filt['mode'], time_constant_ms=filt['time_constant_ms'],
+                                 rate=filt['rate'], decel_rate=filt['decel_rate'])
+        self.mixer = make_mixer(config['mixer'])
+        self.scheduler = LoopScheduler(loop['rate_hz'], spin_us=loop['spin_us'])
+        self.frame_max_age = loop['frame_max_age_ms'] / 1000
+        self.armed = False
+        motion = config['motion']
+        self.motion = MotionQueue(3, period_ms, ramp_s=motion['ramp_s'], profile=motion['profile'])
+        self.cancel_channel = motion['cancel_channel']
+        self.drive = array('d', [0.0] * 3)  # Sticks + scripted moves
+        odo = config['odometry']
+        self.odometry = Odometry(self.mixer.matrix, odo['max_wheel_speed_mps'], odo['radius_m'],
+                                 limit=config['mixer']['limit'])
+        self.speed = None
+        self.duties = array('d', [0.0] * self.mixer.num_wheels)  # Logged duty cycles in closed loop
+        # Time spent in each part of tick() (see metrics.py); always on, recording costs ~100 ns each
+        self.stage_times = {name: Histogram() for name in ('read', 'filter', 'mix', 'output', 'tick')}
+        self.link_ok = False     # Whether the last read had a fresh frame
+        self.failsafe_trips = 0  # Fresh -> stale transitions (sticks fell back to neutral)
+        self.watchdog = None     # Set by FailsafeWatchdog (see watchdog.py)
+        self.output = None       # Last speeds sent to the motors (None again once stopped on disarm)
+        self.driving = False     # Whether the last tick sent them (armed, watchdog not tripped)
+        self.was_armed = False   # self.armed as of the last tick, to catch the disarm edge
+        if encoders is not None:
+            enc = config['encoders']
+            self.speed = WheelSpeedController(self.mixer.num_wheels, period_ms, enc['max_counts_per_s'],
+                                              kp=enc['kp'], ki=enc['ki'], limit=config['mixer']['limit'])
+
+    # Function to run one tick; with armed=False nothing is sent to the motors or recorded
+    # (the first tick after disarming stops the motors once, see _disarm())
+    # Every stage writes into its own preallocated buffer, so a tick creates no lasting objects
+    def tick(self):
+        t0 = monotonic_ns()
+        receiver = self.receiver
+        ch = receiver.read(self.frame_max_age)
+        fresh = ch is not receiver.neutral
+        if fresh != self.link_ok:
+            self.link_ok = fresh
+            if not fresh:
+                self.failsafe_trips += 1
+                if self.speed is not None:
+                    self.speed.reset()  # Don't push the integral built up on the sticks into neutral
+        if self.armed != self.was_armed:
+            self.was_armed = self.armed
+            if not self.armed:
+                self._disarm()
+        t1 = monotonic_ns()
+        lookup = self.curve.lookup
+        drive = self.filter.update(lookup(ch[self.ch1]), lookup(ch[self.ch2]), lookup(ch[self.ch3]))
+        motion = self.motion
+        if motion.active():
+            if self.cancel_channel is not None and ch[self.cancel_channel] > SWITCH_ON:
+                motion.cancel(0)
+            scripted, total = motion.update(), self.drive
+            for i in range(3):
+                total[i] = drive[i] + scripted[i]
+            drive = total
+        t2 = monotonic_ns()
+        out = self.mixer.mix_into(drive)
+        t3 = monotonic_ns()
+        driving = False
+        if self.armed:
+            watchdog = self.watchdog
+            if watchdog is None:
+                out = self._output(ch, drive, out, t3)
+                driving = True
+            else:
+                watchdog.heartbeat = t3
+                with watchdog.lock:
+                    if not watchdog.tripped:
+                        out = self._output(ch, drive, out, t3)
+                        driving = True
+                if watchdog.tripped:  # The watchdog has the motors; start from 0 once it lets go
+                    self.filter.reset()
+                    if motion.active():
+                        motion.cancel(0)
+        if driving != self.driving:
+            self.driving = driving
+            if not driving and self.speed is not None:
+                self.speed.reset()  # Disarmed or tripped: no windup left for the next time it drives
+        t4 = monotonic_ns()
+        times = self.stage_times
+        times['read'].record(t1 - t0)
+        times['filter'].record(t2 - t1)
+        times['mix'].record(t3 - t2)
+        times['output'].record(t4 - t3)
+        times['tick'].record(t4 - t0)
+        return out
+
+    # Function to stop the motors on disarm and drop everything that would move them again on re-arm:
+    # filter state, the wheel-speed integral and any scripted move
+    def _disarm(self):
+        watchdog = self.watchdog
+        if watchdog is None:
+            self.driver.stop()
+        else:
+            with watchdog.lock:
+                self.driver.stop()
+        self.output = None
+        self.filter.reset()
+        if self.speed is not None:
+            self.speed.reset()
+        if self.motion.active():
+            self.motion.cancel(0)
+
+    # Function to send one tick's wheel speeds to the motors (closed loop, odometry and recorder too)
+    def _output(self, ch, drive, out, now):
+        speed = self.speed
+        targets = out
+        if speed is None:
+            wheels = out
+        else:
+            out = speed.update(targets, self.encoders.sample(), now)
+            wheels = speed.measured
+        self.odometry.update(wheels, now)
+        self.driver.write_outputs(out)
+        self.output = out
+        if self.recorder is not None:
+            if speed is None:
+                self.recorder.record(ch, drive, out)
+            else:  # Mixer targets, the controller's output as duty cycles, and the measured speeds
+                duties = self.duties
+                for i in range(len(out)):
+                    duties[i] = out[i] / MAX_SPEED * 100
+                self.recorder.record(ch, drive, targets, duties, speeds=wheels)
+        return out
+
+    # Function to run a few ticks without touching the motors, so every code path and lookup
+    # table is loaded and warmed before the first real command
+    def warm_up(self, ticks):
+        for _ in range(ticks):
+            self.tick()
+        self.filter.reset()
+        if self.speed is not None:
+            self.speed.reset()
+        for histogram in self.stage_times.values():
+            histogram.reset()  # Warm-up ticks aren't representative
+        self.failsafe_trips = 0
+
+    # Function to run the loop at the configured rate until `running()` returns False
+    def run(self, running=lambda: True):
+        wait, tick = self.scheduler.wait, self.tick
+        while running():
+            wait()
+            tick()
+
+    # Function to tell whether the receiver currently has a fresh frame
+    def has_fresh_frame(self):
+        sample = self.receiver.latest()
+        return sample.timestamp is not None and time.monotonic() - sample.timestamp <= self.frame_max_age
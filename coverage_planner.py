@@ -0,0 +1,533 @@
+import heapq  # Import heapq library for the A* open list
+import math  # Import math library for the route geometry
+from collections import namedtuple
+
+# Roof coverage planning
+# - OccupancyGrid: the roof as square cells, one bit per cell (1 = blocked: outside the roof edge,
+#   an obstacle, or too close to either)
+# - CoveragePlanner: boustrophedon (lawnmower) route over the free cells, replanned locally when a
+#   cell gets blocked
+# - route_moves(): the route as timed holonomic drive commands for a MotionQueue / the mixers
+# Grid coordinates are (col, row): col grows along +x, row along +y. Passes run along the rows,
+# so the cell size is the sweep width.
+
+
+# Bit-packed occupancy grid: each row is `stride` bytes, cell (col, row) is bit col % 8 of byte
+# row * stride + col // 8. A whole row converts to one Python int (bit col = cell col) for fast
+# row operations: finding free runs, filling polygon spans, inflating obstacles.
+class OccupancyGrid:
+    __slots__ = ('cols', 'rows', 'cell_m', 'origin', 'stride', 'bits', 'mask')
+
+    def __init__(self, cols, rows, cell_m, origin=(0.0, 0.0)):
+        self.cols = cols
+        self.rows = rows
+        self.cell_m = cell_m
+        self.origin = (float(origin[0]), float(origin[1]))  # x, y of the grid's lower-left corner (m)
+        self.stride = (cols + 7) // 8
+        self.bits = bytearray(self.stride * rows)  # All free
+        self.mask = (1 << cols) - 1
+
+    # Function to rasterize a roof: cells whose centers lie inside `roof` and outside every obstacle
+    # are free, the rest blocked. Polygons are lists of (x, y) in meters.
+    # - margin_m: also block cells within this distance of a blocked cell (half the robot's width)
+    @classmethod
+    def from_polygon(cls, roof, obstacles=(), cell_m=0.25, margin_m=0.0):
+        pad = int(math.ceil(margin_m / cell_m))
+        xs = [x for x, _ in roof]
+        ys = [y for _, y in roof]
+        origin = (min(xs) - pad * cell_m, min(ys) - pad * cell_m)
+        cols = int(math.ceil((max(xs) - min(xs)) / cell_m)) + 2 * pad
+        rows = int(math.ceil((max(ys) - min(ys)) / cell_m)) + 2 * pad
+        grid = cls(cols, rows, cell_m, origin)
+        for row in range(rows):
+            inside = 0
+            for start, end in grid._spans(roof, row):
+                inside |= ((1 << (end - start + 1)) - 1) << start
+            for obstacle in obstacles:
+                for start, end in grid._spans(obstacle, row):
+                    inside &= ~(((1 << (end - start + 1)) - 1) << start)
+            grid.set_row(row, ~inside)
+        if pad:
+            grid.inflate(pad)
+        return grid
+
+    # Function to find the runs of cells in a row whose centers lie inside a polygon
+    def _spans(self, polygon, row):
+        ox, oy = self.origin
+        cell = self.cell_m
+        y = oy + (row + 0.5) * cell
+        crossings = []
+        count = len(polygon)
+        for i in range(count):
+            x1, y1 = polygon[i]
+            x2, y2 = polygon[(i + 1) % count]
+            if (y1 <= y < y2) or (y2 <= y < y1):
+                crossings.append(x1 + (y - y1) * (x2 - x1) / (y2 - y1))
+        crossings.sort()
+        spans = []
+        for i in range(0, len(crossings) - 1, 2):
+            start = max(0, int(math.ceil((crossings[i] - ox) / cell - 0.5)))
+            end = min(self.cols - 1, int(math.ceil((crossings[i + 1] - ox) / cell - 0.5)) - 1)
+            if start <= end:
+                spans.append((start, end))
+        return spans
+
+    # Function to get a row as an int, bit col set = blocked
+    def row_bits(self, row):
+        offset = row * self.stride
+        return int.from_bytes(self.bits[offset:offset + self.stride], 'little')
+
+    # Function to replace a whole row (bits beyond the last column are dropped)
+    def set_row(self, row, value):
+        offset = row * self.stride
+        self.bits[offset:offset + self.stride] = (value & self.mask).to_bytes(self.stride, 'little')
+
+    def is_blocked(self, col, row):
+        if not (0 <= col < self.cols and 0 <= row < self.rows):
+            return True
+        return self.bits[row * self.stride + (col >> 3)] >> (col & 7) & 1 == 1
+
+    def set_blocked(self, col, row, blocked=True):
+        index = row * self.stride + (col >> 3)
+        if blocked:
+            self.bits[index] |= 1 << (col & 7)
+        else:
+            self.bits[index] &= ~(1 << (col & 7)) & 0xFF
+
+    # Function to list the free runs of a row as (first col, last col) pairs
+    def free_runs(self, row):
+        free = ~self.row_bits(row) & self.mask
+        runs = []
+        while free:
+            start = (free & -free).bit_length() - 1
+            run = free >> start
+            length = ((run + 1) & ~run).bit_length() - 1  # Position of the first blocked cell after start
+            runs.append((start, start + length - 1))
+            free &= ~(((1 << length) - 1) << start)
+        return runs
+
+    # Function to grow every blocked area by `cells` cells in each direction (square neighbourhood)
+    def inflate(self, cells):
+        wide = []
+        for row in range(self.rows):
+            bits = self.row_bits(row)
+            grown = bits
+            for shift in range(1, cells + 1):
+                grown |= (bits << shift) | (bits >> shift)
+            wide.append(grown)
+        for row in range(self.rows):
+            grown = 0
+            for other in range(max(0, row - cells), min(self.rows, row + cells + 1)):
+                grown |= wide[other]
+            self.set_row(row, grown)
+
+    def free_count(self):
+        return sum(bin(~self.row_bits(row) & self.mask).count('1') for row in range(self.rows))
+
+    # Function to get the center of a cell in meters
+    def center(self, col, row):
+        return (self.origin[0] + (col + 0.5) * self.cell_m, self.origin[1] + (row + 0.5) * self.cell_m)
+
+    # Function to find the cell containing a point in meters
+    def cell_at(self, x, y):
+        return (int((x - self.origin[0]) // self.cell_m), int((y - self.origin[1]) // self.cell_m))
+
+
+# Route leg kinds
+SWEEP = 'sweep'      # Back and forth over one cell of the decomposition
+TRANSIT = 'transit'  # Shortest path between two sweeps
+
+# One piece of the route
+# - points: corner points in grid coordinates (col, row)
+# - cell: index into CoveragePlanner.cells for sweeps, None for transits
+# - path: every grid cell a transit passes through (to find transits a new obstacle cuts), None for sweeps
+Leg = namedtuple('Leg', ['kind', 'points', 'cell', 'path'])
+
+
+# Function to split rows of free runs into boustrophedon cells
+# - rows: (row, [(first col, last col), ...]) pairs, rows ascending
+# Returns a list of cells, each a dict of row -> (first col, last col). A cell grows upward while
+# its run overlaps exactly one run of the next row and that run overlaps only it; anywhere the free
+# space splits or joins (an obstacle starts or ends) new cells begin. Each cell can be swept with
+# one back-and-forth pass per row without leaving it.
+def decompose(rows):
+    cells = []
+    open_runs = []  # (cell index, run) on the previous row
+    previous_row = None
+    for row, runs in rows:
+        above = open_runs if previous_row is not None and row == previous_row + 1 else []
+        open_runs = []
+        for run in runs:
+            below = [item for item in above if item[1][0] <= run[1] and run[0] <= item[1][1]]
+            if len(below) == 1:
+                index, prev = below[0]
+                if sum(1 for other in runs if prev[0] <= other[1] and other[0] <= prev[1]) == 1:
+                    cells[index][row] = run
+                    open_runs.append((index, run))
+                    continue
+            cells.append({row: run})
+            open_runs.append((len(cells) - 1, run))
+        previous_row = row
+    return cells
+
+
+# Function to lay out the back-and-forth passes over one cell
+# - entry: which corner to start at: (from_top, from_right)
+# Returns the corner points in grid coordinates
+def sweep_points(cell, entry):
+    from_top, from_right = entry
+    rows = sorted(cell, reverse=from_top)
+    points = []
+    right = from_right
+    for i, row in enumerate(rows):
+        first, last = cell[row]
+        start, end = (last, first) if right else (first, last)
+        if i:
+            prev_row = rows[i - 1]
+            x = points[-1][0]
+            if (right and start < x) or (not right and start > x):
+                points.append((start, prev_row))  # Slide along the swept row, then step over
+                points.append((start, row))
+            else:
+                points.append((x, row))           # Step over, then slide along the new row
+                points.append((start, row))
+        else:
+            points.append((start, row))
+        points.append((end, row))
+        right = not right
+    return _compress(points)
+
+
+# Function to drop repeated and collinear corner points
+def _compress(points):
+    out = []
+    for point in points:
+        if out and point == out[-1]:
+            continue
+        if len(out) >= 2:
+            (x0, y0), (x1, y1) = out[-2], out[-1]
+            if (x1 - x0) * (point[1] - y1) == (y1 - y0) * (point[0] - x1) and \
+                    (x1 - x0) * (point[0] - x1) + (y1 - y0) * (point[1] - y1) >= 0:
+                out[-1] = point  # Same direction, extend the last segment
+                continue
+        out.append(point)
+    return out
+
+
+# The four corners a cell's sweep can start from, with the point it starts at
+def _entries(cell):
+    bottom, top = min(cell), max(cell)
+    return [((False, False), (cell[bottom][0], bottom)), ((False, True), (cell[bottom][1], bottom)),
+            ((True, False), (cell[top][0], top)), ((True, True), (cell[top][1], top))]
+
+
+# Neighbour steps with integer costs (10 straight, 14 diagonal): with exact costs, equally good
+# paths tie exactly, so the tie-break below works (float sqrt(2) sums differ in the last bit)
+_STEPS = ((1, 0, 10), (-1, 0, 10), (0, 1, 10), (0, -1, 10),
+          (1, 1, 14), (1, -1, 14), (-1, 1, 14), (-1, -1, 14))
+
+
+# Function to find a short free path between two cells (A*, 8-connected, no corner cutting)
+# Returns the list of cells from start to goal, or None if the goal can't be reached
+# - explored: optional set, filled with every cell expanded; when the goal can't be reached that is
+#   every cell reachable from start
+def shortest_path(grid, start, goal, explored=None):
+    if start == goal:
+        return [start]
+    blocked = grid.is_blocked
+    gx, gy = goal
+    cost = {start: 0}
+    parent = {start: None}
+    done = explored if explored is not None else set()
+    open_list = [(0, 0, start)]
+    while open_list:
+        _, _, current = heapq.heappop(open_list)
+        if current == goal:
+            path = []
+            while current is not None:
+                path.append(current)
+                current = parent[current]
+            return path[::-1]
+        if current in done:
+            continue  # Stale entry, already expanded at a lower cost
+        done.add(current)
+        x, y = current
+        base = cost[current]
+        for dx, dy, step in _STEPS:
+            nx, ny = x + dx, y + dy
+            if blocked(nx, ny) or (dx and dy and (blocked(x + dx, y) or blocked(x, y + dy))):
+                continue
+            new_cost = base + step
+            node = (nx, ny)
+            if new_cost < cost.get(node, math.inf):
+                cost[node] = new_cost
+                parent[node] = current
+                ex, ey = abs(nx - gx), abs(ny - gy)
+                estimate = 10 * (ex + ey) - 6 * min(ex, ey)  # Octile distance
+                # The estimate is weighted up by 5% and ties go to the node closest to the goal: on an
+                # open roof a small detour at the goal (e.g. into a notch) would otherwise make A*
+                # flood everything between start and goal. Paths stay within 5% of the shortest.
+                heapq.heappush(open_list, (new_cost + estimate + estimate // 20, estimate, node))
+    return None
+
+
+# Function to find the free cell closest to `cell` (itself if it's free); None if there is none
+def nearest_free(grid, cell):
+    col, row = cell
+    for radius in range(max(grid.cols, grid.rows) + 1):
+        ring = [(dc * dc + dr * dr, (col + dc, row + dr))
+                for dc in range(-radius, radius + 1) for dr in range(-radius, radius + 1)
+                if max(abs(dc), abs(dr)) == radius and not grid.is_blocked(col + dc, row + dr)]
+        if ring:
+            return min(ring)[1]
+    return None
+
+
+# Raised while repairing the route when a leg would have to start somewhere the route's start can't
+# reach (a new obstacle closed it into a pocket); block() then plans the whole route again
+class _Stranded(Exception):
+    pass
+
+
+# Boustrophedon coverage route over an OccupancyGrid
+# plan() splits the free space into cells (see decompose()), then visits them one after another,
+# preferring a neighbour of the cell just swept, each from its nearest corner, joined by shortest
+# paths. block() marks a newly found obstacle and repairs the route locally: only the cell it falls
+# in is decomposed and swept again, and only the transits next to it or through the new obstacle are
+# searched again; every other leg is kept as it was. If the obstacle shuts part of the route into a
+# pocket the start can't reach (or lands on the start), the whole route is planned again instead, so
+# a repaired route always covers the same cells as a fresh plan().
+# - start: (col, row) the robot starts from (default: the first cell's lower-left corner)
+#
+# Usage:
+#     grid = OccupancyGrid.from_polygon(roof, obstacles, cell_m=0.3, margin_m=0.15)
+#     planner = CoveragePlanner(grid)
+#     planner.plan()
+#     moves = route_moves(planner.waypoints(), config, speed_mps=0.3)
+#     planner.block(*grid.cell_at(x, y))   # e.g. a bumper hit, then re-send the remaining moves
+class CoveragePlanner:
+    def __init__(self, grid, start=None):
+        self.grid = grid
+        self.start = start
+        self.cells = []       # Cells of the decomposition: dicts of row -> (first col, last col)
+        self.legs = []        # Leg tuples: a transit before every sweep
+        self.position = None  # Where the route starts
+
+    # Function to plan the whole route
+    def plan(self):
+        grid = self.grid
+        self.cells = decompose((row, grid.free_runs(row)) for row in range(grid.rows))
+        if not self.cells:
+            self.legs = []
+            return self.legs
+        position = self.start if self.start is not None else _entries(self.cells[0])[0][1]
+        if grid.is_blocked(*position):
+            raise ValueError("start cell %r is blocked" % (position,))
+        self.position = position
+        self.legs = self._visit(range(len(self.cells)), position, prefer=_adjacency(self.cells))
+        return self.legs
+
+    # Function to sweep a set of cells in a good order from `position`; returns the legs
+    def _visit(self, indexes, position, prefer=None):
+        remaining = set(indexes)
+        legs = []
+        last = None
+        while remaining:
+            candidates = remaining
+            if prefer is not None and last is not None and prefer[last] & remaining:
+                candidates = prefer[last] & remaining
+            distance, index, entry, point = min(
+                (abs(point[0] - position[0]) + abs(point[1] - position[1]), index, entry, point)
+                for index in candidates for entry, point in _entries(self.cells[index]))
+            remaining.discard(index)
+            path = self._path(position, point)
+            if path is None:
+                continue  # Cut off from the start
+            points = sweep_points(self.cells[index], entry)
+            legs.append(Leg(TRANSIT, _compress(path), None, path))
+            legs.append(Leg(SWEEP, points, index, None))
+            position = points[-1]
+            last = index
+        return legs
+
+    # Function to mark a cell blocked and repair the route around it
+    # Returns the number of legs that were replaced or searched again (0 if nothing changed)
+    def block(self, col, row):
+        grid = self.grid
+        if grid.is_blocked(col, row):
+            return 0
+        grid.set_blocked(col, row)
+        if (col, row) == self.position:  # Start from the closest free cell instead
+            self.start = nearest_free(grid, self.position)
+            return len(self.plan())
+        changed = 0
+        try:
+            for i, leg in enumerate(self.legs):
+                if leg.kind == SWEEP:
+                    first, last = self.cells[leg.cell].get(row, (1, 0))
+                    if first <= col <= last:
+                        changed += self._split(i, col, row)
+                        break
+            # Transits elsewhere that ran through the new obstacle
+            i = 0
+            while i < len(self.legs):
+                leg = self.legs[i]
+                if leg.kind == TRANSIT and (col, row) in leg.path:
+                    changed += self._reroute(i)
+                i += 1
+        except _Stranded:
+            self.start = self.position  # Same start as the route being replaced
+            return len(self.plan())
+        return changed
+
+    # Function to replace sweep leg i by sweeps of what is left of its cell
+    def _split(self, i, col, row):
+        index = self.legs[i].cell
+        cell = self.cells[index]
+        rows = []
+        for r in sorted(cell):
+            first, last = cell[r]
+            runs = [(first, last)] if r != row else [run for run in ((first, col - 1), (col + 1, last))
+                                                        if run[0] <= run[1]]
+            if runs:
+                rows.append((r, runs))
+        parts = decompose(rows)
+        cell.clear()  # The old cell is now empty; its parts are appended as new cells
+        base = len(self.cells)
+        self.cells.extend(parts)
+        position = self.legs[i - 1].points[0]  # Where the transit into the old sweep started
+        legs = self._visit(range(base, base + len(parts)), position)
+        self.legs[i - 1:i + 1] = legs
+        changed = len(legs)
+        after = i - 1 + len(legs)
+        if after < len(self.legs):  # The transit out now starts from a different point
+            changed += self._reroute(after)
+        return changed
+
+    # Function to search transit leg i again between the end of the previous sweep and the next one
+    def _reroute(self, i):
+        start = self.legs[i - 1].points[-1] if i > 0 else self.position
+        goal = self.legs[i + 1].points[0]
+        path = self._path(start, goal)
+        if path is None:  # The next sweep got cut off: drop it
+            del self.legs[i:i + 2]
+            if i < len(self.legs):
+                return 1 + self._reroute(i)
+            return 1
+        self.legs[i] = Leg(TRANSIT, _compress(path), None, path)
+        return 1
+
+    # Function to search a transit; None if the goal is cut off from the route's start
+    # Raises _Stranded if it's `start` that is cut off from the route's start instead
+    def _path(self, start, goal):
+        explored = set()
+        path = shortest_path(self.grid, start, goal, explored)
+        if path is None and start != self.position and self.position not in explored:
+            raise _Stranded()
+        return path
+
+    # Function to get the whole route as points in meters
+    def waypoints(self):
+        center = self.grid.center
+        points = []
+        for leg in self.legs:
+            for col, row in leg.points:
+                point = center(col, row)
+                if not points or points[-1] != point:
+                    points.append(point)
+        return points
+
+    # Function to summarize the route: lengths in meters and how much of the free roof it sweeps
+    def stats(self):
+        cell = self.grid.cell_m
+        lengths = {SWEEP: 0.0, TRANSIT: 0.0}
+        for leg in self.legs:
+            for (x0, y0), (x1, y1) in zip(leg.points, leg.points[1:]):
+                lengths[leg.kind] += math.hypot(x1 - x0, y1 - y0) * cell
+        swept = sum(last - first + 1 for leg in self.legs if leg.kind == SWEEP
+                    for first, last in self.cells[leg.cell].values())
+        free = self.grid.free_count()
+        return {
+            'cells': sum(1 for cell_rows in self.cells if cell_rows),
+            'legs': len(self.legs),
+            'sweep_m': lengths[SWEEP],
+            'transit_m': lengths[TRANSIT],
+            'free_cells': free,
+            'coverage': swept / free if free else 1.0,
+            'unreachable_cells': free - swept,  # Cut off from the start
+        }
+
+
+# Function to find which cells touch (runs overlapping on neighbouring rows)
+def _adjacency(cells):
+    by_row = {}
+    for index, cell in enumerate(cells):
+        for row, run in cell.items():
+            by_row.setdefault(row, []).append((index, run))
+    adjacent = [set() for _ in cells]
+    for row, items in by_row.items():
+        for index, run in items:
+            for other, other_run in by_row.get(row + 1, ()):
+                if other != index and run[0] <= other_run[1] and other_run[0] <= run[1]:
+                    adjacent[index].add(other)
+                    adjacent[other].add(index)
+    return adjacent
+
+
+# Function to turn a route into timed drive commands for a MotionQueue: ((drive1, drive2, drive3),
+# duration) per straight segment, at constant heading (the base is holonomic, it never turns)
+# Uses the profile's mixer and odometry sizes, so speed_mps is the actual ground speed; segments the
+# mixer couldn't drive that fast without desaturating are driven slower. Durations are rounded on the
+# running total, so rounding to whole control ticks never adds up along the route.
+# - points: (x, y) in meters, e.g. planner.waypoints()
+# - heading: the robot's heading in radians in the same frame (0 = front along +x)
+def route_moves(points, config, speed_mps=0.3, heading=0.0):
+    from control import make_mixer
+    mixer = make_mixer(config['mixer'])
+    limit = config['mixer']['limit']
+    scale = config['odometry']['max_wheel_speed_mps'] / limit  # Drive units -> m/s
+    period_s = 1 / config['loop']['rate_hz']
+    cos_h, sin_h = math.cos(heading), math.sin(heading)
+    moves = []
+    elapsed = 0.0
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        length = math.hypot(x1 - x0, y1 - y0)
+        if length == 0:
+            continue
+        vx, vy = (x1 - x0) / length, (y1 - y0) / length
+        forward = vx * cos_h + vy * sin_h
+        left = -vx * sin_h + vy * cos_h
+        drive = (-left / scale, forward / scale, 0.0)  # Per m/s
+        peak = max(abs(sum(row[j] * drive[j] for j in range(3))) for row in mixer.matrix)
+        speed = min(speed_mps, limit / peak)
+        start_tick = round(elapsed / period_s)
+        elapsed += length / speed
+        duration = (round(elapsed / period_s) - start_tick) * period_s
+        moves.append((tuple(value * speed for value in drive), duration))
+    return moves
+
+
+# Function to queue a route's moves on a MotionQueue (e.g. ControlLoop.motion)
+def push_moves(motion, moves):
+    for command, duration in moves:
+        motion.push(command, duration)
+
+
+# Plan a roof from a JSON file and print the route summary:
+#     python coverage_planner.py roof.json
+# roof.json: {"roof": [[x, y], ...], "obstacles": [[[x, y], ...], ...], "cell_m": 0.3, "margin_m": 0.15}
+if __name__ == "__main__":
+    import json
+    import sys
+    import time
+    with open(sys.argv[1]) as f:
+        roof = json.load(f)
+    began = time.perf_counter()
+    grid = OccupancyGrid.from_polygon(roof['roof'], roof.get('obstacles', ()), roof.get('cell_m', 0.25),
+                                      roof.get('margin_m', 0.0))
+    planner = CoveragePlanner(grid)
+    planner.plan()
+    summary = planner.stats()
+    summary['plan_ms'] = (time.perf_counter() - began) * 1000
+    summary['grid'] = "%d x %d cells, %d bytes" % (grid.cols, grid.rows, len(grid.bits))
+    print(json.dumps(summary, indent=2))
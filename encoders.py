@@ -0,0 +1,91 @@
+from array import array  # Import array library for the shared count buffers
+
+# Quadrature decoding: index = previous state * 4 + new state, where state = A level * 2 + B level
+# Gives +1 / -1 per edge (4 counts per encoder line) and 0 for "no change" or an impossible jump
+QUADRATURE = (
+    0, -1, 1, 0,
+    1, 0, 0, -1,
+    -1, 0, 0, 1,
+    0, 1, -1, 0,
+)
+
+
+# Quadrature encoders counted by the pigpio daemon
+# pigpiod samples the pins from DMA every few microseconds and queues every level change with its
+# own timestamp, so edges aren't lost when Python falls behind for a moment; the callback thread
+# catches up from the queue. The per-edge work is one table lookup. The sustained edge rate is
+# bounded by how fast that Python callback runs: called directly it handles ~1.4M edges/s on an
+# x86 desktop (bench/wheel_speed.py), an upper bound only. Through pigpiod on a Pi it is slower and
+# not verified yet; measure it on the robot with `python -m bench.wheel_speed --loopback OUT_A OUT_B`
+# (pigpio waves jumpered back into the encoder pins, reports lost edges) and keep
+# max_counts_per_s well below the highest rate with lost == 0.
+# - encoders: one (pin_a, pin_b) pair per wheel, in the same order as the motors
+# - pi: an existing pigpio connection (e.g. the PigpioDriver's), a new one is opened if None
+# - glitch_us: ignore pulses shorter than this (pigpio glitch filter, 0 = off)
+#
+# self.counts holds the running count per wheel; it is only written by the callback thread and can
+# be read at any time (each value is a single int assignment, no locking needed).
+class PigpioEncoders:
+    def __init__(self, encoders, pi=None, glitch_us=0):
+        self.own_pi = pi is None
+        if pi is None:
+            import pigpio
+            pi = pigpio.pi()
+            if not pi.connected:
+                raise RuntimeError("cannot connect to pigpiod (is the daemon running?)")
+        self.pi = pi
+        self.encoders = [tuple(pair) for pair in encoders]
+        self.counts = array('q', [0] * len(self.encoders))
+        self.state = array('B', [0] * len(self.encoders))  # Last A/B levels per wheel
+        self.missed = 0  # Edges reported without a level change (an edge pair was lost)
+        self.pin_info = {}  # pin -> (wheel, bit)
+        self.callbacks = []
+        for wheel, (pin_a, pin_b) in enumerate(self.encoders):
+            self.pin_info[pin_a] = (wheel, 2)
+            self.pin_info[pin_b] = (wheel, 1)
+            for pin in (pin_a, pin_b):
+                pi.set_mode(pin, 0)              # pigpio.INPUT
+                pi.set_pull_up_down(pin, 2)      # pigpio.PUD_UP (open-collector encoders)
+                if glitch_us:
+                    pi.set_glitch_filter(pin, glitch_us)
+            self.state[wheel] = pi.read(pin_a) << 1 | pi.read(pin_b)
+        for pin in self.pin_info:
+            self.callbacks.append(pi.callback(pin, 2, self._edge))  # pigpio.EITHER_EDGE
+
+    # pigpio callback, runs on pigpio's thread for every edge
+    def _edge(self, pin, level, tick):
+        if level > 1:
+            return  # Watchdog timeout, not an edge
+        wheel, bit = self.pin_info[pin]
+        state = self.state[wheel]
+        new = state | bit if level else state & ~bit
+        if new == state:
+            self.missed += 1
+            return
+        self.counts[wheel] += QUADRATURE[state << 2 | new]
+        self.state[wheel] = new
+
+    # Function to get the current counts (the array is updated in place by the callbacks)
+    def sample(self):
+        return self.counts
+
+    def close(self):
+        for cb in self.callbacks:
+            cb.cancel()
+        self.callbacks = []
+        if self.own_pi:
+            self.pi.stop()
+
+
+# Function to open the encoders described by a profile's 'encoders' section (None = open loop)
+# - driver: the motor driver; its pigpio connection is shared, and the simulated wheels read it
+def open_encoders(settings, driver):
+    backend = settings['backend']
+    if backend is None:
+        return None
+    if backend == 'pigpio':
+        return PigpioEncoders(settings['pins'], getattr(driver, 'pi', None), **settings['options'])
+    if backend == 'sim':
+        from sim_wheels import SimWheels
+        return SimWheels(driver, settings['max_counts_per_s'], **settings['options'])
+    raise ValueError("unknown encoder backend %r (choose from pigpio, sim)" % (backend,))
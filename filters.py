@@ -0,0 +1,101 @@
+import math  # Import math library to turn time constants into filter coefficients
+from array import array  # Import array library for compact per-axis state
+
+# Filter modes
+EMA = 'ema'          # First-order low-pass (exponential moving average), set by a time constant
+RATE_LIMIT = 'rate'  # Output follows the input but never changes faster than `rate` units per second
+SLEW = 'slew'        # Like RATE_LIMIT, with a separate (usually faster) rate when slowing toward 0
+
+# Fixed-point format: values are stored as integers scaled by 2^FRACTION_BITS
+FRACTION_BITS = 8
+ONE = 1 << FRACTION_BITS
+# Filter coefficients use a finer scale so small coefficients keep their precision
+COEFF_BITS = 16
+COEFF_ONE = 1 << COEFF_BITS
+
+
+# Bank of identical filters, one per axis, with all state in one integer array
+# Settings are in milliseconds and units per second rather than "per tick", and the
+# coefficients are recomputed from the loop period, so changing the loop rate doesn't
+# change how the filters feel.
+# - axes: number of axes (e.g. 3 for drive1, drive2, drive3)
+# - period_ms: control loop period
+# - time_constant_ms: EMA time constant (time to cover ~63% of a step)
+# - rate: RATE_LIMIT / SLEW limit in units per second when speeding up
+# - decel_rate: SLEW limit in units per second when slowing toward 0 (defaults to rate)
+class FilterBank:
+    __slots__ = ('axes', 'mode', 'time_constant_ms', 'rate', 'decel_rate', 'state', 'outputs',
+                 'period_ms', 'alpha', 'step', 'decel_step')
+
+    def __init__(self, axes, period_ms, mode=EMA, time_constant_ms=0.0, rate=None, decel_rate=None):
+        if mode not in (EMA, RATE_LIMIT, SLEW):
+            raise ValueError("unknown filter mode: %r" % (mode,))
+        if mode != EMA and rate is None:
+            raise ValueError("rate is required for %r mode" % (mode,))
+        self.axes = axes
+        self.mode = mode
+        self.time_constant_ms = time_constant_ms
+        self.rate = rate
+        self.decel_rate = rate if decel_rate is None else decel_rate
+        self.step = self.decel_step = 0
+        self.state = array('q', [0] * axes)        # Filtered values (fixed point)
+        self.outputs = array('d', [0.0] * axes)    # Filtered values as plain numbers, reused
+        self.set_period(period_ms)
+
+    # Function to recompute the per-tick coefficients for a new loop period
+    def set_period(self, period_ms):
+        self.period_ms = period_ms
+        if self.time_constant_ms > 0:
+            self.alpha = int(round((1.0 - math.exp(-period_ms / self.time_constant_ms)) * COEFF_ONE))
+        else:
+            self.alpha = COEFF_ONE  # No smoothing
+        if self.rate is not None:
+            self.step = max(1, int(round(self.rate * period_ms / 1000 * ONE)))
+            self.decel_step = max(1, int(round(self.decel_rate * period_ms / 1000 * ONE)))
+
+    # Function to jump every axis straight to a value (e.g. 0 after a failsafe)
+    def reset(self, value=0):
+        fixed = int(round(value * ONE))
+        for i in range(self.axes):
+            self.state[i] = fixed
+            self.outputs[i] = value
+
+    # Function to filter one new sample per axis, e.g. d1, d2, d3 = bank.update(drive1, drive2, drive3)
+    # Returns the bank's output array (updated in place)
+    def update(self, *values):
+        state, outputs = self.state, self.outputs
+        mode = self.mode
+        for i in range(self.axes):
+            current = state[i]
+            error = round(values[i] * ONE) - current
+            if mode == EMA:
+                current += (error * self.alpha + (COEFF_ONE >> 1)) >> COEFF_BITS
+            else:
+                step = self.step
+                if mode == SLEW and (error > 0) != (current > 0) and current != 0:
+                    step = self.decel_step  # Moving toward 0
+                if error > step:
+                    error = step
+                elif error < -step:
+                    error = -step
+                current += error
+            state[i] = current
+            outputs[i] = current / ONE
+        return outputs
+
+    # Function to filter many independent sets of axes at once with NumPy (e.g. a simulated fleet)
+    # Same fixed-point math and settings as update(), but the state lives in the caller's array
+    # - state: int64 array of shape (count, axes), updated in place (zeros to start from rest)
+    # - values: array of shape (count, axes)
+    # Returns the filtered values as floats, shape (count, axes)
+    def update_batch(self, state, values):
+        import numpy as np
+        error = np.round(np.asarray(values, dtype=np.float64) * ONE).astype(np.int64) - state
+        if self.mode == EMA:
+            state += (error * self.alpha + (COEFF_ONE >> 1)) >> COEFF_BITS
+        else:
+            step = np.full(state.shape, self.step, dtype=np.int64)
+            if self.mode == SLEW:
+                step[((error > 0) != (state > 0)) & (state != 0)] = self.decel_step  # Moving toward 0
+            state += np.clip(error, -step, step)
+        return state / ONE
@@ -0,0 +1,221 @@
+import math  # Import math library for the motor time constant
+from array import array  # Import array library for the headless encoder counts
+
+import numpy as np  # Import numpy library for the fleet state (only the simulator needs it)
+
+from conditioning import StickCurve
+from control import ControlLoop, make_mixer, open_driver
+from filters import FilterBank
+from ibus import IBUS_FRAME_LEN, IBUS_NEUTRAL, IBUS_NUM_CHANNELS, encode_frame
+from motor_driver import MAX_SPEED
+from odometry import forward_kinematics
+from receiver import ReceiverThread
+from scheduler import LoopScheduler
+from sim_serial import SimSerial
+from wheel_speed import WheelSpeedController
+
+# Motor backends a headless robot can drive
+SIM_BACKENDS = ('sim', 'pigpio_sim')
+
+
+# Fleet of simulated robots stepped in lockstep, one control period per step()
+# Every robot runs the same pipeline as ControlLoop, built from the same profile: stick curve ->
+# filter -> mixer -> (with an encoders backend in the profile) the wheel speed PI controller on the
+# simulated counts, then the SimWheels motor model and the true pose. Robots are always armed;
+# the receiver failsafe, watchdog and scripted moves aren't simulated. The state of the whole fleet
+# lives in NumPy arrays (one row per robot), so a step costs a few dozen array operations no
+# matter how many robots there are.
+# - config: a profile from config.load_profile() (channels, stick, filter, mixer, loop rate,
+#   encoders and odometry sizes are used)
+# - count: number of robots
+# - loads: fraction of speed lost per wheel, one value, one per wheel or shape (count, wheels)
+# - time_constant_s, deadzone: motor model, as in SimWheels
+# - poses: optional starting x, y, heading per robot, shape (count, 3)
+#
+# Usage:
+#     sim = FleetSim(load_profile('sim'), 1000)
+#     sim.channels[:, config['channels']['drive2']] = 1800   # every robot forward
+#     sim.run(10.0)
+#     print(sim.pose[:, 0])                                  # x of every robot
+#
+# Individual robots can instead be driven by the real ControlLoop with attach() (see HeadlessRobot).
+class FleetSim:
+    def __init__(self, config, count, loads=None, time_constant_s=0.08, deadzone=0.0, poses=None):
+        self.config = config
+        self.count = count
+        channels = config['channels']
+        self.drive_channels = [channels['drive1'], channels['drive2'], channels['drive3']]
+        stick = config['stick']
+        self.curve = StickCurve(deadband=stick['deadband'], expo=stick['expo'], scale=stick['scale'])
+        loop = config['loop']
+        self.period_s = 1 / loop['rate_hz']
+        filt = config['filter']
+        self.filter = FilterBank(3, 1000 * self.period_s, filt['mode'], time_constant_ms=filt['time_constant_ms'],
+                                 rate=filt['rate'], decel_rate=filt['decel_rate'])
+        self.mixer = make_mixer(config['mixer'])
+        wheels = self.mixer.num_wheels
+        self.wheels = wheels
+        self.counts_per_speed = config['encoders']['max_counts_per_s'] / MAX_SPEED  # Counts/s per speed unit
+        odo = config['odometry']
+        self.kinematics = np.asarray(forward_kinematics(self.mixer.matrix)).T.copy()  # (wheels, 3): right, forward, cw
+        self.meters_per_speed = odo['max_wheel_speed_mps'] / config['mixer']['limit']
+        self.radius = odo['radius_m']
+        self.time_constant_s = time_constant_s
+        self.deadzone = deadzone
+        self.loads = np.broadcast_to(np.asarray(0.0 if loads is None else loads, dtype=np.float64),
+                                     (count, wheels)).copy()
+
+        self.channels = np.full((count, IBUS_NUM_CHANNELS), IBUS_NEUTRAL, dtype=np.uint16)  # Sticks, set freely
+        self.filter_state = np.zeros((count, 3), dtype=np.int64)  # FilterBank fixed-point state
+        self.drive = np.zeros((count, 3))                         # Filtered drive1, drive2, drive3
+        self.targets = np.zeros((count, wheels))                  # Mixer outputs (wheel speed targets)
+        self.commands = np.zeros((count, wheels))                 # Wheel speeds sent to the motors
+        self.rates = np.zeros((count, wheels))                    # Wheel speed in counts per second
+        self.position = np.zeros((count, wheels))                 # Exact wheel position in counts
+        self.counts = np.zeros((count, wheels), dtype=np.int64)   # What the encoders report
+        self.pose = np.zeros((count, 3))                          # True x, y (m), heading (rad)
+        if poses is not None:
+            self.pose[:] = poses
+        self.distance = np.zeros(count)                           # Total distance traveled (m)
+        self.speed = None  # Closed-loop wheel speed control, as in ControlLoop with encoders
+        if config['encoders']['backend'] is not None:
+            enc = config['encoders']
+            self.speed = WheelSpeedController(wheels, 1000 * self.period_s, enc['max_counts_per_s'],
+                                              kp=enc['kp'], ki=enc['ki'], limit=config['mixer']['limit'])
+        self.last_counts = np.zeros((count, wheels), dtype=np.int64)  # WheelSpeedController state
+        self.integral = np.zeros((count, wheels))
+        self.measured = np.zeros((count, wheels))                 # Wheel speeds the controller saw
+        self.time = 0.0
+        self.ticks = 0
+        self.robots = []      # HeadlessRobots, see attach()
+        self.scheduler = None
+
+    # Function to hand one robot over to the real control loop; returns its HeadlessRobot
+    def attach(self, index, config=None):
+        robot = HeadlessRobot(self, index, config)
+        self.robots.append(robot)
+        if self.scheduler is None:
+            loop = self.config['loop']
+            self.scheduler = LoopScheduler(loop['rate_hz'], spin_us=loop['spin_us'])
+        return robot
+
+    # Function to advance every robot by one control period
+    def step(self):
+        raw = self.channels[:, self.drive_channels]
+        self.drive = self.filter.update_batch(self.filter_state, self.curve.lookup_batch(raw))
+        self.targets = self.mixer.mix_batch(self.drive)
+        if self.speed is None:
+            commands = self.targets
+        else:
+            commands, self.measured = self.speed.update_batch(self.last_counts, self.integral, self.targets,
+                                                              self.counts, self.period_s)
+        for robot in self.robots:
+            commands[robot.index] = robot.wheel_speeds()
+        self.commands = commands
+        self.advance(commands, self.period_s)
+        self.time += self.period_s
+        self.ticks += 1
+
+    # Function to run the motor model and the pose forward by dt seconds at fixed wheel commands
+    # The first-order motor is solved exactly over the step, so no substeps are needed
+    def advance(self, commands, dt):
+        if self.deadzone:
+            commands = np.where(np.abs(commands) < self.deadzone, 0.0, commands)
+        goal = commands * self.counts_per_speed * (1.0 - self.loads)
+        decay = math.exp(-dt / self.time_constant_s)
+        gap = self.rates - goal
+        travel = goal * dt + gap * (self.time_constant_s * (1.0 - decay))  # Counts moved during the step
+        self.rates = goal + gap * decay
+        self.position += travel
+        self.counts[:] = np.trunc(self.position)
+
+        # Same math as Odometry.integrate(), using the true average wheel speeds over the step
+        body = (travel / (dt * self.counts_per_speed)) @ self.kinematics * self.meters_per_speed
+        forward = body[:, 1]
+        left = -body[:, 0]
+        dheading = -body[:, 2] / self.radius * dt
+        pose = self.pose
+        mid = pose[:, 2] + dheading / 2
+        cos_h, sin_h = np.cos(mid), np.sin(mid)
+        pose[:, 0] += (forward * cos_h - left * sin_h) * dt
+        pose[:, 1] += (forward * sin_h + left * cos_h) * dt
+        pose[:, 2] += dheading
+        self.distance += np.sqrt(forward * forward + left * left) * dt  # Cheaper than np.hypot
+
+    # Function to run for a number of simulated seconds; returns the number of steps
+    # With headless robots attached, every step waits for the loop's next period: the real loop
+    # reads the wall clock (frame ages, wheel speed and odometry timing), so it has to see real
+    # time. Without them the fleet runs as fast as NumPy allows.
+    def run(self, seconds):
+        ticks = int(round(seconds / self.period_s))
+        robots = self.robots
+        wait = self.scheduler.wait if robots else None
+        for _ in range(ticks):
+            if wait is not None:
+                wait()
+            for robot in robots:
+                robot.tick()
+            self.step()
+        return ticks
+
+    def close(self):
+        for robot in self.robots:
+            robot.close()
+        self.robots = []
+
+
+# One robot of a FleetSim driven by the real ControlLoop instead of the vectorized pipeline
+# Runs on the simulated backends: the robot's channels are sent as iBus frames through a SimSerial
+# into a ReceiverThread (pumped once per tick, not started), the loop writes to the profile's
+# simulated motor driver, and with an encoders backend in the profile the loop runs closed loop on
+# the fleet's wheel counts. loop.odometry is the robot's own estimate; sim.pose[index] is the truth.
+class HeadlessRobot:
+    def __init__(self, sim, index, config=None):
+        config = config if config is not None else sim.config
+        if config['motors']['backend'] not in SIM_BACKENDS:
+            raise ValueError("headless robots need a simulated motor backend, got %r" % (config['motors']['backend'],))
+        self.sim = sim
+        self.index = index
+        self.ser = SimSerial()
+        self.receiver = ReceiverThread(self.ser)
+        self.driver = open_driver(config['motors'])
+        if len(self.driver.motors) != sim.wheels:
+            raise ValueError("profile has %d motors, the fleet's mixer %d wheels" % (len(self.driver.motors), sim.wheels))
+        self.encoders = FleetEncoders(sim, index) if config['encoders']['backend'] is not None else None
+        self.loop = ControlLoop(config, self.receiver, self.driver, encoders=self.encoders)
+        self.loop.armed = True
+        self.frame = bytearray(IBUS_FRAME_LEN)
+        self.speeds = [0.0] * sim.wheels
+
+    # Function to send the robot's current sticks as one frame and run one real control tick
+    def tick(self):
+        self.ser.feed(encode_frame(self.sim.channels[self.index].tolist(), self.frame))
+        self.receiver.pump(wait=False)
+        return self.loop.tick()
+
+    # Function to read the wheel speeds back out of the simulated motor driver
+    def wheel_speeds(self):
+        speeds, speed = self.speeds, self.driver.speed
+        for i in range(len(speeds)):
+            speeds[i] = speed(i)
+        return speeds
+
+    def close(self):
+        self.driver.close()
+
+
+# Encoders for a HeadlessRobot: the fleet's counts for one robot, with PigpioEncoders' sample()
+class FleetEncoders:
+    def __init__(self, sim, index):
+        self.sim = sim
+        self.index = index
+        self.counts = array('q', [0] * sim.wheels)
+
+    def sample(self):
+        row, counts = self.sim.counts[self.index], self.counts
+        for i in range(len(counts)):
+            counts[i] = int(row[i])
+        return counts
+
+    def close(self):
+        pass
@@ -0,0 +1,182 @@
+import struct  # Import struct library for unpacking the little-endian channel words
+import sys
+import time  # Import time library for frame timestamps
+from array import array  # Import array library for a compact, reusable channel buffer
+
+# FlySky iBus frame layout (sent by the receiver every ~7ms at 115200 baud):
+# - byte 0:      0x20 (frame length, 32 bytes)
+# - byte 1:      0x40 (command: servo channel data)
+# - bytes 2-29:  14 channels, 2 bytes each, little-endian (range ~1000-2000)
+# - bytes 30-31: checksum = 0xFFFF - sum(bytes 0-29), little-endian
+IBUS_FRAME_LEN = 32
+IBUS_HEADER_LEN = 0x20
+IBUS_HEADER_CMD = 0x40
+IBUS_NUM_CHANNELS = 14
+IBUS_NEUTRAL = 1500
+
+# Precompiled unpackers so decoding is a single C call per frame
+_CHANNELS = struct.Struct('<14H')
+_CHECKSUM = struct.Struct('<H')
+# On little-endian CPUs (the Pi, x86) the channel words can be copied without unpacking
+_LITTLE_ENDIAN = sys.byteorder == 'little'
+
+
+# Function to create a reusable channel array (all sticks centered)
+def new_channels():
+    return array('H', [IBUS_NEUTRAL] * IBUS_NUM_CHANNELS)
+
+
+# Function to check the header and checksum of one frame starting at offset
+def frame_valid(data, offset=0):
+    if data[offset] != IBUS_HEADER_LEN or data[offset + 1] != IBUS_HEADER_CMD:
+        return False
+    checksum = 0xFFFF - sum(memoryview(data)[offset:offset + IBUS_FRAME_LEN - 2])
+    return checksum == _CHECKSUM.unpack_from(data, offset + IBUS_FRAME_LEN - 2)[0]
+
+
+# Function to decode all 14 channels of one frame into an existing channel array
+# Returns True if the frame was valid; on a bad frame the array keeps its last values
+# The values are written into `channels` one by one, so no new array is made per frame
+def decode_frame(data, channels, offset=0):
+    if not frame_valid(data, offset):
+        return False
+    i = 0
+    for value in _CHANNELS.unpack_from(data, offset + 2):
+        channels[i] = value
+        i += 1
+    return True
+
+
+# Function to build one frame from channel values (for simulators and tests)
+# Missing channels are filled with neutral; pass `out` to reuse a bytearray(IBUS_FRAME_LEN)
+def encode_frame(values, out=None):
+    frame = out if out is not None else bytearray(IBUS_FRAME_LEN)
+    frame[0] = IBUS_HEADER_LEN
+    frame[1] = IBUS_HEADER_CMD
+    for i in range(IBUS_NUM_CHANNELS):
+        struct.pack_into('<H', frame, 2 + 2 * i, values[i] if i < len(values) else IBUS_NEUTRAL)
+    _CHECKSUM.pack_into(frame, IBUS_FRAME_LEN - 2, 0xFFFF - sum(memoryview(frame)[:IBUS_FRAME_LEN - 2]))
+    return frame
+
+
+# Streaming iBus parser that never blocks and always keeps the newest frame
+# - Bytes that are already waiting on the serial port are drained into a preallocated ring buffer
+# - The buffer is searched for the 0x20/0x40 header, so a dropped or extra byte only costs one frame
+# - Every complete frame is checksum-checked, older frames are skipped, only the newest one is decoded
+# All buffers and the memoryviews over them are made once here, so parsing a frame doesn't
+# create any new Python objects apart from small integers.
+class IBusParser:
+    __slots__ = ('ring', 'ring_view', 'mask', 'head', 'tail', 'frame', 'candidate', 'buffers',
+                 'channels', 'channels_view', 'neutral', 'frame_time', 'frames', 'bad_frames',
+                 'dropped_bytes', 'short_reads')
+
+    def __init__(self, ring_size=256):
+        if ring_size & (ring_size - 1) or ring_size < 2 * IBUS_FRAME_LEN:
+            raise ValueError("ring_size must be a power of two of at least 64 bytes")
+        self.ring = bytearray(ring_size)            # Raw byte ring buffer
+        self.ring_view = memoryview(self.ring)
+        self.mask = ring_size - 1
+        self.head = 0                               # Total bytes written into the ring
+        self.tail = 0                               # Total bytes consumed from the ring
+        self.frame = bytearray(IBUS_FRAME_LEN)      # Newest valid frame, copied out of the ring
+        self.candidate = bytearray(IBUS_FRAME_LEN)  # Scratch space for checking one frame
+        # For each of the two frame buffers: (checksummed bytes, channel words) views
+        self.buffers = {
+            id(buf): (memoryview(buf)[:IBUS_FRAME_LEN - 2], memoryview(buf)[2:IBUS_FRAME_LEN - 2].cast('H'))
+            for buf in (self.frame, self.candidate)
+        }
+        self.channels = new_channels()              # Newest decoded channels, updated in place
+        self.channels_view = memoryview(self.channels)
+        self.neutral = new_channels()               # Returned when the newest frame is too old
+        self.frame_time = None                      # time.monotonic() of the newest valid frame
+        self.frames = 0                             # Valid frames seen
+        self.bad_frames = 0                         # Frames with a good header but a bad checksum
+        self.dropped_bytes = 0                      # Bytes skipped while hunting for a header
+        self.short_reads = 0                        # Serial reads that returned fewer bytes than asked
+
+    # Function to copy bytes into the ring (drops the oldest bytes if it overflows)
+    def feed(self, data):
+        for start in range(0, len(data), self.mask + 1):
+            chunk = data[start:start + self.mask + 1]
+            pos = self.head & self.mask
+            first = min(len(chunk), self.mask + 1 - pos)
+            self.ring[pos:pos + first] = chunk[:first]
+            self.ring[:len(chunk) - first] = chunk[first:]
+            self._advance(len(chunk))
+        return self.parse()
+
+    # Function to drain whatever the serial port already has waiting, straight into the ring
+    # With wait=True and nothing waiting, it waits for one byte (up to the port's timeout)
+    def poll(self, ser, wait=False):
+        self.fill(ser, wait)
+        return self.parse()
+
+    # Function to do the reading half of poll() without parsing; returns the number of bytes read
+    def fill(self, ser, wait=False):
+        waiting = ser.in_waiting or (1 if wait else 0)
+        total = 0
+        while waiting > 0:
+            pos = self.head & self.mask
+            size = min(waiting, self.mask + 1 - pos)
+            count = ser.readinto(self.ring_view[pos:pos + size])
+            if count < size:
+                self.short_reads += 1  # Timed out, or the port had less than it said
+            if not count:
+                break
+            self._advance(count)
+            waiting -= count
+            total += count
+        return total
+
+    # Function to move the write position and throw away unread bytes that got overwritten
+    def _advance(self, count):
+        self.head += count
+        overflow = self.head - self.tail - (self.mask + 1)
+        if overflow > 0:
+            self.tail += overflow
+            self.dropped_bytes += overflow
+
+    # Function to scan the ring for complete frames, returns True if a new frame was decoded
+    def parse(self, now=None):
+        ring, mask, candidate = self.ring, self.mask, self.candidate
+        found = False
+        while self.head - self.tail >= IBUS_FRAME_LEN:
+            pos = self.tail & mask
+            if ring[pos] != IBUS_HEADER_LEN or ring[(pos + 1) & mask] != IBUS_HEADER_CMD:
+                self.tail += 1  # Not a header, slide forward one byte to resynchronize
+                self.dropped_bytes += 1
+                continue
+            first = min(IBUS_FRAME_LEN, mask + 1 - pos)
+            candidate[:first] = ring[pos:pos + first]
+            candidate[first:] = ring[:IBUS_FRAME_LEN - first]
+            checked = self.buffers[id(candidate)][0]
+            if 0xFFFF - sum(checked) == candidate[30] | candidate[31] << 8:
+                self.frame, self.candidate = candidate, self.frame  # Keep it, only the newest gets decoded
+                candidate = self.candidate
+                self.tail += IBUS_FRAME_LEN
+                self.frames += 1
+                found = True
+            else:
+                self.tail += 1  # Header bytes were just data, keep hunting
+                self.bad_frames += 1
+        if found:
+            if _LITTLE_ENDIAN:
+                self.channels_view[:] = self.buffers[id(self.frame)][1]
+            else:
+                decode_frame(self.frame, self.channels)
+            self.frame_time = time.monotonic() if now is None else now
+        return found
+
+    # Function to get how old the newest frame is in seconds (None if no frame yet)
+    def age(self, now=None):
+        if self.frame_time is None:
+            return None
+        return (time.monotonic() if now is None else now) - self.frame_time
+
+    # Function for the control loop: newest channels, or neutral if the newest frame is too old
+    def read(self, ser, max_age):
+        self.poll(ser)
+        age = self.age()
+        if age is None or age > max_age:
+            return self.neutral
+        return self.channels
@@ -0,0 +1,191 @@
+import os
+import socketserver  # Import socketserver library for the Unix socket endpoint
+import threading  # Import threading library to serve scrapes off the control loop
+from array import array  # Import array library for the bucket counts
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram buckets: powers of two in nanoseconds, from 2^10 ns (~1 us) to 2^30 ns (~1.07 s),
+# plus one overflow bucket. The bucket for a value is its bit length, so recording is O(1).
+MIN_SHIFT = 10
+NUM_BUCKETS = 21
+BOUNDS_S = tuple((1 << (MIN_SHIFT + i)) / 1e9 for i in range(NUM_BUCKETS))  # Upper bounds in seconds
+
+
+# Fixed-bucket latency histogram (durations in ns)
+# record() costs one bit_length() and three integer adds, and allocates nothing that lives on
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = array('q', [0] * (NUM_BUCKETS + 1))
+        self.sum = 0     # Total of all recorded durations (ns)
+        self.count = 0
+
+    def record(self, ns):
+        i = ns.bit_length() - MIN_SHIFT
+        if i < 0:
+            i = 0
+        elif i > NUM_BUCKETS:
+            i = NUM_BUCKETS
+        self.counts[i] += 1
+        self.sum += ns
+        self.count += 1
+
+    def reset(self):
+        for i in range(NUM_BUCKETS + 1):
+            self.counts[i] = 0
+        self.sum = self.count = 0
+
+
+# Registry of everything exported; values are read when scraped, never pushed from the loop
+# - histogram(): a Histogram owned by some component (e.g. ControlLoop.stage_times['mix'])
+# - counter() / gauge(): a function returning the current value (e.g. lambda: parser.bad_frames)
+class Metrics:
+    def __init__(self, prefix='skysweeper_'):
+        self.prefix = prefix
+        self.families = {}  # name -> [type, help, [(labels, source)]]
+
+    def _add(self, kind, name, help_text, labels, source):
+        family = self.families.setdefault(name, [kind, help_text, []])
+        family[2].append((labels or {}, source))
+
+    def histogram(self, name, help_text, histogram, labels=None):
+        self._add('histogram', name, help_text, labels, histogram)
+
+    def counter(self, name, help_text, read, labels=None):
+        self._add('counter', name, help_text, labels, read)
+
+    def gauge(self, name, help_text, read, labels=None):
+        self._add('gauge', name, help_text, labels, read)
+
+    # Function to render every metric in the Prometheus text format
+    def render(self):
+        lines = []
+        for name, (kind, help_text, series) in self.families.items():
+            full = self.prefix + name
+            lines.append("# HELP %s %s" % (full, help_text))
+            lines.append("# TYPE %s %s" % (full, kind))
+            for labels, source in series:
+                if kind == 'histogram':
+                    counts = list(source.counts)  # Copy first, the loop keeps writing
+                    cumulative = 0
+                    for bound, count in zip(BOUNDS_S + ('+Inf',), counts):
+                        cumulative += count
+                        le = bound if isinstance(bound, str) else repr(bound)
+                        lines.append("%s_bucket%s %d" % (full, _labels(labels, le=le), cumulative))
+                    lines.append("%s_sum%s %r" % (full, _labels(labels), source.sum / 1e9))
+                    lines.append("%s_count%s %d" % (full, _labels(labels), cumulative))
+                else:
+                    lines.append("%s%s %r" % (full, _labels(labels), source()))
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels, **extra):
+    items = list(labels.items()) + list(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join('%s="%s"' % item for item in items) + "}"
+
+
+# Function to register the standard metrics of a running ControlLoop and its parts
+def loop_metrics(loop, metrics=None):
+    metrics = metrics if metrics is not None else Metrics()
+    for stage, histogram in loop.stage_times.items():
+        metrics.histogram('stage_seconds', "Time spent in each control loop stage", histogram, {'stage': stage})
+    sources = getattr(loop.receiver, 'sources', [loop.receiver])  # InputArbiter or a single source
+    for source in sources:
+        for stage, histogram in getattr(source, 'stage_times', {}).items():
+            metrics.histogram('stage_seconds', "Time spent in each control loop stage", histogram,
+                              {'stage': stage})
+        parser = getattr(source, 'parser', None)
+        if parser is not None:
+            metrics.counter('ibus_frames_total', "Valid iBus frames", lambda p=parser: p.frames)
+            metrics.counter('ibus_checksum_failures_total', "iBus frames with a bad checksum",
+                            lambda p=parser: p.bad_frames)
+            metrics.counter('ibus_dropped_bytes_total', "Bytes skipped while resyncing",
+                            lambda p=parser: p.dropped_bytes)
+            metrics.counter('serial_short_reads_total', "Serial reads that returned fewer bytes than asked",
+                            lambda p=parser: p.short_reads)
+        if hasattr(source, 'dropped_late'):
+            metrics.counter('udp_packets_total', "Accepted UDP commands", lambda s=source: s.packets)
+            metrics.counter('udp_dropped_total', "Dropped UDP commands", lambda s=source: s.dropped_late,
+                            {'reason': 'late'})
+            metrics.counter('udp_dropped_total', "Dropped UDP commands", lambda s=source: s.dropped_old,
+                            {'reason': 'out_of_order'})
+            metrics.counter('udp_dropped_total', "Dropped UDP commands", lambda s=source: s.bad_packets,
+                            {'reason': 'malformed'})
+    scheduler = loop.scheduler
+    metrics.counter('ticks_total', "Control loop ticks", lambda: scheduler.ticks)
+    metrics.counter('overruns_total', "Ticks that started after their deadline", lambda: scheduler.overruns)
+    metrics.counter('missed_periods_total', "Whole periods skipped after overruns", lambda: scheduler.missed)
+    metrics.counter('failsafe_trips_total', "Times the input went stale and the sticks fell back to neutral",
+                    lambda: loop.failsafe_trips)
+    watchdog = getattr(loop, 'watchdog', None)
+    if watchdog is not None:
+        metrics.counter('watchdog_trips_total', "Times the failsafe watchdog took over the motors",
+                        lambda: watchdog.trips)
+        metrics.gauge('watchdog_tripped', "1 while the failsafe watchdog holds the motors",
+                      lambda: int(watchdog.tripped))
+    metrics.gauge('armed', "1 while motor commands are being sent", lambda: int(loop.armed))
+    driver = loop.driver
+    metrics.counter('pin_writes_total', "Pin writes passed to the motor backend", lambda: driver.writes_issued)
+    metrics.counter('pin_writes_skipped_total', "Pin writes skipped because nothing changed",
+                    lambda: driver.writes_skipped)
+    return metrics
+
+
+# Serves metrics.render() on a Unix socket (connect, read until EOF) and/or over HTTP (GET /metrics)
+#     curl http://127.0.0.1:9105/metrics
+#     socat - UNIX-CONNECT:/tmp/skysweeper.sock
+# Scrapes run on their own daemon threads and only read counters, so they can't stall the loop.
+class MetricsServer:
+    def __init__(self, metrics, unix_path=None, http_port=None, http_host='127.0.0.1'):
+        self.metrics = metrics
+        self.unix_path = unix_path
+        self.servers = []
+        render = metrics.render
+
+        if unix_path is not None:
+            class UnixHandler(socketserver.BaseRequestHandler):
+                def handle(self):
+                    self.request.sendall(render().encode())
+
+            if os.path.exists(unix_path):
+                os.unlink(unix_path)  # Left over from a previous run
+            self.servers.append(socketserver.ThreadingUnixStreamServer(unix_path, UnixHandler))
+
+        if http_port is not None:
+            class HTTPHandler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path not in ('/', '/metrics'):
+                        self.send_error(404)
+                        return
+                    body = render().encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass  # No per-request logging on the robot
+
+            self.servers.append(ThreadingHTTPServer((http_host, http_port), HTTPHandler))
+
+        for server in self.servers:
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+
+    def close(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        if self.unix_path is not None and os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)
+
+
+# Function to start the metrics endpoints from a profile's 'metrics' section (None if both are off)
+def serve_metrics(settings, loop):
+    if settings['unix_socket'] is None and settings['http_port'] is None:
+        return None
+    return MetricsServer(loop_metrics(loop), settings['unix_socket'], settings['http_port'], settings['http_host'])
@@ -0,0 +1,106 @@
+import math  # Import math library for wheel angle geometry
+from array import array  # Import array library for the reusable output buffer
+
+# Mixing matrices: one row per wheel, one column per drive input
+# Inputs (same order as the scripts): drive1 = left/right, drive2 = forward/backward, drive3 = rotation
+
+# Three-wheel omni base used by omniwheels.py and wheel_control_english.py
+#   out1 = drive1 + drive2 * 0.66 - drive3
+#   out2 = drive1 - drive2 * 0.66 + drive3
+#   out3 = drive2 + drive3
+THREE_WHEEL = (
+    (1.0, 0.66, -1.0),
+    (1.0, -0.66, 1.0),
+    (0.0, 1.0, 1.0),
+)
+
+# Four-wheel mecanum / X-drive (wheels: front-left, front-right, rear-left, rear-right)
+MECANUM_4 = (
+    (1.0, 1.0, 1.0),
+    (-1.0, 1.0, -1.0),
+    (-1.0, 1.0, 1.0),
+    (1.0, 1.0, -1.0),
+)
+X_DRIVE_4 = MECANUM_4
+
+
+# Function to build a mixing matrix for N omni wheels placed around the robot
+# - angles: direction each wheel rolls, in degrees (0 = pushes straight forward)
+# - radius: distance from the robot center to the wheels (scales the rotation column)
+def omni_matrix(angles, radius=1.0):
+    rows = []
+    for angle in angles:
+        a = math.radians(angle)
+        rows.append((-math.sin(a), math.cos(a), radius))
+    return tuple(rows)
+
+
+# Mixer: turns (drive1, drive2, drive3) into one speed per wheel
+# - limit: largest wheel speed the motors accept (255 = full PWM)
+# - desaturate: if any wheel would exceed the limit, scale all wheels down by the same factor
+#   (keeps the direction of travel; with desaturate=False each wheel is clipped on its own)
+class Mixer:
+    __slots__ = ('matrix', 'num_wheels', 'num_inputs', 'limit', 'desaturate', 'outputs', 'wheels', 'inputs')
+
+    def __init__(self, matrix=THREE_WHEEL, limit=255, desaturate=True):
+        self.matrix = tuple(tuple(float(v) for v in row) for row in matrix)
+        self.num_wheels = len(self.matrix)
+        self.num_inputs = len(self.matrix[0])
+        if any(len(row) != self.num_inputs for row in self.matrix):
+            raise ValueError("every row of the mixing matrix needs the same number of inputs")
+        self.limit = limit
+        self.desaturate = desaturate
+        self.outputs = array('d', [0.0] * self.num_wheels)  # Reused for every mix() call
+        self.wheels = range(self.num_wheels)
+        self.inputs = range(self.num_inputs)
+
+    # Function to mix one command, e.g. out1, out2, out3 = mixer.mix(drive1, drive2, drive3)
+    # Returns the mixer's output array (updated in place, copy it if you need to keep it)
+    def mix(self, *drive):
+        return self.mix_into(drive)
+
+    # Function to mix one command given as a sequence (e.g. a FilterBank's output array)
+    def mix_into(self, drive):
+        outputs, limit, matrix, inputs = self.outputs, self.limit, self.matrix, self.inputs
+        peak = 0.0
+        for i in self.wheels:
+            row = matrix[i]
+            value = 0.0
+            for j in inputs:
+                value += row[j] * drive[j]
+            outputs[i] = value
+            if value > peak:
+                peak = value
+            elif -value > peak:
+                peak = -value
+        if peak > limit:
+            if self.desaturate:
+                scale = limit / peak
+                for i in self.wheels:
+                    outputs[i] *= scale
+            else:
+                for i in self.wheels:
+                    value = outputs[i]
+                    if value > limit:
+                        outputs[i] = limit
+                    elif value < -limit:
+                        outputs[i] = -limit
+        return outputs
+
+    # Function to mix many commands at once with NumPy (offline replay and simulation)
+    # - commands: array of shape (count, num_inputs)
+    # Returns an array of shape (count, num_wheels)
+    def mix_batch(self, commands):
+        import numpy as np  # Only needed for batch mixing, the control loop runs without NumPy
+        commands = np.asarray(commands, dtype=np.float64)
+        outputs = commands @ np.array(self.matrix).T.copy()  # Contiguous copy: much faster matmul
+        if self.desaturate:
+            # Peak per row, one wheel column at a time (a max over a short axis=1 is ~20x slower)
+            peak = np.abs(outputs[:, 0])
+            for i in range(1, self.num_wheels):
+                np.maximum(peak, np.abs(outputs[:, i]), out=peak)
+            scale = np.where(peak > self.limit, self.limit / np.maximum(peak, 1e-12), 1.0)
+            outputs *= scale[:, None]
+        else:
+            np.clip(outputs, -self.limit, self.limit, out=outputs)
+        return outputs
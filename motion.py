@@ -0,0 +1,128 @@
+from array import array  # Import array library for the reusable command buffers
+from collections import deque, namedtuple
+
+# Ramp shapes for going from one command to the next
+# - TRAPEZOID: speed changes at a constant rate (constant acceleration)
+# - S_CURVE:   acceleration builds up and fades out smoothly (no jerk at the ends of the ramp)
+TRAPEZOID = 'trapezoid'
+S_CURVE = 's_curve'
+
+# One queued move
+# - command: target value per axis (drive inputs or wheel speeds, whatever the queue feeds)
+# - duration: seconds from the start of the move until the next one starts (includes the ramp)
+# - ramp_s: seconds to ramp from the previous command to this one
+# - profile: TRAPEZOID or S_CURVE
+# - generation: cancel() count when it was queued (moves from before a cancel are dropped)
+Move = namedtuple('Move', ['command', 'duration', 'ramp_s', 'profile', 'generation'])
+
+
+# Queue of timed motion primitives, played back one control tick at a time
+# Scripts queue moves and return straight away; the fixed-rate control loop calls update() once per
+# tick and sends the result to the mixer or the motors, so scripted and RC driving share one loop.
+# When the queue runs dry the last command ramps back down to 0.
+#
+# Usage (the loop and the script may run on different threads):
+#     motion = MotionQueue(3, period_ms=10, ramp_s=0.3)
+#     motion.push((0, 200, 0), 2.0)   # Forward for 2 s
+#     motion.push((0, 0, 0), 1.0)     # Stop and wait 1 s
+#     while True:
+#         scheduler.wait()
+#         drive = motion.update()     # Updated in place, no new objects per tick
+class MotionQueue:
+    __slots__ = ('axes', 'period_ms', 'ramp_s', 'profile', 'pending', 'generation', 'segment_generation',
+                 'cancel_ramp_s', 'outputs', 'start', 'target', 'zero', 'tick', 'ramp_ticks', 'total_ticks',
+                 'smooth', 'stopped')
+
+    def __init__(self, axes=3, period_ms=10, ramp_s=0.3, profile=S_CURVE):
+        if profile not in (TRAPEZOID, S_CURVE):
+            raise ValueError("unknown ramp profile: %r" % (profile,))
+        self.axes = axes
+        self.period_ms = period_ms
+        self.ramp_s = ramp_s          # Default ramp time
+        self.profile = profile        # Default ramp shape
+        self.pending = deque()        # append() / popleft() are thread safe
+        self.generation = 0
+        self.segment_generation = 0
+        self.cancel_ramp_s = ramp_s
+        self.outputs = array('d', [0.0] * axes)  # Current command, reused
+        self.start = array('d', [0.0] * axes)    # Command at the start of the current ramp
+        self.target = array('d', [0.0] * axes)   # Command at the end of the current ramp
+        self.zero = (0.0,) * axes
+        self.tick = 0          # Ticks since the current segment started
+        self.ramp_ticks = 0
+        self.total_ticks = 0
+        self.smooth = False
+        self.stopped = True    # Idle at 0
+
+    # Function to queue a move; returns straight away
+    def push(self, command, duration, ramp_s=None, profile=None):
+        if len(command) != self.axes:
+            raise ValueError("expected %d values, got %d" % (self.axes, len(command)))
+        profile = self.profile if profile is None else profile
+        if profile not in (TRAPEZOID, S_CURVE):
+            raise ValueError("unknown ramp profile: %r" % (profile,))
+        self.pending.append(Move(tuple(float(v) for v in command), duration,
+                                 self.ramp_s if ramp_s is None else ramp_s, profile, self.generation))
+
+    # Function to drop the current and queued moves and ramp down to 0 (ramp_s=0 stops at once)
+    def cancel(self, ramp_s=None):
+        self.cancel_ramp_s = self.ramp_s if ramp_s is None else ramp_s
+        self.generation += 1
+
+    # Function to replace whatever is running with a new move, starting from the current command
+    def preempt(self, command, duration, ramp_s=None, profile=None):
+        self.cancel()
+        self.push(command, duration, ramp_s, profile)
+
+    # Function to tell whether the queue still has something to play (including the final ramp to 0)
+    def active(self):
+        return (not self.stopped or self.tick < self.total_ticks or bool(self.pending)
+                or self.segment_generation != self.generation)
+
+    # Function to start ramping from the current command to `command`
+    def _begin(self, command, duration, ramp_s, profile):
+        period_s = self.period_ms / 1000
+        outputs, start, target = self.outputs, self.start, self.target
+        stopped = True
+        for i in range(self.axes):
+            start[i] = outputs[i]
+            target[i] = command[i]
+            if command[i]:
+                stopped = False
+        self.stopped = stopped
+        self.tick = 0
+        self.ramp_ticks = int(round(ramp_s / period_s))
+        self.total_ticks = max(self.ramp_ticks, int(round(duration / period_s)))
+        self.smooth = profile == S_CURVE
+
+    # Function to advance one tick; returns the command array (updated in place)
+    def update(self):
+        generation = self.generation
+        if self.segment_generation != generation:  # cancel() was called
+            pending = self.pending
+            while pending and pending[0].generation != generation:
+                pending.popleft()
+            self.segment_generation = generation
+            if pending:
+                self._begin(*pending.popleft()[:4])
+            else:
+                self._begin(self.zero, 0, self.cancel_ramp_s, self.profile)
+        elif self.tick >= self.total_ticks:  # Current segment finished
+            if self.pending:
+                self._begin(*self.pending.popleft()[:4])
+            elif not self.stopped:
+                self._begin(self.zero, 0, self.ramp_s, self.profile)
+            else:
+                return self.outputs
+        self.tick += 1
+        outputs, start, target = self.outputs, self.start, self.target
+        if self.tick >= self.ramp_ticks:
+            for i in range(self.axes):
+                outputs[i] = target[i]
+            return outputs
+        u = self.tick / self.ramp_ticks
+        if self.smooth:
+            u = u * u * (3.0 - 2.0 * u)
+        for i in range(self.axes):
+            outputs[i] = start[i] + (target[i] - start[i]) * u
+        return outputs
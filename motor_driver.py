@@ -0,0 +1,305 @@
+import time  # Import time library for timestamps in the simulated backend
+
+from conditioning import duty_table
+
+# Motor wiring modes
+# - DIR_PWM:  one PWM pin for speed + one pin for direction (omniwheels.py, pigpio)
+# - DUAL_PWM: two PWM pins per motor driving an H-bridge, one for each direction
+#             (wheel_control_english.py / wheel_control_v2_english.py, RPi.GPIO)
+DIR_PWM = 'dir_pwm'
+DUAL_PWM = 'dual_pwm'
+
+# GPIOs with hardware PWM, and the PWM channel each one uses (pins on one channel share a duty cycle)
+HARDWARE_PWM_PINS = {12: 0, 18: 0, 13: 1, 19: 1}
+
+# Motor speeds everywhere in this project run from -255 (full reverse) to 255 (full forward)
+MAX_SPEED = 255
+
+
+# Base motor driver: turns signed motor speeds into pin writes
+# Backends only implement _write_duty() and _write_level(), so the speed -> pin logic is shared
+# - motors: one pin pair per motor, (pwm_pin, dir_pin) for DIR_PWM or
+#           (positive_pin, negative_pin) for DUAL_PWM
+# - deadband: duty changes up to this size (in 0-255 speed units) are not written to the pin
+#
+# The last value written to every pin is cached and a pin is only written when its value changes,
+# so holding a speed (or the idle side of an H-bridge at 0) costs no library calls or pigpiod
+# round trips. A change to 0 is always written, so motors stop fully even inside the deadband.
+class MotorDriver:
+    def __init__(self, motors, mode, deadband=0):
+        if mode not in (DIR_PWM, DUAL_PWM):
+            raise ValueError("unknown motor mode: %r" % (mode,))
+        self.motors = [tuple(pair) for pair in motors]
+        self.mode = mode
+        self.deadband = deadband
+        self.last = {pin: None for pin, _ in self.pins()}  # Last value written per pin (None = unknown)
+        self.level_set_mask = 0     # Direction pins waiting to be set high (bit per pin)
+        self.level_clear_mask = 0   # Direction pins waiting to be set low
+        self.writes_issued = 0      # Pin writes passed on to the backend
+        self.writes_skipped = 0     # Pin writes dropped because nothing changed
+
+    # Function to list every pin used, and whether it carries PWM
+    def pins(self):
+        for first, second in self.motors:
+            yield first, True
+            yield second, self.mode == DUAL_PWM
+
+    # Function to set one motor's speed and direction (-255 to 255)
+    def set_motor(self, index, speed):
+        if speed > MAX_SPEED:
+            speed = MAX_SPEED
+        elif speed < -MAX_SPEED:
+            speed = -MAX_SPEED
+        first, second = self.motors[index]
+        if self.mode == DIR_PWM:
+            self._queue_level(second, 1 if speed >= 0 else 0)  # Direction
+            self._flush_levels()
+            self._set_duty(first, abs(speed))                  # Speed
+        elif speed >= 0:
+            self._set_duty(first, speed)   # Forward side on
+            self._set_duty(second, 0)      # Reverse side off
+        else:
+            self._set_duty(first, 0)
+            self._set_duty(second, -speed)
+
+    # Function to set all motors at once, e.g. set_motors(out1, out2, out3)
+    def set_motors(self, *speeds):
+        self.write_outputs(speeds)
+
+    # Function to set all motors from a sequence of speeds (e.g. a Mixer's output array)
+    # With DIR_PWM all direction pins are updated first in one batch, then the speeds
+    def write_outputs(self, speeds):
+        motors = self.motors
+        if self.mode != DIR_PWM:
+            for index in range(len(speeds)):
+                self.set_motor(index, speeds[index])
+            return
+        for index in range(len(speeds)):
+            self._queue_level(motors[index][1], 1 if speeds[index] >= 0 else 0)
+        self._flush_levels()
+        for index in range(len(speeds)):
+            speed = speeds[index]
+            if speed < 0:
+                speed = -speed
+            self._set_duty(motors[index][0], MAX_SPEED if speed > MAX_SPEED else speed)
+
+    # Function to stop all motors
+    def stop(self):
+        self.set_motors(*[0] * len(self.motors))
+
+    # Function to stop the motors and release the hardware
+    def close(self):
+        self.stop()
+
+    # Function to forget the cached pin values, so the next update writes every pin again
+    def invalidate(self):
+        for pin in self.last:
+            self.last[pin] = None
+
+    # Function to write a duty cycle only if it moved by more than the deadband (or went to 0)
+    def _set_duty(self, pin, duty):
+        last = self.last[pin]
+        if last is not None and (duty == last or (duty != 0 and abs(duty - last) <= self.deadband)):
+            self.writes_skipped += 1
+            return
+        self.last[pin] = duty
+        self.writes_issued += 1
+        self._write_duty(pin, duty)
+
+    # Function to queue a direction pin change (written by the next _flush_levels())
+    def _queue_level(self, pin, level):
+        if self.last[pin] == level:
+            self.writes_skipped += 1
+            return
+        self.last[pin] = level
+        if level:
+            self.level_set_mask |= 1 << pin
+        else:
+            self.level_clear_mask |= 1 << pin
+
+    # Function to write all queued direction pins (backends with bank writes override this)
+    def _flush_levels(self):
+        if not (self.level_set_mask or self.level_clear_mask):
+            return
+        for _, pin in self.motors:
+            if self.level_set_mask >> pin & 1:
+                self.writes_issued += 1
+                self._write_level(pin, 1)
+            elif self.level_clear_mask >> pin & 1:
+                self.writes_issued += 1
+                self._write_level(pin, 0)
+        self.level_set_mask = self.level_clear_mask = 0
+
+    # Backend hooks: duty is the speed magnitude (0-255), level is 0 or 1
+    def _write_duty(self, pin, duty):
+        raise NotImplementedError
+
+    def _write_level(self, pin, level):
+        raise NotImplementedError
+
+
+# pigpio backend (talks to the pigpiod daemon)
+# PWM is timed by the DMA engine instead of a Python thread, so it doesn't use CPU or jitter
+# when the Pi is busy, and it can run well above the audible range.
+# - frequency: PWM frequency in Hz (None = pigpio's default, 800 Hz). DMA PWM only offers 18
+#   frequencies that depend on pigpiod's sample rate (-s option); e.g. 20000 Hz needs `pigpiod -s 1`
+#   or `-s 2`. The closest one is used, see self.frequency.
+# - pwm_range: duty cycle steps from off to full on (25-40000, e.g. 1000)
+# - hardware: drive the hardware PWM pins (GPIO 12/13/18/19, one pin per PWM channel) with the
+#   PWM peripheral, which gives any frequency at full resolution; other pins still use DMA PWM
+# DMA PWM resolution is limited to 1000000 / sample_us / frequency steps (50 at 20 kHz with -s 1),
+# whatever pwm_range says; self.real_range holds the resolution of every PWM pin.
+class PigpioDriver(MotorDriver):
+    def __init__(self, motors, mode=DIR_PWM, pi=None, deadband=0, frequency=None, pwm_range=MAX_SPEED,
+                 hardware=False):
+        super().__init__(motors, mode, deadband)
+        if pi is None:
+            import pigpio  # Only needed on the Pi, imported here so other backends work without it
+            pi = pigpio.pi()
+            if not pi.connected:
+                raise RuntimeError("cannot connect to pigpiod (is the daemon running?)")
+        self.pi = pi
+        self.pwm_range = pwm_range
+        self.duty_scale = pwm_range / MAX_SPEED  # Speed (0-255) -> duty steps
+        self.hardware_pins = set()
+        self.frequency = {}
+        self.real_range = {}
+        channels = {}
+        for pin, is_pwm in self.pins():
+            self.pi.set_mode(pin, 1)  # pigpio.OUTPUT
+            if not is_pwm:
+                continue
+            if hardware and pin in HARDWARE_PWM_PINS:
+                channel = HARDWARE_PWM_PINS[pin]
+                if channel in channels:
+                    raise ValueError("GPIO %d and %d share hardware PWM channel %d" % (channels[channel], pin, channel))
+                channels[channel] = pin
+                if not frequency:
+                    raise ValueError("hardware PWM needs a frequency")
+                self.hardware_pins.add(pin)
+                self.pi.hardware_PWM(pin, frequency, 0)
+                self.frequency[pin] = frequency
+            else:
+                if frequency:
+                    self.pi.set_PWM_frequency(pin, frequency)
+                self.pi.set_PWM_range(pin, pwm_range)
+                self.frequency[pin] = self.pi.get_PWM_frequency(pin)
+            self.real_range[pin] = self.pi.get_PWM_real_range(pin)
+
+    def _write_duty(self, pin, duty):
+        if pin in self.hardware_pins:
+            self.pi.hardware_PWM(pin, self.frequency[pin], int(duty * 1000000 / MAX_SPEED + 0.5))
+        else:
+            self.pi.set_PWM_dutycycle(pin, int(duty * self.duty_scale + 0.5))
+
+    def _write_level(self, pin, level):
+        self.pi.write(pin, level)
+
+    # All changed direction pins (GPIO 0-31) go out in at most two pigpiod calls per tick
+    def _flush_levels(self):
+        if self.level_set_mask:
+            self.pi.set_bank_1(self.level_set_mask)
+            self.writes_issued += 1
+        if self.level_clear_mask:
+            self.pi.clear_bank_1(self.level_clear_mask)
+            self.writes_issued += 1
+        self.level_set_mask = self.level_clear_mask = 0
+
+    def close(self):
+        super().close()
+        self.pi.stop()
+
+
+# pigpio backend on a simulated pigpio connection (see sim_pigpio.py), for build machines
+# - sample_us: the pigpiod sample rate to simulate (decides the available PWM frequencies)
+class SimPigpioDriver(PigpioDriver):
+    def __init__(self, motors, mode=DIR_PWM, deadband=0, frequency=None, pwm_range=MAX_SPEED,
+                 hardware=False, sample_us=5, record=True):
+        from sim_pigpio import SimPi
+        super().__init__(motors, mode, SimPi(sample_us, record), deadband, frequency, pwm_range, hardware)
+
+    # Function to get a motor's current signed speed back out of the simulated pins (-255 to 255)
+    def speed(self, index):
+        first, second = self.motors[index]
+        if self.mode == DIR_PWM:
+            magnitude = self.pi.duty(first) * MAX_SPEED
+            return magnitude if self.pi.read(second) else -magnitude
+        return (self.pi.duty(first) - self.pi.duty(second)) * MAX_SPEED
+
+
+# RPi.GPIO backend (software PWM threads; duty cycle in percent)
+class RPiGPIODriver(MotorDriver):
+    def __init__(self, motors, mode=DUAL_PWM, frequency=100, deadband=0):
+        super().__init__(motors, mode, deadband)
+        import RPi.GPIO as GPIO
+        self.GPIO = GPIO
+        self.duty_percent = duty_table(MAX_SPEED, 100.0)  # Speed -> duty cycle in percent
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setwarnings(False)
+        self.pwm = {}
+        for pin, is_pwm in self.pins():
+            GPIO.setup(pin, GPIO.OUT)
+            if is_pwm:
+                self.pwm[pin] = GPIO.PWM(pin, frequency)
+                self.pwm[pin].start(0)  # Start at 0% duty cycle
+
+    def _write_duty(self, pin, duty):
+        self.pwm[pin].ChangeDutyCycle(self.duty_percent[int(duty + 0.5) + MAX_SPEED])
+
+    def _write_level(self, pin, level):
+        self.GPIO.output(pin, level)
+
+    def close(self):
+        super().close()
+        for p in self.pwm.values():
+            p.stop()
+        self.GPIO.cleanup()
+
+
+# In-memory simulated backend for testing and benchmarking without a Pi
+# Every pin write is recorded as (time.monotonic_ns(), pin, value) in self.writes,
+# where value is the duty cycle in percent (PWM pins) or the level 0/1 (direction pins)
+# self.state always holds the current value of every pin
+class SimDriver(MotorDriver):
+    def __init__(self, motors, mode=DUAL_PWM, record=True, deadband=0):
+        super().__init__(motors, mode, deadband)
+        self.record = record
+        self.writes = []
+        self.state = {pin: 0 for pin, _ in self.pins()}
+
+    def _write_duty(self, pin, duty):
+        value = duty / MAX_SPEED * 100
+        self.state[pin] = value
+        if self.record:
+            self.writes.append((time.monotonic_ns(), pin, value))
+
+    def _write_level(self, pin, level):
+        self.state[pin] = level
+        if self.record:
+            self.writes.append((time.monotonic_ns(), pin, level))
+
+    # Function to get a motor's current signed speed back out of the pin state (-255 to 255)
+    def speed(self, index):
+        first, second = self.motors[index]
+        if self.mode == DIR_PWM:
+            magnitude = self.state[first] / 100 * MAX_SPEED
+            return magnitude if self.state[second] else -magnitude
+        return (self.state[first] - self.state[second]) / 100 * MAX_SPEED
+
+
+# Backend names accepted by create_driver()
+BACKENDS = {
+    'pigpio': PigpioDriver,
+    'pigpio_sim': SimPigpioDriver,
+    'rpi_gpio': RPiGPIODriver,
+    'sim': SimDriver,
+}
+
+
+# Function to create a driver by backend name, e.g. create_driver('sim', motors, DUAL_PWM)
+def create_driver(backend, motors, mode, **options):
+    try:
+        driver_class = BACKENDS[backend]
+    except KeyError:
+        raise ValueError("unknown motor backend %r (choose from %s)" % (backend, ", ".join(BACKENDS)))
+    return driver_class(motors, mode, **options)
@@ -0,0 +1,152 @@
+import math  # Import math library for the pose update
+from array import array  # Import array library for the reusable velocity buffer
+
+from mixer import THREE_WHEEL
+
+# Pose convention
+# - x, y in meters: at heading 0 the robot's front points along +x and its left side along +y
+# - heading in radians, counter-clockwise, not wrapped (it keeps counting past +-pi)
+# Drive inputs follow the sticks: drive1 > 0 moves right, drive2 > 0 moves forward,
+# drive3 > 0 turns clockwise.
+
+
+# Function to invert a 3x3 matrix (tuple of rows)
+def _inverse3(m):
+    (a, b, c), (d, e, f), (g, h, i) = m
+    det = a * (e * i - f * h) - b * (d * i - f * g) + c * (d * h - e * g)
+    if abs(det) < 1e-12:
+        raise ValueError("mixing matrix cannot be inverted (wheels don't determine the motion)")
+    return (
+        ((e * i - f * h) / det, (c * h - b * i) / det, (b * f - c * e) / det),
+        ((f * g - d * i) / det, (a * i - c * g) / det, (c * d - a * f) / det),
+        ((d * h - e * g) / det, (b * g - a * h) / det, (a * e - b * d) / det),
+    )
+
+
+# Function to compute the least-squares inverse of a mixing matrix (wheels x 3)
+# Returns 3 rows, one per drive input, each with one weight per wheel
+def forward_kinematics(matrix):
+    rows = len(matrix)
+    mtm = tuple(tuple(sum(matrix[k][r] * matrix[k][c] for k in range(rows)) for c in range(3)) for r in range(3))
+    inverse = _inverse3(mtm)
+    return tuple(tuple(sum(inverse[r][c] * matrix[k][c] for c in range(3)) for k in range(rows)) for r in range(3))
+
+
+# Odometry: integrates wheel speeds into an x / y / heading pose
+# Uses the inverse of the mixer's matrix, so it matches however the mixer drives the wheels.
+# - matrix: the mixing matrix (THREE_WHEEL for omniwheels.py / wheel_control_english.py)
+# - max_wheel_speed: wheel rim speed in m/s at wheel speed `limit` (255 = full PWM)
+# - radius: distance from the robot center to the wheels in meters
+# - max_gap_s: longer gaps between updates (disarmed, stalled loop) are skipped, not integrated
+#
+# Usage, once per control tick:
+#     odometry.update(wheel_speeds, time.monotonic_ns())   # commanded or measured speeds
+#     x, y, heading = odometry.x, odometry.y, odometry.heading
+class Odometry:
+    __slots__ = ('kinematics', 'wheels', 'scale', 'radius', 'max_gap_ns', 'x', 'y', 'heading',
+                 'distance', 'velocity', 'last_time')
+
+    def __init__(self, matrix=THREE_WHEEL, max_wheel_speed=0.5, radius=0.15, limit=255, max_gap_s=0.1):
+        self.kinematics = forward_kinematics(matrix)
+        self.wheels = range(len(matrix))
+        self.scale = max_wheel_speed / limit  # Wheel speed units -> m/s
+        self.radius = radius
+        self.max_gap_ns = int(max_gap_s * 1e9)
+        self.velocity = array('d', [0.0] * 3)  # Forward m/s, left m/s, counter-clockwise rad/s
+        self.reset()
+
+    # Function to set the pose (e.g. when the robot is placed at a known spot)
+    def reset(self, x=0.0, y=0.0, heading=0.0):
+        self.x = x
+        self.y = y
+        self.heading = heading
+        self.distance = 0.0  # Total distance traveled in meters
+        self.last_time = None
+
+    # Function to integrate the wheel speeds since the previous update
+    # - wheel_speeds: one speed per wheel in motor speed units (e.g. -255 to 255)
+    # - now_ns: time.monotonic_ns() of this tick
+    def update(self, wheel_speeds, now_ns):
+        last = self.last_time
+        self.last_time = now_ns
+        if last is None or not 0 < now_ns - last <= self.max_gap_ns:
+            return
+        self.integrate(wheel_speeds, (now_ns - last) / 1e9)
+
+    # Function to move the pose by dt seconds at the given wheel speeds
+    def integrate(self, wheel_speeds, dt):
+        right = forward = clockwise = 0.0
+        kin_right, kin_forward, kin_turn = self.kinematics
+        for i in self.wheels:
+            speed = wheel_speeds[i]
+            right += kin_right[i] * speed
+            forward += kin_forward[i] * speed
+            clockwise += kin_turn[i] * speed
+        scale = self.scale
+        forward *= scale
+        left = -right * scale
+        turn = -clockwise * scale / self.radius
+        velocity = self.velocity
+        velocity[0] = forward
+        velocity[1] = left
+        velocity[2] = turn
+        dheading = turn * dt
+        mid = self.heading + dheading / 2  # Heading halfway through the step
+        cos_h, sin_h = math.cos(mid), math.sin(mid)
+        self.x += (forward * cos_h - left * sin_h) * dt
+        self.y += (forward * sin_h + left * cos_h) * dt
+        self.heading += dheading
+        self.distance += math.hypot(forward, left) * dt
+
+    # Function to reconstruct a whole trajectory at once with NumPy (offline, hours of logs)
+    # Starts from the current pose and uses the same math as integrate(), without changing the pose
+    # - wheel_speeds: array of shape (count, wheels)
+    # - dt: seconds per step, a number or an array of shape (count,)
+    # Returns an array of shape (count, 3): x, y, heading after every step
+    def batch(self, wheel_speeds, dt):
+        import numpy as np
+        speeds = np.asarray(wheel_speeds, dtype=np.float64)
+        dt = np.broadcast_to(np.asarray(dt, dtype=np.float64), speeds.shape[:1])
+        body = speeds @ np.asarray(self.kinematics).T * self.scale  # right, forward, clockwise
+        forward = body[:, 1]
+        left = -body[:, 0]
+        dheading = -body[:, 2] / self.radius * dt
+        heading = self.heading + np.cumsum(dheading)
+        mid = heading - dheading / 2
+        cos_h, sin_h = np.cos(mid), np.sin(mid)
+        pose = np.empty((len(speeds), 3))
+        pose[:, 0] = self.x + np.cumsum((forward * cos_h - left * sin_h) * dt)
+        pose[:, 1] = self.y + np.cumsum((forward * sin_h + left * cos_h) * dt)
+        pose[:, 2] = heading
+        return pose
+
+
+# Function to rebuild the robot's path from a flight recorder log (see recorder.py)
+# Uses the recorded wheel speeds (measured in closed loop, the mixer outputs in open loop) and their
+# timestamps; gaps longer than odometry.max_gap_ns (the recorder only logs armed ticks) are
+# skipped like in update()
+# Returns a dict of arrays: time_ns, x, y, heading
+def trajectory_from_log(path, odometry=None):
+    import numpy as np
+    from recorder import load
+    odometry = odometry if odometry is not None else Odometry()
+    records = load(path)
+    time_ns = records['time_ns']
+    dt_ns = np.diff(time_ns, prepend=time_ns[:1])
+    dt = np.where((dt_ns > 0) & (dt_ns <= odometry.max_gap_ns), dt_ns / 1e9, 0.0)
+    speeds = np.where(np.isnan(records['speeds']), records['outputs'], records['speeds'])
+    pose = odometry.batch(speeds, dt)
+    return {'time_ns': time_ns, 'x': pose[:, 0], 'y': pose[:, 1], 'heading': pose[:, 2]}
+
+
+# Print where a logged run ended up: python odometry.py flight.rec [max_wheel_speed] [radius]
+if __name__ == "__main__":
+    import sys
+    odometry = Odometry(max_wheel_speed=float(sys.argv[2]) if len(sys.argv) > 2 else 0.5,
+                        radius=float(sys.argv[3]) if len(sys.argv) > 3 else 0.15)
+    path = trajectory_from_log(sys.argv[1], odometry)
+    if len(path['x']) == 0:
+        print("no records")
+    else:
+        print("%d records, end pose x %.3f m, y %.3f m, heading %.1f deg" % (
+            len(path['x']), path['x'][-1], path['y'][-1], math.degrees(path['heading'][-1])))
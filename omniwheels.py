@@ -1,9 +1,10 @@
 import serial  # Import serial library for communication with iBus receiver
-import time  # Import time library for delays
-import pigpio  # Import pigpio library for PWM control on Raspberry Pi
-
-# Initialize pigpio library (needed for controlling PWM signals)
-pi = pigpio.pi()
+from filters import EMA, FilterBank  # Import fixed-point stick filters
+from mixer import THREE_WHEEL, Mixer  # Import omnidirectional drive mixer
+from motor_driver import DIR_PWM, PigpioDriver  # Import motor driver (pigpio backend)
+from recorder import Recorder  # Import flight recorder (binary log of every tick)
+from receiver import ReceiverThread  # Import background iBus reader (runs on its own thread)
+from scheduler import LoopScheduler  # Import fixed-rate loop scheduler (deadline based)
 
 # Define motor control GPIO pins on Raspberry Pi
 MOTOR1_PWM = 2   # Motor 1 speed (PWM signal)
@@ -13,52 +14,50 @@ MOTOR2_DIR = 5   # Motor 2 direction
 MOTOR3_PWM = 6   # Motor 3 speed (PWM signal)
 MOTOR3_DIR = 7   # Motor 3 direction
 
-# Set GPIO pins as OUTPUT (like pinMode() in Arduino)
-for pin in [MOTOR1_PWM, MOTOR1_DIR, MOTOR2_PWM, MOTOR2_DIR, MOTOR3_PWM, MOTOR3_DIR]:
-    pi.set_mode(pin, pigpio.OUTPUT)
+# Motor driver: connects to pigpiod and sets all pins as OUTPUT (like pinMode() in Arduino)
+# Each motor is a (PWM pin, direction pin) pair
+# Pins are only written when their value changes; speed changes of 1 step or less are ignored
+driver = PigpioDriver([(MOTOR1_PWM, MOTOR1_DIR), (MOTOR2_PWM, MOTOR2_DIR), (MOTOR3_PWM, MOTOR3_DIR)], DIR_PWM, deadband=1)
 
 # Open iBus receiver serial connection (adjust port if needed)
 # - '/dev/ttyS0' is the Raspberry Pi UART port
 # - 115200 is the baud rate (matches iBus communication speed)
-# - timeout=0.1 ensures we don't get stuck waiting for data
-ser = serial.Serial('/dev/ttyS0', 115200, timeout=0.1)
+# - timeout=0.01 keeps the reader thread responsive to stop() (reads never happen on the motor loop)
+ser = serial.Serial('/dev/ttyS0', 115200, timeout=0.01)
+
+# Background reader: parses iBus frames on its own thread and publishes the newest one
+receiver = ReceiverThread(ser)
+receiver.start()
+
+# Oldest frame the loop will act on (one 10ms loop period plus a little slack)
+FRAME_MAX_AGE = 0.015
 
 # Function to read iBus channel data
 def read_ibus():
-    data = ser.read(32)  # Read 32 bytes of iBus packet data
-    if len(data) < 32:
-        return [1500] * 10  # Return default neutral values if no data received
-    
-    # Extract 10 channel values from the iBus packet
-    channels = [int.from_bytes(data[i*2+2:i*2+4], 'little') for i in range(10)]
-    return channels  # Return the list of 10 channel values
-
-# Function to limit values within a specified range (equivalent to constrain() in Arduino)
-def constrain(value, min_val, max_val):
-    return max(min_val, min(max_val, value))
-
-# Low-pass filter function to smooth out noisy stick inputs
-def filter(value, prev_value, alpha=30):
-    return (alpha * prev_value + value) / (alpha + 1)
-
-# Function to set motor speed and direction
-def set_motor(pwm_pin, dir_pin, speed):
-    speed = constrain(speed, -255, 255)  # Limit speed between -255 and 255
-    if speed >= 0:
-        pi.write(dir_pin, 1)  # Set direction forward
-        pi.set_PWM_dutycycle(pwm_pin, speed)  # Apply PWM signal
-    else:
-        pi.write(dir_pin, 0)  # Set direction reverse
-        pi.set_PWM_dutycycle(pwm_pin, abs(speed))  # Apply PWM signal (absolute value)
-
-# Initialize filtered values for smooth control
-drive1_filtered = drive2_filtered = drive3_filtered = 0
-
-# Track the last loop time (equivalent to millis() in Arduino)
-previous_time = time.time()
+    # Returns the newest published frame's 14 channels, or neutral values (1500) if it is too old
+    return receiver.read(FRAME_MAX_AGE)
+
+# Three-wheel mixer: if a wheel would go past 255, all three are scaled down together
+mixer = Mixer(THREE_WHEEL, limit=255)
+
+# Low-pass filters to smooth out noisy stick inputs (one per axis, 10ms loop period)
+# The time constant is in milliseconds, so the smoothing stays the same if the loop rate changes
+FILTER_TIME_CONSTANT_MS = 8
+stick_filter = FilterBank(3, 10, EMA, time_constant_ms=FILTER_TIME_CONSTANT_MS)
+
+# Flight recorder: keeps the last 10 minutes of ticks (inputs, filter state, outputs) in a ring file
+# Read it back with `python recorder.py flight.rec`, or load() from recorder.py for NumPy analysis
+recorder = Recorder('flight.rec', capacity=60000)
+
+# Run the loop every 10 milliseconds (100 Hz, same as original C++ timing)
+# Deadlines are absolute, so the time spent in the loop body doesn't stretch the period
+scheduler = LoopScheduler(100, spin_us=200)
 
 # Main control loop (runs continuously)
 while True:
+    # Wait for the next 10ms tick
+    scheduler.wait()
+
     # Read RC controller stick values from iBus
     ch_values = read_ibus()
 
@@ -71,19 +70,13 @@ while True:
     drive3 = ch5 - 1500  # Rotation movement
 
     # Apply filtering for smoother control
-    drive1_filtered = filter(drive1, drive1_filtered)
-    drive2_filtered = filter(drive2, drive2_filtered)
-    drive3_filtered = filter(drive3, drive3_filtered)
+    drive1_filtered, drive2_filtered, drive3_filtered = stick_filter.update(drive1, drive2, drive3)
 
-    # Compute motor outputs using omnidirectional drive equations
-    out1 = drive1 + (drive2 * 0.66) - drive3
-    out2 = drive1 - (drive2 * 0.66) + drive3
-    out3 = drive2 + drive3
+    # Compute motor outputs using omnidirectional drive equations (see mixer.THREE_WHEEL)
+    out1, out2, out3 = mixer.mix(drive1_filtered, drive2_filtered, drive3_filtered)
 
     # Set motor speeds and directions
-    set_motor(MOTOR1_PWM, MOTOR1_DIR, out1)
-    set_motor(MOTOR2_PWM, MOTOR2_DIR, out2)
-    set_motor(MOTOR3_PWM, MOTOR3_DIR, out3)
+    driver.set_motors(out1, out2, out3)
 
-    # Run loop every 10 milliseconds (same as original C++ timing)
-    time.sleep(0.01)
+    # Log this tick
+    recorder.record(ch_values, stick_filter.outputs, mixer.outputs)
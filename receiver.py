@@ -0,0 +1,117 @@
+import threading  # Import threading library for the background reader
+import time  # Import time library for timestamps
+from collections import namedtuple
+from time import monotonic_ns
+
+from ibus import IBUS_NEUTRAL, IBUS_NUM_CHANNELS, IBusParser, new_channels
+from metrics import Histogram
+
+# One published receiver sample
+# - seq: increases by 1 for every new frame (lets the loop see skipped or repeated samples)
+# - timestamp: time.monotonic() when the frame was decoded
+# - channels: tuple of 14 channel values (1000-2000)
+Sample = namedtuple('Sample', ['seq', 'timestamp', 'channels'])
+
+# Sample handed out before the first frame arrives or when the newest one is too old
+NEUTRAL_SAMPLE = Sample(0, None, (IBUS_NEUTRAL,) * IBUS_NUM_CHANNELS)
+
+
+# Single-slot mailbox: the writer overwrites the slot, the reader copies out whatever is there
+# The slot is a preallocated channel array guarded by a version counter (odd while a write is in
+# progress, a "seqlock"), so neither side takes a lock, the writer never waits, and publishing or
+# reading a sample doesn't create any new objects. Old samples are simply overwritten.
+class Mailbox:
+    __slots__ = ('version', 'seq', 'timestamp', 'channels')
+
+    def __init__(self):
+        self.version = 0
+        self.seq = 0
+        self.timestamp = None
+        self.channels = new_channels()
+
+    # Function to publish new channel values (only called from the reader thread)
+    def publish(self, channels, timestamp):
+        self.version += 1
+        self.channels[:] = channels
+        self.timestamp = timestamp
+        self.seq += 1
+        self.version += 1
+
+    # Function to copy the newest channels into `out`; returns their timestamp (None before the first frame)
+    def read_into(self, out):
+        while True:
+            version = self.version
+            if version & 1:
+                time.sleep(0)  # Let the writer finish
+                continue
+            out[:] = self.channels
+            timestamp = self.timestamp
+            if self.version == version:
+                return timestamp
+
+    # Function to get the newest sample
+    def latest(self):
+        while True:
+            version = self.version
+            if version & 1:
+                time.sleep(0)
+                continue
+            sample = Sample(self.seq, self.timestamp, tuple(self.channels))
+            if self.version == version:
+                return sample if sample.timestamp is not None else NEUTRAL_SAMPLE
+
+
+# Background thread that reads the iBus receiver and publishes every new frame
+# The motor loop never touches the serial port, so a slow or stuck read cannot stretch its period
+class ReceiverThread(threading.Thread):
+    def __init__(self, ser, parser=None, idle_sleep=0.001):
+        super().__init__(name='ibus-reader', daemon=True)
+        self.ser = ser
+        self.parser = parser if parser is not None else IBusParser()
+        self.mailbox = Mailbox()
+        self.idle_sleep = idle_sleep  # Pause when the port had nothing (only matters with timeout=0)
+        self.running = threading.Event()
+        self.running.set()
+        self.channels = new_channels()  # The control loop's copy of the newest channels
+        self.neutral = new_channels()
+        # Serial read time (includes waiting for bytes) and decode time, see metrics.py
+        self.stage_times = {'serial_read': Histogram(), 'decode': Histogram()}
+
+    def run(self):
+        pump, idle_sleep = self.pump, self.idle_sleep
+        while self.running.is_set():
+            if not pump():
+                time.sleep(idle_sleep)
+
+    # Function to do one read / decode / publish pass; returns the number of bytes read
+    # run() calls it in a loop; call it directly to drive the receiver without starting the thread
+    # (e.g. headless in lockstep with a simulator, see fleet_sim.py)
+    def pump(self, wait=True):
+        parser = self.parser
+        t0 = monotonic_ns()
+        count = parser.fill(self.ser, wait)  # Reads straight into the parser's ring buffer
+        t1 = monotonic_ns()
+        self.stage_times['serial_read'].record(t1 - t0)
+        if count:
+            if parser.parse():
+                self.mailbox.publish(parser.channels, parser.frame_time)
+            self.stage_times['decode'].record(monotonic_ns() - t1)
+        return count
+
+    # Function to stop the thread (waits for the current read to time out)
+    def stop(self, timeout=1.0):
+        self.running.clear()
+        if self.is_alive():
+            self.join(timeout)
+
+    # Function to get the newest sample
+    def latest(self):
+        return self.mailbox.latest()
+
+    # Function for the control loop: newest channels, or neutral if the newest sample is too old
+    # Returns the same array every time (updated in place)
+    def read(self, max_age, now=None):
+        timestamp = self.mailbox.read_into(self.channels)
+        if timestamp is None or (time.monotonic() if now is None else now) - timestamp > max_age:
+            return self.neutral
+        return self.channels
@@ -0,0 +1,196 @@
+import math
+import mmap  # Import mmap library to write records straight into the page cache
+import os
+import struct  # Import struct library for the fixed-size binary record layout
+import threading  # Import threading library to flush the log to disk off the control loop
+import time  # Import time library for record timestamps
+
+from ibus import IBUS_NUM_CHANNELS
+
+# Flight recorder file layout
+# - 64-byte header: magic, version, record size, capacity, number of motors
+# - `capacity` fixed-size records in a ring; when the ring is full the oldest record is overwritten
+#
+# Each record (little-endian):
+#   seq        int64    record number, starting at 1 (0 = slot never written)
+#   time_ns    int64    time.monotonic_ns() of the tick
+#   channels   14 x uint16   raw iBus channels
+#   drives     3 x float32   filtered drive1, drive2, drive3
+#   outputs    N x float32   mixer outputs (-255 to 255); in closed loop the wheel speed targets
+#   duties     N x float32   signed duty cycles in percent (negative = reverse)
+#   speeds     N x float32   measured wheel speeds, same units as outputs (NaN when running open loop)
+# Version 1 files have no speeds; they can still be read, with NaN speeds.
+MAGIC = b'SKYREC\x00\x01'
+VERSION = 2
+VERSIONS = (1, 2)
+HEADER = struct.Struct('<8sIIII')
+HEADER_SIZE = 64
+NUM_DRIVES = 3
+_SEQ = struct.Struct('<q')
+
+
+# Function to build the struct for one record body (everything after seq)
+def record_struct(num_motors=3, version=VERSION):
+    per_motor = 3 if version >= 2 else 2
+    return struct.Struct('<q%dH%df' % (IBUS_NUM_CHANNELS, NUM_DRIVES + per_motor * num_motors))
+
+
+# Always-on flight recorder: one fixed-size binary record per control tick in a memory-mapped ring
+# The file is created at full size up front, so recording is just a memory copy into the mapping
+# (no allocation of file space and no write() calls). Written records live in the kernel's page
+# cache, so they survive the program crashing. To also survive a power cut they have to reach the
+# SD card: a background thread msyncs the mapping every flush_interval_s seconds (0 = off), so the
+# tick itself never makes a system call; flush_every additionally flushes from record() every N
+# records. At most the last flush_interval_s of records are lost when the power goes.
+class Recorder:
+    def __init__(self, path, capacity=60000, num_motors=3, flush_every=0, flush_interval_s=0.5):
+        self.body = record_struct(num_motors)
+        self.record_size = _SEQ.size + self.body.size
+        self.capacity = capacity
+        self.num_motors = num_motors
+        self.flush_every = flush_every
+        size = HEADER_SIZE + capacity * self.record_size
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(self.fd).st_size != size or not self._header_matches():
+            os.ftruncate(self.fd, 0)  # Different layout: start a fresh log
+            os.ftruncate(self.fd, size)
+        self.mm = mmap.mmap(self.fd, size)
+        HEADER.pack_into(self.mm, 0, MAGIC, VERSION, self.record_size, capacity, num_motors)
+        self.seq = self._last_seq()  # Continue numbering after an earlier run
+        self.duties = [0.0] * num_motors
+        self.no_speeds = (math.nan,) * num_motors  # Logged when no measured speeds are given
+        self.closing = threading.Event()
+        self.flusher = None
+        if flush_interval_s:
+            self.flusher = threading.Thread(target=self._flush_loop, args=(flush_interval_s,),
+                                            name='recorder-flush', daemon=True)
+            self.flusher.start()
+
+    # Function run by the flush thread: msync the mapping until close()
+    def _flush_loop(self, interval):
+        while not self.closing.wait(interval):
+            self.mm.flush()
+
+    # Function to check whether an existing file was written with the same layout
+    def _header_matches(self):
+        header = os.pread(self.fd, HEADER.size, 0)
+        if len(header) < HEADER.size:
+            return False
+        return HEADER.unpack(header) == (MAGIC, VERSION, self.record_size, self.capacity, self.num_motors)
+
+    # Function to find the newest record number already in the file
+    def _last_seq(self):
+        last = 0
+        for slot in range(self.capacity):
+            seq = _SEQ.unpack_from(self.mm, HEADER_SIZE + slot * self.record_size)[0]
+            if seq > last:
+                last = seq
+        return last
+
+    # Function to write one record for the current tick
+    # - channels: 14 raw iBus channel values
+    # - drives: filtered drive1, drive2, drive3
+    # - outputs: mixer outputs, one per motor
+    # - duties: signed duty cycles in percent, worked out from the outputs if not given
+    # - speeds: measured wheel speeds (closed loop), NaN if not given
+    def record(self, channels, drives, outputs, duties=None, time_ns=None, speeds=None):
+        if duties is None:
+            duties = self.duties
+            for i in range(self.num_motors):
+                duties[i] = outputs[i] / 255 * 100
+        self.seq += 1
+        offset = HEADER_SIZE + (self.seq - 1) % self.capacity * self.record_size
+        _SEQ.pack_into(self.mm, offset, 0)  # Mark the slot as being written
+        self.body.pack_into(self.mm, offset + _SEQ.size,
+                            time.monotonic_ns() if time_ns is None else time_ns,
+                            *channels, *drives, *outputs, *duties,
+                            *(self.no_speeds if speeds is None else speeds))
+        _SEQ.pack_into(self.mm, offset, self.seq)  # Complete: a crash before this leaves seq 0
+        if self.flush_every and self.seq % self.flush_every == 0:
+            self.mm.flush()
+
+    # Function to push all records to disk
+    def flush(self):
+        self.mm.flush()
+
+    def close(self):
+        self.closing.set()
+        if self.flusher is not None:
+            self.flusher.join()
+        self.mm.flush()
+        self.mm.close()
+        os.close(self.fd)
+
+
+# Function to read the header of a recorder file: (version, record_size, capacity, num_motors)
+def read_header(path):
+    with open(path, 'rb') as f:
+        magic, version, record_size, capacity, num_motors = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError("%s is not a flight recorder file" % path)
+    if version not in VERSIONS:
+        raise ValueError("%s is a version %d flight recorder file, this reader knows %s"
+                         % (path, version, ", ".join(map(str, VERSIONS))))
+    return version, record_size, capacity, num_motors
+
+
+# Function to read a recorder file as a list of records in time order (no NumPy needed)
+# Each record is a tuple: (seq, time_ns, channels, drives, outputs, duties, speeds)
+def read_records(path):
+    version, record_size, capacity, num_motors = read_header(path)
+    body = record_struct(num_motors, version)
+    no_speeds = (math.nan,) * num_motors
+    records = []
+    with open(path, 'rb') as f:
+        data = f.read()
+    for slot in range(capacity):
+        offset = HEADER_SIZE + slot * record_size
+        seq = _SEQ.unpack_from(data, offset)[0]
+        if seq == 0:
+            continue
+        values = body.unpack_from(data, offset + _SEQ.size)
+        floats = values[1 + IBUS_NUM_CHANNELS:]
+        duties = NUM_DRIVES + num_motors
+        speeds = duties + num_motors
+        records.append((seq, values[0], values[1:1 + IBUS_NUM_CHANNELS], floats[:NUM_DRIVES],
+                        floats[NUM_DRIVES:duties], floats[duties:speeds], floats[speeds:] or no_speeds))
+    records.sort()
+    return records
+
+
+# Function to load a recorder file straight into NumPy arrays (in time order)
+# Returns a dict of arrays: seq, time_ns, channels (n, 14), drives (n, 3), outputs (n, motors),
+# duties (n, motors), speeds (n, motors; all NaN for version 1 files)
+def load(path):
+    import numpy as np  # Only needed for analysis
+    version, record_size, capacity, num_motors = read_header(path)
+    fields = [
+        ('seq', '<i8'),
+        ('time_ns', '<i8'),
+        ('channels', '<u2', (IBUS_NUM_CHANNELS,)),
+        ('drives', '<f4', (NUM_DRIVES,)),
+        ('outputs', '<f4', (num_motors,)),
+        ('duties', '<f4', (num_motors,)),
+    ]
+    if version >= 2:
+        fields.append(('speeds', '<f4', (num_motors,)))
+    dtype = np.dtype(fields)
+    if dtype.itemsize != record_size:
+        raise ValueError("record size mismatch: file has %d bytes, expected %d" % (record_size, dtype.itemsize))
+    records = np.fromfile(path, dtype=dtype, count=capacity, offset=HEADER_SIZE)
+    records = records[records['seq'] > 0]
+    records = records[np.argsort(records['seq'], kind='stable')]
+    result = {name: records[name] for name in dtype.names}
+    if version < 2:
+        result['speeds'] = np.full((len(records), num_motors), np.nan, dtype=np.float32)
+    return result
+
+
+# Print the newest records of a log: python recorder.py flight.rec [count]
+if __name__ == "__main__":
+    import sys
+    records = read_records(sys.argv[1])
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    for seq, time_ns, channels, drives, outputs, duties, speeds in records[-count:]:
+        print(seq, time_ns, list(channels), [round(v, 1) for v in drives], [round(v, 1) for v in outputs],
+              [round(v, 1) for v in duties], [round(v, 1) for v in speeds])
@@ -0,0 +1,294 @@
+import contextlib  # Import contextlib library to close whatever the control process opened
+import gc  # Import gc library to keep garbage collection pauses out of the control loop
+import multiprocessing  # Import multiprocessing library to run the loop in its own process
+import os
+import signal  # Import signal library so SIGTERM still stops the motors
+import struct  # Import struct library for the shared-memory layouts
+import sys
+import time
+from multiprocessing import shared_memory
+
+from ibus import IBUS_NEUTRAL, IBUS_NUM_CHANNELS
+from receiver import NEUTRAL_SAMPLE, Sample
+
+# Command block (rest of the system -> control process)
+#   seq        int64   seqlock counter (odd while being written)
+#   time_ns    int64   time.monotonic_ns() when the channels were written (0 = never)
+#   flags      int64   FLAG_RUN | FLAG_ARMED
+#   channels   14 x uint16
+COMMAND = struct.Struct('<qqq%dH' % IBUS_NUM_CHANNELS)
+FLAG_RUN = 1
+FLAG_ARMED = 2
+
+# Telemetry block (control process -> rest of the system)
+#   seq, time_ns, ticks, overruns   int64
+#   armed                           int64   1 once the loop is armed (see FLAG_ARMED)
+#   drives (3), outputs (1 per wheel) float32
+#   lateness p99/max, work p99/max  float32 microseconds (updated every stats_every ticks and at exit)
+STATS_FIELDS = ('lateness_p99_us', 'lateness_max_us', 'work_p99_us', 'work_max_us')
+
+_SEQ = struct.Struct('<q')
+
+
+# Function to get the telemetry layout for a mixer with this many wheels
+def telemetry_layout(wheels):
+    return struct.Struct('<qqqqq3f%df4f' % wheels)
+
+
+# A fixed struct in shared memory, guarded by a seqlock so the reader never sees a half-written
+# update and the writer never waits for the reader (no locks, pipes or queues involved)
+class SharedBlock:
+    def __init__(self, layout, name=None):
+        self.layout = layout
+        self.body = struct.Struct('<' + layout.format[2:])  # Everything after the seq counter
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=layout.size)
+            self.shm.buf[:layout.size] = bytes(layout.size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.buf = self.shm.buf
+        self.name = self.shm.name
+
+    # Function to publish new values (one writer only)
+    def write(self, *values):
+        seq = _SEQ.unpack_from(self.buf, 0)[0]
+        _SEQ.pack_into(self.buf, 0, seq + 1)   # Odd: write in progress
+        self.body.pack_into(self.buf, _SEQ.size, *values)
+        _SEQ.pack_into(self.buf, 0, seq + 2)   # Even: consistent again
+
+    # Function to read a consistent copy of the values (retries if a write was in progress)
+    def read(self):
+        while True:
+            before = _SEQ.unpack_from(self.buf, 0)[0]
+            if before & 1:
+                continue
+            values = self.body.unpack_from(self.buf, _SEQ.size)
+            if _SEQ.unpack_from(self.buf, 0)[0] == before:
+                return values
+
+    def close(self, unlink=False):
+        self.buf.release()
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+# Channel source that reads the channels the parent process writes into the command block,
+# with the same read(max_age) / latest() interface as ReceiverThread
+class SharedChannelSource:
+    def __init__(self, block):
+        self.block = block
+        self.neutral = (IBUS_NEUTRAL,) * IBUS_NUM_CHANNELS
+
+    def latest(self):
+        values = self.block.read()
+        if values[0] == 0:
+            return NEUTRAL_SAMPLE
+        return Sample(0, values[0] / 1e9, values[2:])
+
+    def read(self, max_age, now=None):
+        values = self.block.read()
+        now_ns = time.monotonic_ns() if now is None else now * 1e9
+        if values[0] == 0 or now_ns - values[0] > max_age * 1e9:
+            return self.neutral
+        return values[2:]
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+# Function to make the current process as real-time as the system allows
+# Returns a list of what was applied, so the caller can report it
+def make_realtime(cpu=None, fifo_priority=0, freeze_gc=True):
+    applied = []
+    if cpu is not None:
+        os.sched_setaffinity(0, {cpu})
+        applied.append("pinned to CPU %d" % cpu)
+    if fifo_priority:
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(fifo_priority))
+            applied.append("SCHED_FIFO priority %d" % fifo_priority)
+        except PermissionError:
+            print("SCHED_FIFO needs root or CAP_SYS_NICE, running with normal priority", file=sys.stderr)
+    if freeze_gc:
+        gc.collect()
+        gc.freeze()    # Everything allocated so far is never scanned again
+        gc.disable()   # No automatic collections inside the loop
+        applied.append("GC frozen and disabled")
+    return applied
+
+
+# Function to turn SIGTERM into SystemExit in the control process, so its finally block still
+# zeroes the motors and closes the driver when the parent has to terminate() it
+def _exit_on_sigterm(signum, frame):
+    raise SystemExit(128 + signum)
+
+
+# Body of the control process
+# The loop only arms once FLAG_ARMED is set and a fresh frame has arrived, like skysweeper.main()
+def _control_process(config, command_name, telemetry_name):
+    from control import ControlLoop, open_driver, open_serial
+    from encoders import open_encoders
+    from watchdog import start_watchdog
+
+    settings = config['realtime']
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)  # Before opening anything, so it all gets closed
+    # Closed in reverse on every way out, including a failed setup step
+    with contextlib.ExitStack() as stack:
+        command = SharedBlock(COMMAND, command_name)
+        stack.callback(command.close)
+        driver = open_driver(config['motors'])
+        stack.callback(driver.close)
+        encoders = open_encoders(config['encoders'], driver)
+        if encoders is not None:
+            stack.callback(encoders.close)
+        if settings['input'] == 'shared':
+            source = SharedChannelSource(command)
+        else:
+            from receiver import ReceiverThread
+            from udp_input import with_udp
+            ser = open_serial(config['serial'])
+            stack.callback(ser.close)
+            source = with_udp(config['udp'], ReceiverThread(ser))
+        if config['recorder']['path']:
+            from recorder import Recorder
+            recorder = Recorder(config['recorder']['path'], config['recorder']['capacity'],
+                                num_motors=len(driver.motors), flush_every=config['recorder']['flush_every'],
+                                flush_interval_s=config['recorder']['flush_interval_s'])
+            stack.callback(recorder.close)
+        else:
+            recorder = None
+        loop = ControlLoop(config, source, driver, recorder, encoders)
+        telemetry = SharedBlock(telemetry_layout(loop.mixer.num_wheels), telemetry_name)
+        stack.callback(telemetry.close)
+        loop.warm_up(config['startup']['warmup_ticks'])
+        source.start()
+        stack.callback(source.stop)
+        watchdog = start_watchdog(config['failsafe'], loop)
+        if watchdog is not None:
+            stack.callback(watchdog.stop)
+        stack.callback(gc.enable)
+        make_realtime(settings['cpu'], settings['fifo_priority'], settings['freeze_gc'])
+
+        scheduler = loop.scheduler
+        stats_every = settings['stats_every']
+        stats = [0.0] * 4
+        try:
+            while command.read()[1] & FLAG_RUN:
+                scheduler.wait()
+                if command.read()[1] & FLAG_ARMED:
+                    loop.armed = loop.armed or loop.has_fresh_frame()
+                else:
+                    loop.armed = False
+                loop.tick()
+                if stats_every and scheduler.ticks % stats_every == 0:
+                    stats = loop_stats(scheduler)
+                telemetry.write(time.monotonic_ns(), scheduler.ticks, scheduler.overruns, loop.armed,
+                                *loop.filter.outputs, *loop.mixer.outputs, *stats)
+        finally:
+            loop.armed = False
+            telemetry.write(time.monotonic_ns(), scheduler.ticks, scheduler.overruns, False,
+                            *loop.filter.outputs, *loop.mixer.outputs, *loop_stats(scheduler))
+
+
+# Function to pull the tail latency figures out of a LoopScheduler
+def loop_stats(scheduler):
+    stats = scheduler.stats()
+    return [stats['lateness_us']['p99'], stats['lateness_us']['max'],
+            stats['work_us']['p99'], stats['work_us']['max']]
+
+
+# Parent-side handle for the control process
+# Usage:
+#     rt = RealtimeController(config)   # config from config.load_profile()
+#     rt.start()
+#     rt.arm()
+#     rt.send_channels(channels)        # only with realtime.input = 'shared'
+#     print(rt.telemetry())
+#     rt.stop()
+class RealtimeController:
+    def __init__(self, config):
+        from control import make_mixer
+        self.config = config
+        self.wheels = make_mixer(config['mixer']).num_wheels
+        self.command = SharedBlock(COMMAND)
+        self.telemetry_block = SharedBlock(telemetry_layout(self.wheels))
+        self.flags = FLAG_RUN
+        self.channels = [IBUS_NEUTRAL] * IBUS_NUM_CHANNELS
+        self.time_ns = 0
+        self.process = None
+
+    def _publish(self):
+        self.command.write(self.time_ns, self.flags, *self.channels)
+
+    # Function to start the control process (motors stay off until arm())
+    def start(self):
+        self._publish()
+        self.process = multiprocessing.Process(
+            target=_control_process, name='skysweeper-control',
+            args=(self.config, self.command.name, self.telemetry_block.name))
+        self.process.start()
+
+    # Function to allow or stop motor output (the process arms once it has a fresh frame)
+    def arm(self, armed=True):
+        self.flags = FLAG_RUN | FLAG_ARMED if armed else FLAG_RUN
+        self._publish()
+
+    # Function to hand new channel values to the control process
+    def send_channels(self, channels):
+        self.channels[:] = channels
+        self.time_ns = time.monotonic_ns()
+        self._publish()
+
+    # Function to read the newest telemetry as a dict
+    def telemetry(self):
+        values = self.telemetry_block.read()
+        stats = 7 + self.wheels
+        result = {'time_ns': values[0], 'ticks': values[1], 'overruns': values[2], 'armed': bool(values[3]),
+                  'drives': values[4:7], 'outputs': values[7:stats]}
+        result.update(zip(STATS_FIELDS, values[stats:]))
+        return result
+
+    # Function to wait until the process has armed; returns False if it hasn't within timeout
+    # seconds, counted once for opening the hardware and again from its first tick
+    def wait_armed(self, timeout):
+        wait_until = time.monotonic() + timeout
+        started = False
+        while True:
+            t = self.telemetry()
+            if t['armed']:
+                return True
+            if t['ticks'] and not started:
+                started = True
+                wait_until = time.monotonic() + timeout
+            if time.monotonic() > wait_until or not self.process.is_alive():
+                return False
+            time.sleep(0.001)
+
+    # Function to stop the control process (it stops the motors on its way out)
+    # If it doesn't exit in time it gets SIGTERM (which still runs its cleanup), then SIGKILL;
+    # either way the motors are then zeroed from this process too.
+    def stop(self, timeout=2.0):
+        self.flags = 0
+        self._publish()
+        if self.process is not None:
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(timeout)
+                if self.process.is_alive():
+                    self.process.kill()
+                    self.process.join()
+                self.zero_motors()
+        result = self.telemetry()
+        self.command.close(unlink=True)
+        self.telemetry_block.close(unlink=True)
+        return result
+
+    # Function to open the motor backend from this process and stop every motor
+    def zero_motors(self):
+        from control import open_driver
+        open_driver(self.config['motors']).close()
@@ -0,0 +1,106 @@
+import time  # Import time library for monotonic clock and sleeping
+from array import array  # Import array library for fixed-size sample buffers
+
+
+# Fixed-rate control loop scheduler
+# - Sleeps until absolute time.monotonic_ns() deadlines, so work time does not stretch the period
+# - Optionally busy-waits only for the last spin_us microseconds to trim sleep wake-up jitter
+# - Counts overruns (ticks that started after their deadline, or woke up more than a whole period
+#   late) and skips periods that were missed
+# - Keeps the last `window` samples of period, lateness and work time for min/mean/p99/max stats
+#
+# Usage:
+#     scheduler = LoopScheduler(100)  # 100 Hz
+#     while True:
+#         scheduler.wait()
+#         ... one control tick ...
+class LoopScheduler:
+    def __init__(self, rate_hz=100, spin_us=0, window=1000):
+        self.period_ns = int(1e9 / rate_hz)
+        self.spin_ns = int(spin_us * 1000)
+        self.deadline = None     # Absolute start time (ns) of the next tick
+        self.tick_start = None   # When the current tick started
+        self.ticks = 0
+        self.overruns = 0        # Ticks that started late (the previous tick took too long, or a late wake-up)
+        self.missed = 0          # Whole periods skipped because of overruns
+        self.window = window
+        self.periods = array('q', [0] * window)   # Time between tick starts (ns)
+        self.lateness = array('q', [0] * window)  # How late each tick started vs. its deadline (ns)
+        self.work = array('q', [0] * window)      # Time spent inside each tick (ns)
+
+    # Function to block until the next tick is due; call it once at the top of every loop iteration
+    # Returns the tick start time in ns
+    def wait(self):
+        now = time.monotonic_ns()
+        slept = False
+        if self.deadline is None:
+            self.deadline = now  # First tick runs straight away
+        else:
+            index = (self.ticks - 1) % self.window
+            self.work[index] = now - self.tick_start
+            self.deadline += self.period_ns
+            if now > self.deadline:
+                self.overruns += 1
+                skipped = (now - self.deadline) // self.period_ns
+                self.missed += skipped
+                self.deadline += skipped * self.period_ns  # Don't try to catch up with a burst of ticks
+            else:
+                remaining = self.deadline - now - self.spin_ns
+                if remaining > 0:
+                    time.sleep(remaining / 1e9)
+                    slept = True
+                while time.monotonic_ns() < self.deadline:
+                    pass  # Spin for the last few hundred microseconds (only when spin_us > 0)
+
+        start = time.monotonic_ns()
+        index = self.ticks % self.window
+        self.periods[index] = start - self.tick_start if self.tick_start is not None else self.period_ns
+        late = start - self.deadline
+        self.lateness[index] = late
+        if slept and late > self.period_ns:  # sleep() woke up a whole period late: that tick was missed too
+            self.overruns += 1
+            skipped = late // self.period_ns
+            self.missed += skipped
+            self.deadline += skipped * self.period_ns
+        self.tick_start = start
+        self.ticks += 1
+        return start
+
+    # Function to get min/mean/p99/max of one sample buffer in microseconds
+    def _summary(self, samples, count):
+        if count == 0:
+            return {'min': 0.0, 'mean': 0.0, 'p99': 0.0, 'max': 0.0}
+        values = sorted(samples[:count])
+        return {
+            'min': values[0] / 1000,
+            'mean': sum(values) / count / 1000,
+            'p99': values[min(count - 1, int(count * 0.99))] / 1000,
+            'max': values[-1] / 1000,
+        }
+
+    # Function to get loop statistics (all times in microseconds)
+    def stats(self):
+        filled = min(self.ticks, self.window)
+        finished = min(max(self.ticks - 1, 0), self.window)  # The current tick has no work time yet
+        jitter = array('q', (p - self.period_ns for p in self.periods[:filled]))
+        return {
+            'rate_hz': 1e9 / self.period_ns,
+            'ticks': self.ticks,
+            'overruns': self.overruns,
+            'missed': self.missed,
+            'period_us': self._summary(self.periods, filled),
+            'jitter_us': self._summary(jitter, filled),
+            'lateness_us': self._summary(self.lateness, filled),
+            'work_us': self._summary(self.work, finished),
+        }
+
+    # Function to format the statistics as a short human-readable report
+    def report(self):
+        stats = self.stats()
+        lines = ["%d ticks at %.0f Hz, %d overruns, %d missed periods" % (
+            stats['ticks'], stats['rate_hz'], stats['overruns'], stats['missed'])]
+        for name in ('period_us', 'jitter_us', 'lateness_us', 'work_us'):
+            s = stats[name]
+            lines.append("%-12s min %9.1f  mean %9.1f  p99 %9.1f  max %9.1f" % (
+                name, s['min'], s['mean'], s['p99'], s['max']))
+        return "\n".join(lines)
@@ -0,0 +1,157 @@
+import time  # Import time library for timestamps
+
+from motor_driver import HARDWARE_PWM_PINS
+
+# Simulated pigpio connection, a stand-in for pigpio.pi() with no Pi or pigpiod daemon
+# Implements the calls the motor drivers use and behaves like the real daemon where it matters:
+# - set_PWM_frequency() snaps to the nearest frequency the DMA sample rate allows
+# - the real PWM resolution ("real range") depends on that frequency
+# - hardware_PWM() only works on the hardware PWM pins
+# Every write is recorded as (time.monotonic_ns(), call, pin, value) in self.calls
+
+# Divisors of the sample clock that give pigpio's 18 DMA PWM frequencies
+# (default 5us sample rate: 8000, 4000, 2000, 1600, 1000, ... 10 Hz; 1us: 40000, 20000, ... 50 Hz)
+PWM_DIVISORS = (25, 50, 100, 125, 200, 250, 400, 500, 625, 800, 1000, 1250, 2000, 2500, 4000, 5000, 10000, 20000)
+
+DEFAULT_FREQUENCY = 800  # pigpio's default at the default 5us sample rate
+DEFAULT_RANGE = 255
+
+
+class SimPi:
+    def __init__(self, sample_us=5, record=True):
+        self.connected = True
+        self.sample_us = sample_us  # pigpiod -s option: 1, 2, 4, 5, 8 or 10 microseconds
+        self.record = record
+        self.calls = []
+        self.modes = {}
+        self.levels = {}
+        self.frequency = {}
+        self.range = {}
+        self.dutycycle = {}
+        self.hardware = {}  # pin -> (frequency, duty 0-1000000)
+        self.pulls = {}
+        self.glitch = {}
+        self.callbacks = {}  # pin -> list of SimCallback
+        self.tick = 0        # Microsecond tick passed to callbacks, like pigpio's
+
+    # Function to list the DMA PWM frequencies available at this sample rate
+    def frequencies(self):
+        return [int(1000000 / self.sample_us / divisor + 0.5) for divisor in PWM_DIVISORS]
+
+    def _record(self, call, pin, value):
+        if self.record:
+            self.calls.append((time.monotonic_ns(), call, pin, value))
+
+    def set_mode(self, pin, mode):
+        self.modes[pin] = mode
+
+    def write(self, pin, level):
+        self.levels[pin] = 1 if level else 0
+        self._record('write', pin, self.levels[pin])
+
+    def read(self, pin):
+        return self.levels.get(pin, 0)
+
+    def set_pull_up_down(self, pin, pud):
+        self.pulls[pin] = pud
+
+    def set_glitch_filter(self, pin, steady):
+        self.glitch[pin] = steady
+
+    # Function to register an edge callback; edge is 0 (rising), 1 (falling) or 2 (either)
+    def callback(self, pin, edge=0, func=None):
+        cb = SimCallback(self, pin, edge, func)
+        self.callbacks.setdefault(pin, []).append(cb)
+        return cb
+
+    # Function to drive an input pin from outside (e.g. a simulated encoder) and fire its callbacks
+    def set_input(self, pin, level, tick=None):
+        level = 1 if level else 0
+        if self.levels.get(pin, 0) == level:
+            return
+        self.levels[pin] = level
+        self.tick = self.tick + 1 if tick is None else tick
+        for cb in self.callbacks.get(pin, ()):
+            if cb.edge == 2 or cb.edge == (0 if level else 1):
+                cb.func(pin, level, self.tick)
+
+    def set_bank_1(self, bits):
+        for pin in range(32):
+            if bits >> pin & 1:
+                self.levels[pin] = 1
+        self._record('set_bank_1', None, bits)
+
+    def clear_bank_1(self, bits):
+        for pin in range(32):
+            if bits >> pin & 1:
+                self.levels[pin] = 0
+        self._record('clear_bank_1', None, bits)
+
+    # Returns the frequency actually used (the closest available one)
+    def set_PWM_frequency(self, pin, frequency):
+        self.frequency[pin] = min(self.frequencies(), key=lambda f: abs(f - frequency))
+        return self.frequency[pin]
+
+    def get_PWM_frequency(self, pin):
+        if pin in self.hardware:
+            return self.hardware[pin][0]
+        return self.frequency.get(pin, DEFAULT_FREQUENCY)
+
+    # Returns the real range (resolution) at the pin's current frequency, like pigpio
+    def set_PWM_range(self, pin, range_):
+        if not 25 <= range_ <= 40000:
+            raise ValueError("PWM range must be 25-40000, got %r" % (range_,))
+        self.range[pin] = range_
+        return self.get_PWM_real_range(pin)
+
+    def get_PWM_range(self, pin):
+        return self.range.get(pin, DEFAULT_RANGE)
+
+    def get_PWM_real_range(self, pin):
+        if pin in self.hardware:
+            return int(250000000 / self.hardware[pin][0])  # 250 MHz PWM clock
+        return int(1000000 / self.sample_us / self.get_PWM_frequency(pin) + 0.5)
+
+    def set_PWM_dutycycle(self, pin, dutycycle):
+        if not 0 <= dutycycle <= self.get_PWM_range(pin):
+            raise ValueError("duty cycle %r outside range 0-%d on GPIO %d" % (dutycycle, self.get_PWM_range(pin), pin))
+        self.hardware.pop(pin, None)
+        self.dutycycle[pin] = dutycycle
+        self._record('set_PWM_dutycycle', pin, dutycycle)
+
+    def get_PWM_dutycycle(self, pin):
+        return self.dutycycle.get(pin, 0)
+
+    def hardware_PWM(self, pin, frequency, duty):
+        if pin not in HARDWARE_PWM_PINS:
+            raise ValueError("GPIO %d has no hardware PWM" % pin)
+        if not 0 <= duty <= 1000000:
+            raise ValueError("hardware PWM duty must be 0-1000000, got %r" % (duty,))
+        self.hardware[pin] = (frequency, duty)
+        self._record('hardware_PWM', pin, duty)
+
+    # Function to get the fraction of time a pin is high (0.0-1.0), whichever way it is driven
+    def duty(self, pin):
+        if pin in self.hardware:
+            return self.hardware[pin][1] / 1000000
+        if pin in self.dutycycle:
+            steps = self.get_PWM_real_range(pin)
+            return round(self.dutycycle[pin] / self.get_PWM_range(pin) * steps) / steps
+        return float(self.levels.get(pin, 0))
+
+    def stop(self):
+        self.connected = False
+
+
+# Handle returned by SimPi.callback(), like pigpio's _callback
+class SimCallback:
+    def __init__(self, pi, pin, edge, func):
+        self.pi = pi
+        self.pin = pin
+        self.edge = edge
+        self.func = func
+
+    def cancel(self):
+        callbacks = self.pi.callbacks.get(self.pin, [])
+        if self in callbacks:
+            callbacks.remove(self)
@@ -0,0 +1,80 @@
+import threading  # Import threading library for the simulated receiver stream
+import time  # Import time library for simulated read timeouts
+from collections import deque
+
+
+# In-memory stand-in for serial.Serial, for running the control code without a receiver
+# - feed() queues bytes as if the receiver had sent them
+# - read(), readinto() and in_waiting behave like pyserial (read() waits up to `timeout` if empty)
+# - everything written with write() is kept in self.written
+class SimSerial:
+    def __init__(self, data=b'', timeout=0):
+        self.buffer = bytearray(data)
+        self.chunks = deque()   # Data released one chunk at a time by release()
+        self.timeout = timeout
+        self.written = bytearray()
+        self.is_open = True
+        self.bytes_read = 0
+
+    # Function to make bytes available to the reader immediately
+    def feed(self, data):
+        self.buffer += data
+
+    # Function to queue bytes that only become readable on a later release() call
+    def queue(self, data):
+        self.chunks.append(bytes(data))
+
+    # Function to make the next queued chunk readable (e.g. one iBus frame per simulated 7ms)
+    def release(self):
+        if self.chunks:
+            self.buffer += self.chunks.popleft()
+            return True
+        return False
+
+    @property
+    def in_waiting(self):
+        return len(self.buffer)
+
+    def read(self, size=1):
+        if not self.buffer and self.timeout:
+            time.sleep(self.timeout)
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        self.bytes_read += len(data)
+        return data
+
+    def readinto(self, b):
+        if not self.buffer and self.timeout:
+            time.sleep(self.timeout)
+        count = min(len(b), len(self.buffer))
+        b[:count] = self.buffer[:count]
+        del self.buffer[:count]
+        self.bytes_read += count
+        return count
+
+    def write(self, data):
+        self.written += data
+        return len(data)
+
+    def reset_input_buffer(self):
+        self.buffer.clear()
+
+    def close(self):
+        self.is_open = False
+
+
+# Function to make a SimSerial receive an iBus frame every `interval` seconds on a background
+# thread, like a real receiver would. Returns an Event; set() it to stop the stream.
+# - values: the 14 channel values to send (e.g. [1500] * 14 for centered sticks); the list can
+#   be changed while streaming to move the sticks
+def start_frame_stream(ser, values, interval=0.007):
+    from ibus import encode_frame
+    stop = threading.Event()
+
+    def stream():
+        frame = bytearray(32)
+        while not stop.wait(interval):
+            ser.feed(encode_frame(values, frame))
+
+    threading.Thread(target=stream, name='sim-receiver', daemon=True).start()
+    return stop
@@ -0,0 +1,64 @@
+import time  # Import time library for the model clock
+from array import array  # Import array library for the count buffers
+
+from motor_driver import MAX_SPEED
+
+
+# Simulated motors with quadrature encoders, driven by a motor driver's current outputs
+# Each wheel is a first-order motor: its speed moves toward the commanded speed with time constant
+# `time_constant_s`, minus a per-wheel load (the fraction of speed lost to slope and drag).
+# The encoder counts integrate that speed. Works with any driver that has speed(index)
+# (SimDriver, SimPigpioDriver), so the real control loop runs closed-loop without hardware.
+# - max_counts_per_s: count rate at full speed with no load
+# - loads: fraction of speed lost per wheel, e.g. (0.0, 0.1, 0.25)
+# - deadzone: speeds (in 0-255 units) too small to overcome static friction
+# - substep_s: integration step
+#
+# Has the same sample() interface as PigpioEncoders; the model is advanced up to the current time
+# on every sample() call (or use advance(dt) to step it offline without a clock).
+class SimWheels:
+    def __init__(self, driver, max_counts_per_s=3000, time_constant_s=0.08, loads=None, deadzone=0.0,
+                 substep_s=0.001):
+        self.driver = driver
+        self.wheels = len(driver.motors)
+        self.max_counts_per_s = max_counts_per_s
+        self.time_constant_s = time_constant_s
+        self.loads = tuple(loads) if loads is not None else (0.0,) * self.wheels
+        if len(self.loads) != self.wheels:
+            raise ValueError("expected %d loads, got %d" % (self.wheels, len(self.loads)))
+        self.deadzone = deadzone
+        self.substep_s = substep_s
+        self.rates = array('d', [0.0] * self.wheels)      # Wheel speed in counts per second
+        self.position = array('d', [0.0] * self.wheels)   # Exact position in counts
+        self.counts = array('q', [0] * self.wheels)       # What the encoders report
+        self.last_time = None
+
+    # Function to run the model forward by dt seconds with the driver's current outputs
+    def advance(self, dt):
+        driver, rates, position, counts = self.driver, self.rates, self.position, self.counts
+        scale = self.max_counts_per_s / MAX_SPEED
+        while dt > 0:
+            step = self.substep_s if dt > self.substep_s else dt
+            k = step / self.time_constant_s
+            if k > 1.0:
+                k = 1.0
+            for i in range(self.wheels):
+                command = driver.speed(i)
+                if -self.deadzone < command < self.deadzone:
+                    command = 0.0
+                goal = command * scale * (1.0 - self.loads[i])
+                rates[i] += (goal - rates[i]) * k
+                position[i] += rates[i] * step
+                counts[i] = int(position[i])
+            dt -= step
+
+    # Function to get the counts, after advancing the model to now
+    def sample(self):
+        now = time.monotonic_ns()
+        if self.last_time is not None:
+            self.advance((now - self.last_time) / 1e9)
+        self.last_time = now
+        return self.counts
+
+    def close(self):
+        pass
@@ -0,0 +1,169 @@
+import time  # Imported first so startup time is measured from the very start
+
+START = time.monotonic()
+
+import argparse  # Import argparse library for command line options
+import contextlib  # Import contextlib library to close whatever was opened on every exit path
+import sys
+import threading  # Import threading library to open the hardware in parallel
+
+from config import list_profiles, load_profile
+from control import ControlLoop, open_driver, open_serial
+from encoders import open_encoders
+from metrics import serve_metrics
+from receiver import ReceiverThread
+from udp_input import with_udp
+from watchdog import start_watchdog
+
+# Single entry point for every robot:
+#     python skysweeper.py --profile omniwheels       (pigpio, PWM + direction pins)
+#     python skysweeper.py --profile wheel_control    (RPi.GPIO, dual-PWM H-bridges)
+#     python skysweeper.py --profile sim              (no hardware at all)
+# Pin maps, rates and mixer settings come from profiles/<name>.json (see config.py).
+# pigpio / RPi.GPIO / pyserial are only imported for the backend the profile picks.
+
+
+# Function to run several slow setup steps at the same time, with an overall timeout
+# - tasks: dict of name -> function
+# Returns a dict of name -> result; raises TimeoutError naming the steps that hung
+# (e.g. pigpio.pi() when the pigpiod daemon is slow) and re-raises the first error.
+# On failure the steps that did finish are closed first, so e.g. the motor driver isn't left
+# open when only the serial port failed.
+def init_parallel(tasks, timeout):
+    results, errors = {}, {}
+
+    def run(name, task):
+        try:
+            results[name] = task()
+        except Exception as e:  # Reported to the caller below
+            errors[name] = e
+
+    threads = [threading.Thread(target=run, args=item, name='init-' + item[0], daemon=True)
+               for item in tasks.items()]
+    for t in threads:
+        t.start()
+    deadline = time.monotonic() + timeout
+    for t in threads:
+        t.join(max(0.0, deadline - time.monotonic()))
+    hung = [name for name in tasks if name not in results and name not in errors]
+    if hung or errors:
+        for result in list(results.values()):
+            if hasattr(result, 'close'):
+                result.close()
+    if hung:
+        raise TimeoutError("hardware init timed out after %.1fs: %s" % (timeout, ", ".join(hung)))
+    for name, error in errors.items():
+        raise RuntimeError("%s init failed: %s" % (name, error)) from error
+    return results
+
+
+# Function to run the control loop in its own real-time process (see rt_process.py)
+# This process only arms it and prints its telemetry once a second
+def run_realtime(config, duration=None):
+    from rt_process import RealtimeController
+    # Nothing here calls send_channels(), so with 'shared' the loop would never see a frame
+    if config['realtime']['input'] == 'shared':
+        raise ValueError("realtime input 'shared' needs a program that feeds channels with "
+                         "RealtimeController.send_channels(); use 'ibus' with skysweeper.py --realtime")
+    rt = RealtimeController(config)
+    rt.start()
+    try:
+        # The control process arms once its receiver delivers a valid frame
+        rt.arm()
+        if not rt.wait_armed(config['startup']['init_timeout_s']):
+            print("No valid iBus frame received, not arming", file=sys.stderr)
+            sys.exit(1)
+        stop_at = None if duration is None else time.monotonic() + duration
+        while stop_at is None or time.monotonic() < stop_at:
+            time.sleep(1.0 if stop_at is None else max(0.0, min(1.0, stop_at - time.monotonic())))
+            t = rt.telemetry()
+            print("ticks %d, overruns %d, outputs %s" % (
+                t['ticks'], t['overruns'], ", ".join("%.1f" % v for v in t['outputs'])))
+    except KeyboardInterrupt:
+        print("Program terminated")
+    finally:
+        t = rt.stop()
+        print("lateness p99 %.1fus max %.1fus, work p99 %.1fus max %.1fus" % (
+            t['lateness_p99_us'], t['lateness_max_us'], t['work_p99_us'], t['work_max_us']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SkySweeper wheel control")
+    parser.add_argument('--profile', default='wheel_control', help="profile name or JSON file")
+    parser.add_argument('--list', action='store_true', help="list the available profiles")
+    parser.add_argument('--duration', type=float, help="stop after this many seconds")
+    parser.add_argument('--realtime', action='store_true',
+                        help="run the control loop in a separate pinned process (profile 'realtime' settings)")
+    args = parser.parse_args(argv)
+    if args.list:
+        print("\n".join(list_profiles()))
+        return
+
+    config = load_profile(args.profile)
+    if args.realtime:
+        run_realtime(config, args.duration)
+        return
+    startup = config['startup']
+    timings = {'config': time.monotonic() - START}
+
+    # Everything opened below is closed on every way out: init errors, not arming, Ctrl+C
+    with contextlib.ExitStack() as stack:
+        hardware = init_parallel({
+            'serial': lambda: open_serial(config['serial']),
+            'motors': lambda: open_driver(config['motors']),
+        }, startup['init_timeout_s'])
+        ser, driver = hardware['serial'], hardware['motors']
+        stack.callback(ser.close)
+        stack.callback(driver.close)
+        timings['hardware'] = time.monotonic() - START
+
+        encoders = open_encoders(config['encoders'], driver)
+        if encoders is not None:
+            stack.callback(encoders.close)
+        recorder = None
+        if config['recorder']['path']:
+            from recorder import Recorder
+            settings = config['recorder']
+            recorder = Recorder(settings['path'], settings['capacity'], num_motors=len(driver.motors),
+                                flush_every=settings['flush_every'],
+                                flush_interval_s=settings['flush_interval_s'])
+            stack.callback(recorder.close)
+        receiver = with_udp(config['udp'], ReceiverThread(ser))
+        stack.callback(receiver.stop)
+        loop = ControlLoop(config, receiver, driver, recorder, encoders)
+        watchdog = start_watchdog(config['failsafe'], loop)  # Idle until armed
+        if watchdog is not None:
+            stack.callback(watchdog.stop)
+        metrics_server = serve_metrics(config['metrics'], loop)
+        if metrics_server is not None:
+            stack.callback(metrics_server.close)
+        receiver.start()
+        loop.warm_up(startup['warmup_ticks'])  # Dry ticks: nothing is sent to the motors
+        timings['warmup'] = time.monotonic() - START
+
+        # Arm once the receiver delivers a valid frame, then send the first real motor command
+        wait_until = time.monotonic() + startup['init_timeout_s']
+        while not loop.has_fresh_frame():
+            if time.monotonic() > wait_until:
+                print("No valid iBus frame received, not arming", file=sys.stderr)
+                sys.exit(1)
+            time.sleep(0.001)
+        loop.armed = True
+        loop.tick()
+        timings['first_command'] = time.monotonic() - START
+
+        print("Startup (s since launch): " + ", ".join("%s %.3f" % item for item in timings.items()))
+        if timings['first_command'] > startup['budget_s']:
+            print("Warning: first motor command took %.3fs, over the %.3fs budget"
+                  % (timings['first_command'], startup['budget_s']), file=sys.stderr)
+
+        stop_at = None if args.duration is None else time.monotonic() + args.duration
+        try:
+            loop.run(lambda: stop_at is None or time.monotonic() < stop_at)
+        except KeyboardInterrupt:
+            print("Program terminated")
+        finally:
+            print(loop.scheduler.report())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+from bench.pipeline import bench_loop_allocations, synthetic_stream
+
+TICKS = 2000
+
+# What may still be allocated after TICKS traced ticks: the values the last tick left in
+# attributes (~30 blocks, ~900 B on CPython 3.11). One block leaked per tick would be TICKS blocks
+MAX_RETAINED_BLOCKS = 100
+MAX_RETAINED_BYTES = 4096
+
+
+# A steady-state ControlLoop tick must not leave any GC-tracked objects behind: they are what
+# triggers garbage collections, and a collection inside the loop is a missed period
+def test_control_loop_tick_creates_no_gc_objects():
+    result = bench_loop_allocations(synthetic_stream(500, noise=0.05), profile='sim', ticks=TICKS)
+    assert result['closed_loop']
+    assert result['gc_objects_per_tick'] == 0
+
+
+# Nor any memory at all that outlives the tick (gc counts miss boxed ints, floats, bytes...)
+def test_control_loop_tick_retains_no_memory():
+    result = bench_loop_allocations(synthetic_stream(500, noise=0.05), profile='sim', ticks=TICKS)
+    assert result['retained_blocks'] <= MAX_RETAINED_BLOCKS
+    assert result['retained_bytes'] <= MAX_RETAINED_BYTES
@@ -0,0 +1,53 @@
+from bench.failsafe import ScriptedSource
+from config import load_profile
+from control import ControlLoop
+from motor_driver import SimDriver
+
+
+# Function to build a sim ControlLoop driving forward on the sticks
+def forward_loop():
+    config = load_profile('sim')
+    driver = SimDriver(config['motors']['pins'], config['motors']['mode'], record=False)
+    source = ScriptedSource(config['channels']['drive2'])
+    return ControlLoop(config, source, driver), source, driver
+
+
+# Disarming must stop the motors on the next tick, not leave them at the last duty
+def test_disarm_stops_moving_motors():
+    loop, source, driver = forward_loop()
+    loop.armed = True
+    for _ in range(50):
+        source.feed()
+        loop.tick()
+    assert any(driver.speed(i) != 0 for i in range(len(driver.motors)))
+    loop.motion.push((0.0, 0.0, 0.5), 10)
+    source.feed()
+    loop.tick()
+    assert loop.motion.active()
+    loop.armed = False
+    source.feed()
+    loop.tick()
+    assert [driver.speed(i) for i in range(len(driver.motors))] == [0] * len(driver.motors)
+    assert loop.output is None
+    assert not loop.motion.active()
+    for _ in range(10):  # Sticks still forward: nothing is written while disarmed
+        source.feed()
+        loop.tick()
+    assert [driver.speed(i) for i in range(len(driver.motors))] == [0] * len(driver.motors)
+
+
+# Re-arming starts the filter from 0 instead of jumping back to the old command
+def test_rearm_starts_from_rest():
+    loop, source, driver = forward_loop()
+    loop.armed = True
+    for _ in range(50):
+        source.feed()
+        loop.tick()
+    moving = max(abs(driver.speed(i)) for i in range(len(driver.motors)))
+    loop.armed = False
+    source.feed()
+    loop.tick()
+    loop.armed = True
+    source.feed()
+    loop.tick()
+    assert 0 < max(abs(driver.speed(i)) for i in range(len(driver.motors))) < moving
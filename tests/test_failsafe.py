@@ -0,0 +1,27 @@
+import pytest
+
+from bench.failsafe import MAX_REACTION_MS, bench_reaction, run_disarm_trial
+from watchdog import CUT, RAMP
+
+
+# Worst-case time from the failsafe deadline running out to the watchdog's first safe write, for a
+# dropped link and for a control loop hung in its receiver read
+@pytest.mark.parametrize('scenario', ['link', 'loop'])
+@pytest.mark.parametrize('action', [CUT, RAMP])
+def test_worst_reaction_within_bound(scenario, action):
+    result = bench_reaction(scenario, action, trials=5, deadline_ms=50, check_ms=5, frame_ms=7, settle_s=0.05)
+    assert result['reaction_us']['max'] / 1000 <= MAX_REACTION_MS
+
+
+# Disarming mid-motion stops the motors within a couple of loop periods, without a trip; if the
+# loop hangs at the same moment, the watchdog still cuts them within the deadline
+@pytest.mark.parametrize('hang', [False, True])
+def test_disarm_during_motion_stops_motors(hang):
+    for _ in range(3):
+        stopped, trips = run_disarm_trial(hang, CUT, deadline_ms=50, check_ms=5, frame_ms=7, settle_s=0.05)
+        if hang:
+            assert stopped / 1e6 <= 50 + MAX_REACTION_MS
+            assert trips == 1
+        else:
+            assert stopped / 1e6 <= MAX_REACTION_MS
+            assert trips == 0
@@ -0,0 +1,62 @@
+from ibus import IBUS_FRAME_LEN, IBusParser, decode_frame, encode_frame, new_channels
+
+
+def frame(*values):
+    return bytes(encode_frame(list(values)))
+
+
+def test_garbage_before_header_is_skipped():
+    parser = IBusParser()
+    assert parser.feed(b'\x00\x20\x13\xff' + frame(1800, 1200))
+    assert list(parser.channels[:3]) == [1800, 1200, 1500]
+    assert parser.dropped_bytes == 4
+
+
+def test_bad_checksum_is_rejected_and_last_values_kept():
+    parser = IBusParser()
+    parser.feed(frame(1700))
+    bad = bytearray(frame(1100))
+    bad[-1] ^= 0xFF
+    assert not parser.feed(bytes(bad))
+    assert parser.channels[0] == 1700
+    assert parser.bad_frames == 1
+
+
+def test_frame_split_across_reads():
+    parser = IBusParser()
+    data = frame(1300, 1600)
+    assert not parser.feed(data[:11])
+    assert parser.feed(data[11:])
+    assert list(parser.channels[:2]) == [1300, 1600]
+    assert parser.frames == 1
+
+
+def test_back_to_back_frames_keep_the_newest():
+    parser = IBusParser()
+    assert parser.feed(frame(1100) + frame(1200) + frame(1900))
+    assert parser.frames == 3
+    assert parser.channels[0] == 1900
+    assert parser.head == parser.tail == 3 * IBUS_FRAME_LEN
+
+
+def test_resync_after_a_dropped_byte():
+    parser = IBusParser()
+    parser.feed(frame(1100)[1:])  # First byte lost: no valid frame in it
+    assert parser.frames == 0
+    assert parser.feed(frame(1400))
+    assert parser.channels[0] == 1400
+
+
+def test_ring_wraps_around():
+    parser = IBusParser(ring_size=64)
+    for value in range(1000, 1020):
+        assert parser.feed(b'\x55' + frame(value))
+        assert parser.channels[0] == value
+
+
+def test_decode_frame_updates_in_place():
+    channels = new_channels()
+    assert decode_frame(frame(*range(1000, 1014)), channels)
+    assert list(channels) == list(range(1000, 1014))
+    assert not decode_frame(bytes(IBUS_FRAME_LEN), channels)
+    assert channels[13] == 1013
@@ -0,0 +1,25 @@
+import time
+
+from scheduler import LoopScheduler
+
+
+# A sleep that wakes up more than a whole period late counts as an overrun, like a slow tick does
+def test_late_wake_up_counts_as_overrun(monkeypatch):
+    scheduler = LoopScheduler(100)
+    scheduler.wait()
+    sleep = time.sleep
+    monkeypatch.setattr(time, 'sleep', lambda seconds: sleep(seconds + 0.025))
+    scheduler.wait()
+    monkeypatch.setattr(time, 'sleep', sleep)
+    assert scheduler.overruns == 1
+    assert scheduler.missed == 2
+    scheduler.wait()  # Back on the grid: no burst of catch-up ticks
+    assert scheduler.overruns == 1
+    assert scheduler.stats()['lateness_us']['max'] > 20000
+
+
+def test_on_time_ticks_are_not_overruns():
+    scheduler = LoopScheduler(200)
+    for _ in range(5):
+        scheduler.wait()
+    assert scheduler.overruns == 0
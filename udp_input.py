@@ -0,0 +1,193 @@
+import select  # Import select library to check the socket without blocking or raising
+import socket  # Import socket library for the UDP link
+import struct  # Import struct library for the datagram layout
+import time
+
+from ibus import IBUS_NUM_CHANNELS, new_channels
+from receiver import NEUTRAL_SAMPLE, Sample
+
+# Command datagram from the ground station (42 bytes, little-endian)
+#   magic      2 bytes   b'SK'
+#   seq        uint32    +1 per packet (wraps around)
+#   sent_ns    int64     sender's monotonic clock in ns (only differences are used, clocks needn't match)
+#   channels   14 x uint16, same values and order as iBus (1000-2000)
+PACKET = struct.Struct('<2sIq%dH' % IBUS_NUM_CHANNELS)
+MAGIC = b'SK'
+DEFAULT_PORT = 5760
+
+_SEQ_MASK = 0xFFFFFFFF
+
+
+# Function to build one command datagram
+def encode_packet(seq, sent_ns, channels):
+    return PACKET.pack(MAGIC, seq & _SEQ_MASK, sent_ns, *channels)
+
+
+# Ground station side: sends channel values to a robot
+class UDPSender:
+    def __init__(self, host, port=DEFAULT_PORT):
+        self.address = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.seq = 0
+
+    # Function to send one command; returns the time.monotonic_ns() stamped into it
+    def send(self, channels):
+        self.seq += 1
+        sent_ns = time.monotonic_ns()
+        self.sock.sendto(encode_packet(self.seq, sent_ns, channels), self.address)
+        return sent_ns
+
+    def close(self):
+        self.sock.close()
+
+
+# Robot side: channel source fed by UDP datagrams, with the same read(max_age) / latest() interface
+# as ReceiverThread, so it plugs into ControlLoop (or an InputArbiter) unchanged.
+# There is no thread: every read() drains the non-blocking socket and keeps only the newest packet.
+# - max_latency: packets that took this much longer than the quickest recent packet are dropped
+#   as late. Transit time is measured against the sender's clock, using the quickest packet of the
+#   last `window` packets as the reference, so the two clocks don't need to be synchronized.
+# - restart_after: after this many seconds without a packet any sequence number is accepted again
+#   (the ground station was restarted)
+class UDPInput:
+    def __init__(self, port=DEFAULT_PORT, host='0.0.0.0', max_latency=0.05, window=256, restart_after=1.0):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.address = self.sock.getsockname()  # Actual port when bound to port 0
+        self.poller = select.poll()
+        self.poller.register(self.sock, select.POLLIN)
+        self.buf = bytearray(PACKET.size + 1)    # One spare byte to catch oversized datagrams
+        self.max_latency_ns = int(max_latency * 1e9)
+        self.window = window
+        self.restart_after = restart_after
+        self.channels = new_channels()  # Newest accepted channels, updated in place
+        self.neutral = new_channels()   # Returned when the newest packet is too old
+        self.seq = None                 # Sequence number of the newest accepted packet
+        self.timestamp = None           # time.monotonic() when it arrived
+        self.offset_min = None          # Quickest (arrival - sent) of the current window
+        self.offset_ref = None          # Reference for the late check
+        self.offset_count = 0
+        self.packets = 0                # Packets accepted
+        self.bad_packets = 0            # Wrong size or magic
+        self.dropped_old = 0            # Out of order or repeated
+        self.dropped_late = 0
+
+    # Function to read every waiting datagram; returns True if a new command was accepted
+    def poll(self):
+        accepted = False
+        sock, buf, poll = self.sock, self.buf, self.poller.poll
+        while poll(0):
+            try:
+                size = sock.recv_into(buf)
+            except (BlockingIOError, InterruptedError):
+                break
+            now_ns = time.monotonic_ns()
+            if size != PACKET.size or buf[0:2] != MAGIC:
+                self.bad_packets += 1
+                continue
+            values = PACKET.unpack_from(buf)
+            if self._accept(values[1], now_ns - values[2], now_ns):
+                channels = self.channels
+                for i in range(IBUS_NUM_CHANNELS):
+                    channels[i] = values[3 + i]
+                accepted = True
+        return accepted
+
+    # Function to apply the sequence and lateness checks to one packet
+    def _accept(self, seq, offset, now_ns):
+        if self.offset_min is None or offset < self.offset_min:
+            self.offset_min = offset
+        if self.offset_ref is None or offset < self.offset_ref:
+            self.offset_ref = offset
+        self.offset_count += 1
+        if self.offset_count >= self.window:  # Start a new window, so clock drift can't pile up
+            self.offset_ref = self.offset_min
+            self.offset_min = None
+            self.offset_count = 0
+        restarted = self.timestamp is None or now_ns / 1e9 - self.timestamp > self.restart_after
+        if not restarted and not 0 < (seq - self.seq) & _SEQ_MASK < 0x80000000:
+            self.dropped_old += 1
+            return False
+        if offset - self.offset_ref > self.max_latency_ns:
+            self.dropped_late += 1
+            return False
+        self.seq = seq
+        self.timestamp = now_ns / 1e9
+        self.packets += 1
+        return True
+
+    # Function for the control loop: newest channels, or neutral if the newest packet is too old
+    # Returns the same array every time (updated in place)
+    def read(self, max_age, now=None):
+        self.poll()
+        if self.timestamp is None or (time.monotonic() if now is None else now) - self.timestamp > max_age:
+            return self.neutral
+        return self.channels
+
+    # Function to get the newest sample accepted by read() (doesn't touch the socket, so other
+    # threads such as the failsafe watchdog can call it)
+    def latest(self):
+        if self.timestamp is None:
+            return NEUTRAL_SAMPLE
+        return Sample(self.seq, self.timestamp, tuple(self.channels))
+
+    def start(self):
+        pass
+
+    def stop(self):
+        self.sock.close()
+
+
+# Picks the channel source that drives the robot, e.g. InputArbiter([receiver, udp])
+# Sources are listed in priority order; each tick the first one with a fresh command wins, so with
+# [receiver, udp] the RC transmitter overrides the ground station whenever it's on, and the ground
+# station takes over when the RC link goes quiet. With nothing fresh the sticks read neutral.
+# Every source is read on every tick, so lower priority inputs stay drained and current.
+# Sources signal "nothing fresh" by returning their own `neutral` array from read().
+class InputArbiter:
+    def __init__(self, sources):
+        self.sources = list(sources)
+        self.neutral = new_channels()
+        self.active = None   # Index of the source in control (None = neutral)
+        self.switches = 0    # How often control changed hands (including to and from neutral)
+
+    def read(self, max_age, now=None):
+        chosen = result = None
+        for index in range(len(self.sources)):
+            source = self.sources[index]
+            channels = source.read(max_age, now)
+            if chosen is None and channels is not source.neutral:
+                chosen, result = index, channels
+        if chosen != self.active:
+            self.active = chosen
+            self.switches += 1
+        return self.neutral if result is None else result
+
+    # Function to get the newest sample of any source
+    def latest(self):
+        samples = [source.latest() for source in self.sources]
+        fresh = [sample for sample in samples if sample.timestamp is not None]
+        return max(fresh, key=lambda sample: sample.timestamp) if fresh else NEUTRAL_SAMPLE
+
+    def start(self):
+        for source in self.sources:
+            source.start()
+
+    def stop(self):
+        for source in self.sources:
+            source.stop()
+
+
+# Function to add the UDP input from a profile's 'udp' section next to the RC receiver
+# Returns the receiver unchanged when no UDP port is configured
+def with_udp(settings, receiver):
+    if settings['port'] is None:
+        return receiver
+    udp = UDPInput(settings['port'], settings['host'], settings['max_latency_ms'] / 1000)
+    if settings['priority'] == 'rc':
+        return InputArbiter([receiver, udp])
+    if settings['priority'] == 'udp':
+        return InputArbiter([udp, receiver])
+    raise ValueError("udp priority must be 'rc' or 'udp', got %r" % (settings['priority'],))
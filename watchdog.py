@@ -0,0 +1,112 @@
+import threading  # Import threading library to run independently of the control loop
+import time
+from array import array
+from time import monotonic_ns
+
+# What the watchdog does to the motors when it trips
+# - CUT:  stop all motors at once
+# - RAMP: bring the last commanded speeds down to 0 over ramp_ms
+CUT = 'cut'
+RAMP = 'ramp'
+
+
+# Failsafe watchdog for a ControlLoop, running on its own thread
+# Trips when, while armed (or disarmed but the loop hasn't stopped the motors yet), either
+# - the newest valid frame from the receiver is older than the deadline (link lost), or
+# - the control loop hasn't reached its output stage within the deadline (loop hung, e.g. in a read)
+# Once tripped the loop stops writing to the motors (it checks `tripped` under `lock`), its filter
+# is held at 0 and scripted moves are cancelled. The watchdog then cuts or ramps the outputs itself.
+# It clears again when frames are fresh and the loop is ticking, and the loop picks up from 0.
+# Worst-case reaction time after the deadline is about one check period (see bench/failsafe.py).
+# - deadline_ms: largest allowed frame / loop age
+# - check_ms: how often the ages are checked
+class FailsafeWatchdog(threading.Thread):
+    def __init__(self, loop, deadline_ms=50, action=CUT, ramp_ms=200, check_ms=5):
+        super().__init__(name='failsafe', daemon=True)
+        if action not in (CUT, RAMP):
+            raise ValueError("unknown failsafe action: %r" % (action,))
+        self.loop = loop
+        self.deadline_ns = int(deadline_ms * 1e6)
+        self.action = action
+        self.ramp_ns = int(ramp_ms * 1e6)
+        self.check_s = check_ms / 1000
+        self.lock = threading.Lock()  # Held by the loop while it writes to the motors
+        self.tripped = False
+        self.heartbeat = None      # monotonic_ns() of the loop's last output stage (set by the loop)
+        self.trips = 0
+        self.reason = None         # 'link' or 'loop' for the latest trip
+        self.deadline_time = None  # When the latest deadline ran out (ns)
+        self.trip_time = None      # When the watchdog noticed (ns)
+        self.action_time = None    # When the first safe write was done (ns)
+        self.running = threading.Event()
+        self.running.set()
+        self.speeds = array('d', [0.0] * loop.mixer.num_wheels)
+        loop.watchdog = self
+
+    def run(self):
+        loop, deadline = self.loop, self.deadline_ns
+        while self.running.is_set():
+            time.sleep(self.check_s)
+            if not loop.armed and loop.output is None:  # Idle only once the loop has stopped the motors
+                self.heartbeat = None
+                continue
+            now = monotonic_ns()
+            frame_time = loop.receiver.latest().timestamp
+            frame_ns = 0 if frame_time is None else int(frame_time * 1e9)
+            beat = self.heartbeat if self.heartbeat is not None else now
+            if now - frame_ns > deadline:
+                late, expired = 'link', frame_ns + deadline
+            elif now - beat > deadline:
+                late, expired = 'loop', beat + deadline
+            else:
+                late = None
+            if late is not None and not self.tripped:
+                self._trip(late, expired, now)
+            elif late is None and self.tripped:
+                self.tripped = False
+
+    # Function to take the motors away from the loop and cut or ramp them
+    def _trip(self, reason, expired, now):
+        loop = self.loop
+        locked = self.lock.acquire(timeout=self.deadline_ns / 1e9)  # A hung loop may hold it: go ahead anyway
+        try:
+            self.tripped = True
+            self.trips += 1
+            self.reason, self.deadline_time, self.trip_time = reason, expired, now
+            self.action_time = None
+            speeds = self.speeds
+            last = loop.output
+            for i in range(len(speeds)):
+                speeds[i] = last[i] if last is not None else 0.0
+            if self.action == CUT:
+                loop.driver.stop()
+                self.action_time = monotonic_ns()
+                return
+        finally:
+            if locked:
+                self.lock.release()
+        start = monotonic_ns()
+        while self.running.is_set():
+            left = 1.0 - (monotonic_ns() - start) / self.ramp_ns
+            if left <= 0:
+                break
+            loop.driver.write_outputs([speed * left for speed in self.speeds])
+            if self.action_time is None:
+                self.action_time = monotonic_ns()
+            time.sleep(self.check_s)
+        loop.driver.stop()
+
+    def stop(self, timeout=1.0):
+        self.running.clear()
+        if self.is_alive():
+            self.join(timeout)
+
+
+# Function to start a watchdog from a profile's 'failsafe' section (None if deadline_ms is None)
+def start_watchdog(settings, loop):
+    if settings['deadline_ms'] is None:
+        return None
+    watchdog = FailsafeWatchdog(loop, settings['deadline_ms'], settings['action'], settings['ramp_ms'],
+                                settings['check_ms'])
+    watchdog.start()
+    return watchdog
@@ -1,9 +1,10 @@
 import serial
 import time
 import RPi.GPIO as GPIO
+from receiver import ReceiverThread
 
 # 初始化串口（Raspberry Pi的默认串口为/dev/ttyS0，波特率115200）
-serial_port = serial.Serial('/dev/ttyS0', 115200, timeout=1)
+serial_port = serial.Serial('/dev/ttyS0', 115200, timeout=0.02)  # 超时略大于一帧周期（约7ms），接收线程能及时响应停止请求
 
 # 设置GPIO模式为BCM编号
 GPIO.setmode(GPIO.BCM)
@@ -26,18 +27,13 @@ for name, pin in pins.items():
     pwm[name] = GPIO.PWM(pin, 100)  # 100Hz PWM频率
     pwm[name].start(0)              # 初始占空比为0
 
-# 模拟IBus通道读取（需要根据实际IBus协议实现）
-def read_channel(channel):
-    # 占位函数：假设返回1000-2000范围的值
-    # 实际需要从serial_port读取IBus数据并解析
-    # 这里仅返回模拟值，需替换为真实逻辑
-    serial_port.write(f"read_ch{channel}\n".encode())  # 示例命令
-    time.sleep(0.01)  # 等待响应
-    response = serial_port.readline().decode().strip()
-    try:
-        return int(response)  # 假设返回值为数值
-    except ValueError:
-        return 1500  # 默认中间值
+# 在后台线程读取IBus数据帧（一帧32字节包含全部14个通道）
+# 接收线程在字节流中查找0x20/0x40帧头并校验，丢失或多出一个字节只损失一帧
+receiver = ReceiverThread(serial_port)
+FRAME_MAX_AGE = 0.015  # 控制循环接受的最旧数据帧（秒）
+def read_ibus():
+    # 返回最新一帧的通道值；没有足够新的有效帧（断线、错帧）时全部返回1500中间值
+    return receiver.read(FRAME_MAX_AGE)
 
 # 阈值处理函数
 def threshold_stick(value):
@@ -56,6 +52,7 @@ def main():
     drive3_filtered = 0
     previous_time = time.time() * 1000  # 毫秒
 
+    receiver.start()
     try:
         while True:
             current_time = time.time() * 1000
@@ -63,9 +60,10 @@ def main():
                 previous_time = current_time
 
                 # 读取IBus通道数据
-                ch2 = read_channel(1)  # 通道1
-                ch4 = read_channel(3)  # 通道3
-                ch5 = read_channel(4)  # 通道4
+                ch_values = read_ibus()
+                ch2 = ch_values[1]  # 通道1
+                ch4 = ch_values[3]  # 通道3
+                ch5 = ch_values[4]  # 通道4
 
                 # 处理信号
                 drive1 = threshold_stick(ch4)
@@ -119,6 +117,7 @@ def main():
         print("程序已终止")
     finally:
         # 清理GPIO资源
+        receiver.stop()
         for p in pwm.values():
             p.stop()
         GPIO.cleanup()
@@ -1,15 +1,15 @@
 import serial
-import time
-import RPi.GPIO as GPIO
+from conditioning import StickCurve
+from filters import EMA, FilterBank
+from mixer import THREE_WHEEL, Mixer
+from motor_driver import DUAL_PWM, RPiGPIODriver
+from recorder import Recorder
+from receiver import ReceiverThread
+from scheduler import LoopScheduler
 
 # Set up the serial connection to the IBus receiver
-serial_port = serial.Serial('/dev/ttyS0', 115200, timeout=1)
-# The Raspberry Pi listens to the IBus receiver through its serial port (/dev/ttyS0) at 115200 baud. This is how it gets joystick data.
-
-# Configure GPIO pins using BCM numbering
-GPIO.setmode(GPIO.BCM)
-GPIO.setwarnings(False)  # Ignore GPIO warnings
-# The Pi uses BCM numbering (e.g., GPIO17) for its pins, not physical pin numbers. Warnings are turned off to avoid clutter.
+serial_port = serial.Serial('/dev/ttyS0', 115200, timeout=0.02)
+# The Raspberry Pi listens to the IBus receiver through its serial port (/dev/ttyS0) at 115200 baud. This is how it gets joystick data. The timeout is just above one IBus frame period (~7ms) so the reader thread notices a stop request quickly.
 
 # Define GPIO pins for motor control
 pins = {
@@ -22,114 +22,85 @@ pins = {
 }
 # Each motor has two pins: one for forward (positive) and one for reverse (negative). These are wired to a motor driver (e.g., H-bridge).
 
-# Set up PWM on each pin
-pwm = {}
-for name, pin in pins.items():
-    GPIO.setup(pin, GPIO.OUT)
-    pwm[name] = GPIO.PWM(pin, 100)  # 100Hz PWM
-    pwm[name].start(0)              # Start at 0% duty cycle
-# The Pi sets these pins as outputs and creates PWM signals at 100Hz (100 pulses per second). Initially, all motors are off (0% duty cycle).
-
-# Function to read IBus channels (placeholder)
-def read_channel(channel):
-    serial_port.write(f"read_ch{channel}\n".encode())
-    time.sleep(0.01)
-    response = serial_port.readline().decode().strip()
-    try:
-        return int(response)
-    except ValueError:
-        return 1500  # Default neutral value
-# This function is meant to get joystick data (1000-2000) from the IBus receiver. Right now, it’s a dummy—it sends a command and expects a number back. If it fails, it assumes neutral (1500). You’d replace this with real IBus parsing.
+# Set up the motor driver
+driver = RPiGPIODriver([
+    (pins['out1_positive'], pins['out1_negative']),
+    (pins['out2_positive'], pins['out2_negative']),
+    (pins['out3_positive'], pins['out3_negative']),
+], DUAL_PWM, frequency=100, deadband=1)
+# The driver uses BCM numbering (e.g., GPIO17), sets these pins as outputs and creates PWM signals at 100Hz (100 pulses per second). Initially, all motors are off (0% duty cycle). It only changes a pin's duty cycle when the speed moves by more than 1 step (out of 255), so the idle side of each H-bridge isn't rewritten with 0 every tick.
+
+# Set up the motor mixer
+mixer = Mixer(THREE_WHEEL, limit=255)
+# Turns the three joystick axes into three motor speeds. If any motor would go past 255, all three are scaled down by the same amount so the robot keeps moving in the direction the sticks ask for.
+
+# Read IBus frames on a background thread (one 32-byte frame holds all 14 channels)
+receiver = ReceiverThread(serial_port)
+FRAME_MAX_AGE = 0.015  # Oldest frame (in seconds) the control loop will act on
+def read_ibus():
+    return receiver.read(FRAME_MAX_AGE)
+# The reader thread checks each frame's 0x20/0x40 header and checksum and publishes the newest one with a sequence number and timestamp. The control loop just picks up the latest frame, so a slow serial read never delays the motors. If no fresh frame is available, it returns neutral (1500) for every channel.
 
 # Adjust raw IBus values to motor range
+stick_curve = StickCurve(deadband=0, expo=0.0, scale=255)
 def threshold_stick(value):
-    value = max(1000, min(2000, value))  # Limit to 1000-2000
-    return (value - 1500) / 500 * 255   # Map to -255 to 255
-# Takes IBus values (1000-2000, where 1500 is neutral) and converts them to -255 (full reverse) to 255 (full forward) for motor control.
+    return stick_curve.lookup(value)
+# Takes IBus values (1000-2000, where 1500 is neutral) and converts them to -255 (full reverse) to 255 (full forward) for motor control. The whole mapping is worked out once into a lookup table at startup; raise deadband (IBus units around 1500) or expo (0-1, softer around center) to change the stick feel at no extra cost per tick.
 
 # Smooth the signal to avoid sudden jumps
-def filter(new_value, old_value, strength):
-    return (new_value * (100 - strength) + old_value * strength) / 100
-# Smooths the signal so the motors don’t jerk. It blends 70% of the new value with 30% of the old value (strength=30).
+FILTER_TIME_CONSTANT_MS = 8
+# Smooths the signal so the motors don’t jerk. The time constant is in milliseconds: an 8ms constant at a 10ms loop blends about 70% of the new value with 30% of the old one, and stays just as smooth if the loop rate changes.
 
 # Main control loop
 def main():
-    drive1_filtered = 0
-    drive2_filtered = 0
-    drive3_filtered = 0
-    previous_time = time.time() * 1000  # Start time in milliseconds
-    # Initialize filtered values at 0 and set up timing.
+    stick_filter = FilterBank(3, 10, EMA, time_constant_ms=FILTER_TIME_CONSTANT_MS)
+    scheduler = LoopScheduler(100, spin_us=200)  # Run every 10ms (100Hz)
+    # Start the filters at 0 and set up timing. The scheduler sleeps until each 10ms deadline instead of spinning on the clock, so it doesn't eat a whole CPU core.
+
+    recorder = Recorder('flight.rec', capacity=60000)
+    # Flight recorder: every tick's joystick inputs, filtered values, motor outputs and duty cycles go into a ring file holding the last 10 minutes. It survives a crash; read it back with `python recorder.py flight.rec`.
 
+    receiver.start()
     try:
         while True:
-            current_time = time.time() * 1000
-            if current_time - previous_time >= 10:  # Run every 10ms
-                previous_time = current_time
-                # Check the clock. If 10ms have passed, update everything.
-
-                # Get joystick inputs
-                ch2 = read_channel(1)  # Channel 1
-                ch4 = read_channel(3)  # Channel 3
-                ch5 = read_channel(4)  # Channel 4
-                # Read three channels from the IBus receiver (e.g., joystick axes).
-
-                # Process the inputs
-                drive1 = threshold_stick(ch4)
-                drive2 = threshold_stick(ch2)
-                drive3 = threshold_stick(ch5)
-                # Convert raw inputs to motor-friendly values (-255 to 255).
-
-                # Smooth the inputs
-                drive1_filtered = filter(drive1, drive1_filtered, 30)
-                drive2_filtered = filter(drive2, drive2_filtered, 30)
-                drive3_filtered = filter(drive3, drive3_filtered, 30)
-                # Smooth the signals to make motion less twitchy.
-
-                # Mix signals for motor outputs
-                out1 = drive1_filtered + (drive2_filtered * 0.66) - drive3_filtered
-                out2 = drive1_filtered - (drive2_filtered * 0.66) + drive3_filtered
-                out3 = drive2_filtered + drive3_filtered
-                # Combine the inputs to control three motors. This “mixing” decides how each motor contributes to movement (e.g., for a three-wheeled robot).
-
-                # Limit motor values
-                out1 = max(-255, min(255, out1))
-                out2 = max(-255, min(255, out2))
-                out3 = max(-255, min(255, out3))
-                # Keep motor signals between -255 and 255 so they don’t exceed PWM limits.
-
-                # Drive Motor 1
-                if out1 >= 0:
-                    pwm['out1_positive'].ChangeDutyCycle(out1 / 255 * 100)
-                    pwm['out1_negative'].ChangeDutyCycle(0)
-                else:
-                    pwm['out1_positive'].ChangeDutyCycle(0)
-                    pwm['out1_negative'].ChangeDutyCycle(abs(out1) / 255 * 100)
-                # If out1 is positive, spin Motor 1 forward (0-100% speed). If negative, spin it backward.
-
-                # Drive Motor 2
-                if out2 >= 0:
-                    pwm['out2_positive'].ChangeDutyCycle(out2 / 255 * 100)
-                    pwm['out2_negative'].ChangeDutyCycle(0)
-                else:
-                    pwm['out2_positive'].ChangeDutyCycle(0)
-                    pwm['out2_negative'].ChangeDutyCycle(abs(out2) / 255 * 100)
-                # Same for Motor 2.
-
-                # Drive Motor 3
-                if out3 >= 0:
-                    pwm['out3_positive'].ChangeDutyCycle(out3 / 255 * 100)
-                    pwm['out3_negative'].ChangeDutyCycle(0)
-                else:
-                    pwm['out3_positive'].ChangeDutyCycle(0)
-                    pwm['out3_negative'].ChangeDutyCycle(abs(out3) / 255 * 100)
-                # Same for Motor 3. Duty cycle (0-100%) controls speed.
+            scheduler.wait()
+            # Wait until the next 10ms tick, then update everything.
+
+            # Get joystick inputs
+            ch_values = read_ibus()
+            ch2 = ch_values[1]  # Channel 1
+            ch4 = ch_values[3]  # Channel 3
+            ch5 = ch_values[4]  # Channel 4
+            # Read one IBus frame and pick three channels from it (e.g., joystick axes).
+
+            # Process the inputs
+            drive1 = threshold_stick(ch4)
+            drive2 = threshold_stick(ch2)
+            drive3 = threshold_stick(ch5)
+            # Convert raw inputs to motor-friendly values (-255 to 255).
+
+            # Smooth the inputs
+            drive1_filtered, drive2_filtered, drive3_filtered = stick_filter.update(drive1, drive2, drive3)
+            # Smooth the signals to make motion less twitchy.
+
+            # Mix signals for motor outputs
+            out1, out2, out3 = mixer.mix(drive1_filtered, drive2_filtered, drive3_filtered)
+            # Combine the inputs to control three motors. This “mixing” decides how each motor contributes to movement (e.g., for a three-wheeled robot), and keeps every motor signal between -255 and 255.
+
+            # Drive the motors
+            driver.set_motors(out1, out2, out3)
+            # Positive values spin a motor forward, negative values backward. The driver turns -255..255 into a 0-100% duty cycle on the right side of each H-bridge.
+
+            # Log this tick
+            recorder.record(ch_values, stick_filter.outputs, mixer.outputs)
 
     except KeyboardInterrupt:
         print("Program terminated")
+        print(scheduler.report())
     finally:
-        for p in pwm.values():
-            p.stop()
-        GPIO.cleanup()
+        receiver.stop()
+        driver.close()
+        recorder.close()
         serial_port.close()
         # If you press Ctrl+C, stop the motors, free the GPIO pins, and close the serial port cleanly.
 
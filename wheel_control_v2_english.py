@@ -1,9 +1,7 @@
-import time
-import RPi.GPIO as GPIO
-
-# Set GPIO mode to BCM numbering
-GPIO.setmode(GPIO.BCM)
-GPIO.setwarnings(False)  # Disable GPIO warnings
+from mixer import THREE_WHEEL, Mixer
+from motion import S_CURVE, MotionQueue
+from motor_driver import DUAL_PWM, RPiGPIODriver
+from scheduler import LoopScheduler
 
 # Define GPIO pins for motor control
 pins = {
@@ -15,110 +13,108 @@ pins = {
     'out3_negative': 24   # Motor 3 reverse
 }
 
-# Initialize PWM (100Hz frequency)
-pwm = {}
-for name, pin in pins.items():
-    GPIO.setup(pin, GPIO.OUT)
-    pwm[name] = GPIO.PWM(pin, 100)  # 100Hz PWM
-    pwm[name].start(0)              # Start with 0% duty cycle
+# Initialize the motor driver (BCM numbering, 100Hz PWM, starts at 0% duty cycle)
+driver = RPiGPIODriver([
+    (pins['out1_positive'], pins['out1_negative']),
+    (pins['out2_positive'], pins['out2_negative']),
+    (pins['out3_positive'], pins['out3_negative']),
+], DUAL_PWM, frequency=100)
+
+# Queue of scripted moves, played back by the control loop in main()
+# Each move ramps smoothly (S-curve, 0.3 seconds) from the previous speeds instead of jumping
+motion = MotionQueue(3, period_ms=10, ramp_s=0.3, profile=S_CURVE)
 
-# Function to stop all motors
-def stop():
-    for name in pwm:
-        pwm[name].ChangeDutyCycle(0)
+# Function to stop all motors (with a duration: queue a stop that holds for `duration` seconds)
+def stop(duration=None):
+    control_motors(0, 0, 0, duration)
 
 # Function to move forward
-def move_forward(speed=255):
+def move_forward(speed=255, duration=None):
     # speed: 0 to 255, controls how fast it moves
+    # duration: None sets the motors right away; otherwise the move is queued and held for
+    # `duration` seconds before the next one starts (queued moves don't block)
     out1 = speed   # Motor 1 forward
     out2 = speed   # Motor 2 forward
     out3 = speed   # Motor 3 forward
-    control_motors(out1, out2, out3)
+    control_motors(out1, out2, out3, duration)
 
 # Function to move backward
-def move_backward(speed=255):
+def move_backward(speed=255, duration=None):
     out1 = -speed  # Motor 1 reverse
     out2 = -speed  # Motor 2 reverse
     out3 = -speed  # Motor 3 reverse
-    control_motors(out1, out2, out3)
+    control_motors(out1, out2, out3, duration)
 
 # Function to move left
-def move_left(speed=255):
+def move_left(speed=255, duration=None):
     out1 = speed   # Motor 1 forward
     out2 = -speed  # Motor 2 reverse
     out3 = 0       # Motor 3 stopped
-    control_motors(out1, out2, out3)
+    control_motors(out1, out2, out3, duration)
 
 # Function to move right
-def move_right(speed=255):
+def move_right(speed=255, duration=None):
     out1 = -speed  # Motor 1 reverse
     out2 = speed   # Motor 2 forward
     out3 = 0       # Motor 3 stopped
-    control_motors(out1, out2, out3)
+    control_motors(out1, out2, out3, duration)
 
 # Function to control the motors
-def control_motors(out1, out2, out3):
-    # Limit the range to -255 to 255
-    out1 = max(-255, min(255, out1))
-    out2 = max(-255, min(255, out2))
-    out3 = max(-255, min(255, out3))
-
-    # Motor 1 control
-    if out1 >= 0:
-        pwm['out1_positive'].ChangeDutyCycle(out1 / 255 * 100)
-        pwm['out1_negative'].ChangeDutyCycle(0)
-    else:
-        pwm['out1_positive'].ChangeDutyCycle(0)
-        pwm['out1_negative'].ChangeDutyCycle(abs(out1) / 255 * 100)
-
-    # Motor 2 control
-    if out2 >= 0:
-        pwm['out2_positive'].ChangeDutyCycle(out2 / 255 * 100)
-        pwm['out2_negative'].ChangeDutyCycle(0)
-    else:
-        pwm['out2_positive'].ChangeDutyCycle(0)
-        pwm['out2_negative'].ChangeDutyCycle(abs(out2) / 255 * 100)
-
-    # Motor 3 control
-    if out3 >= 0:
-        pwm['out3_positive'].ChangeDutyCycle(out3 / 255 * 100)
-        pwm['out3_negative'].ChangeDutyCycle(0)
+def control_motors(out1, out2, out3, duration=None):
+    # Speeds run from -255 to 255, the driver limits the range and
+    # drives the forward or reverse side of each H-bridge.
+    if duration is None:
+        driver.set_motors(out1, out2, out3)  # Right away, as control_motors(out1, out2, out3) always did
     else:
-        pwm['out3_positive'].ChangeDutyCycle(0)
-        pwm['out3_negative'].ChangeDutyCycle(abs(out3) / 255 * 100)
+        queue_move(out1, out2, out3, duration)
+
+# Function to queue a move: the control loop in main() ramps to the speeds and holds them for
+# `duration` seconds
+def queue_move(out1, out2, out3, duration):
+    motion.push((out1, out2, out3), duration)
+
+# Mixer for this robot's three omni wheels, to turn drive commands into motor speeds
+mixer = Mixer(THREE_WHEEL)
+
+# Function to drive a planned route, e.g. a roof sweep from coverage_planner.py:
+#     grid = OccupancyGrid.from_polygon(roof, obstacles, cell_m=0.3, margin_m=0.15)
+#     planner = CoveragePlanner(grid)
+#     planner.plan()
+#     follow_route(route_moves(planner.waypoints(), load_profile('wheel_control')))
+def follow_route(moves):
+    # moves: ((drive1, drive2, drive3), duration) pairs; each is mixed into wheel speeds and queued
+    for command, duration in moves:
+        out1, out2, out3 = mixer.mix(*command)
+        queue_move(out1, out2, out3, duration)
+
+# Function to drop the queued moves and ramp down to a stop (call from any thread)
+def cancel():
+    motion.cancel()
 
 # Main function
 def main():
+    scheduler = LoopScheduler(100)  # 100 Hz, same period as the motion queue
     try:
         print("Starting the program...")
         # Example: Test each direction in sequence
-        move_forward(200)  # Move forward at speed 200
-        time.sleep(2)      # Wait 2 seconds
-        stop()             # Stop
-        time.sleep(1)      # Pause for 1 second
-
-        move_backward(200) # Move backward
-        time.sleep(2)
-        stop()
-        time.sleep(1)
-
-        move_left(200)     # Move left
-        time.sleep(2)
-        stop()
-        time.sleep(1)
-
-        move_right(200)    # Move right
-        time.sleep(2)
-        stop()
-        time.sleep(1)
+        move_forward(200, 2.0)   # Move forward at speed 200 for 2 seconds
+        stop(1.0)                # Stop for 1 second
+        move_backward(200, 2.0)  # Move backward
+        stop(1.0)
+        move_left(200, 2.0)      # Move left
+        stop(1.0)
+        move_right(200, 2.0)     # Move right
+        stop(1.0)
+
+        # Control loop: one step of the queued moves every 10ms, until the queue is empty
+        while motion.active():
+            scheduler.wait()
+            driver.write_outputs(motion.update())
 
     except KeyboardInterrupt:
         print("Program stopped")
     finally:
-        stop()          # Ensure all motors stop
-        for p in pwm.values():
-            p.stop()    # Stop PWM signals
-        GPIO.cleanup()  # Clean up GPIO resources
+        driver.close()  # Stop all motors, PWM signals and clean up GPIO resources
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,101 @@
+from array import array  # Import array library for the per-wheel state
+
+from motor_driver import MAX_SPEED
+
+
+# Closed-loop wheel speed control: one PI controller per wheel, all updated in one call per tick
+# Targets and outputs are in the usual motor speed units (-255 to 255); the encoder count rate is
+# scaled to the same units, so 255 means max_counts_per_s.
+# - max_counts_per_s: encoder counts per second at full speed on a free-running wheel
+# - kp, ki: proportional and integral gains (output units per unit of speed error, and per second)
+# - limit: largest output sent to the motors
+#
+# The target itself is fed forward, so the PI terms only make up the difference that slope and
+# drag cause. The integral stops growing while the output is saturated (no wind-up).
+#
+# Usage, inside the control loop:
+#     out = mixer.mix_into(drive)
+#     out = speed.update(out, encoders.sample(), time.monotonic_ns())
+#     driver.write_outputs(out)
+class WheelSpeedController:
+    __slots__ = ('wheels', 'period_ns', 'max_counts_per_s', 'kp', 'ki', 'limit', 'last_counts',
+                 'last_time', 'integral', 'measured', 'outputs')
+
+    def __init__(self, wheels, period_ms, max_counts_per_s, kp=0.4, ki=4.0, limit=MAX_SPEED):
+        self.wheels = range(wheels)
+        self.period_ns = int(period_ms * 1e6)
+        self.max_counts_per_s = max_counts_per_s
+        self.kp = kp
+        self.ki = ki
+        self.limit = limit
+        self.last_counts = array('q', [0] * wheels)
+        self.last_time = None  # None until the first update
+        self.integral = array('d', [0.0] * wheels)
+        self.measured = array('d', [0.0] * wheels)  # Last measured speed per wheel (speed units)
+        self.outputs = array('d', [0.0] * wheels)   # Reused for every update() call
+
+    # Function to forget the integral and the previous counts (e.g. after disarming)
+    def reset(self):
+        self.last_time = None
+        for i in self.wheels:
+            self.integral[i] = 0.0
+            self.measured[i] = 0.0
+
+    # Function to compute the motor outputs for all wheels
+    # - targets: wanted speed per wheel (e.g. the mixer's outputs)
+    # - counts: running encoder counts per wheel
+    # - now_ns: time.monotonic_ns() when the counts were taken
+    # Returns the controller's output array (updated in place)
+    def update(self, targets, counts, now_ns):
+        last_counts, integral, measured, outputs = self.last_counts, self.integral, self.measured, self.outputs
+        limit = self.limit
+        if self.last_time is None or now_ns <= self.last_time:
+            dt = self.period_ns / 1e9
+            for i in self.wheels:
+                last_counts[i] = counts[i]
+        else:
+            dt = (now_ns - self.last_time) / 1e9
+            scale = MAX_SPEED / self.max_counts_per_s / dt
+            for i in self.wheels:
+                count = counts[i]
+                measured[i] = (count - last_counts[i]) * scale
+                last_counts[i] = count
+        self.last_time = now_ns
+        kp, ki_dt = self.kp, self.ki * dt
+        for i in self.wheels:
+            target = targets[i]
+            error = target - measured[i]
+            output = target + kp * error + integral[i] + ki_dt * error
+            if output > limit:
+                output = limit
+                if error < 0:
+                    integral[i] += ki_dt * error
+            elif output < -limit:
+                output = -limit
+                if error > 0:
+                    integral[i] += ki_dt * error
+            else:
+                integral[i] += ki_dt * error
+            outputs[i] = output
+        return outputs
+
+    # Function to run the controllers of many robots at once with NumPy (e.g. a simulated fleet)
+    # Same math and settings as update() at a fixed dt, but the state lives in the caller's arrays
+    # - last_counts: int64 array of shape (count, wheels), updated in place (zeros for a fleet at rest)
+    # - integral: float array of shape (count, wheels), updated in place (zeros to start from rest)
+    # - targets, counts: arrays of shape (count, wheels)
+    # - dt: seconds since the previous call
+    # Returns (outputs, measured speeds), both of shape (count, wheels)
+    def update_batch(self, last_counts, integral, targets, counts, dt):
+        import numpy as np  # Only needed for batch updates, the control loop runs without NumPy
+        targets = np.asarray(targets, dtype=np.float64)
+        measured = (counts - last_counts) * (MAX_SPEED / self.max_counts_per_s / dt)
+        last_counts[:] = counts
+        error = targets - measured
+        step = self.ki * dt * error
+        output = targets + self.kp * error + integral + step
+        limit = self.limit
+        # Same anti-windup as update(): no integration further into saturation
+        grow = ((output <= limit) | (error < 0)) & ((output >= -limit) | (error > 0))
+        integral += np.where(grow, step, 0.0)
+        return np.clip(output, -limit, limit), measured